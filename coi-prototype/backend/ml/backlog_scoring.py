@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Backlog Scoring
+Scores every open request with the active model in one batch and stores the
+results in ml_priority_cache, where Node reads them with a primary-key lookup
+instead of computing the priority on demand.
+
+Features are computed for the whole backlog by one set-based query that
+mirrors extractFeatures() in mlPriorityService.js:
+- requester workload comes from one GROUP BY requester_id, not one COUNT(*)
+  per request
+- SLA targets come from the sla_config rules (PIE override, service type
+  override, stage default, then 48h)
+- business hours are counted from business_calendar once per distinct
+  stage start date
+Timestamps are compared in UTC, like CURRENT_TIMESTAMP.
+
+Each row carries a hash of its inputs (the request's updated_at and stage
+start, its SLA target, the features that don't depend on the clock, and the
+model_id). Rows whose hash is unchanged are skipped, so a run rescores only
+requests that were edited, changed stage or workload, had their SLA target
+changed in sla_config, or are new since the last run.
+With --full every open request is rescored. Rows of requests that closed are
+removed. Each written row also gets next_rescore_at, the time its level is
+next expected to change as the clock runs (see rescoring_scheduler.py).
+
+Usage: python backlog_scoring.py [--full] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+CHUNK_SIZE = 5000
+TOP_FACTORS = 5
+
+PRIORITY_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS ml_priority_cache (
+        id INTEGER PRIMARY KEY,
+        request_id VARCHAR(50),
+        model_id INTEGER REFERENCES ml_weights(model_id),
+        score INTEGER,
+        level VARCHAR(20),
+        probability REAL,
+        breakdown TEXT,
+        features TEXT,
+        input_hash VARCHAR(32),
+        request_updated_at DATETIME,
+        scored_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        next_rescore_at DATETIME
+    )
+"""
+
+CACHE_INDEXES = [
+    ('idx_ml_priority_cache_due', 'ml_priority_cache(next_rescore_at)'),
+]
+
+# Features that change with the clock alone; excluded from the input hash
+TIME_FEATURES = ('sla_hours_remaining', 'sla_percent_elapsed', 'hours_in_stage')
+
+# The filters narrow the backlog (and the workload counts) to given ids.
+# They are left out of the default query rather than written as
+# ":ids IS NULL OR ...", which would make SQLite scan coi_requests.
+_BACKLOG_FEATURES_TEMPLATE = f"""
+    WITH open_workload AS (
+        SELECT requester_id, COUNT(*) AS open_count
+        FROM coi_requests
+        WHERE status NOT IN {database.CLOSED_STATUSES_SQL}
+          {{workload_filter}}
+        GROUP BY requester_id
+    ),
+    -- One row per rule; SQLite takes the bare columns from the MIN(id) row,
+    -- which is the row getSLAConfig's LIMIT 1 returns
+    pie_sla AS (
+        SELECT workflow_stage, target_hours, MIN(id)
+        FROM sla_config
+        WHERE applies_to_pie = 1 AND is_active = 1
+        GROUP BY workflow_stage
+    ),
+    service_sla AS (
+        SELECT workflow_stage, applies_to_service_type, target_hours, MIN(id)
+        FROM sla_config
+        WHERE applies_to_service_type IS NOT NULL AND is_active = 1
+        GROUP BY workflow_stage, applies_to_service_type
+    ),
+    default_sla AS (
+        SELECT workflow_stage, target_hours, MIN(id)
+        FROM sla_config
+        WHERE applies_to_service_type IS NULL AND applies_to_pie IS NULL AND is_active = 1
+        GROUP BY workflow_stage
+    ),
+    backlog AS (
+        SELECT r.*,
+               COALESCE(r.stage_entered_at, r.updated_at, r.created_at) AS stage_start,
+               COALESCE(
+                   CASE WHEN r.pie_status = 'Yes' THEN p.target_hours END,
+                   s.target_hours,
+                   d.target_hours,
+                   48
+               ) AS target_hours,
+               CASE WHEN r.requester_id IS NULL THEN 0 ELSE w.open_count - 1 END AS workload
+        FROM coi_requests r
+        LEFT JOIN open_workload w ON w.requester_id = r.requester_id
+        LEFT JOIN pie_sla p ON p.workflow_stage = r.status
+        LEFT JOIN service_sla s ON s.workflow_stage = r.status
+                               AND s.applies_to_service_type = r.service_type
+        LEFT JOIN default_sla d ON d.workflow_stage = r.status
+        WHERE r.status NOT IN {database.CLOSED_STATUSES_SQL}
+          {{ids_filter}}
+    ),
+    working_days AS (
+        -- Working days from each distinct stage start date up to today
+        SELECT s.start_date, COUNT(c.date) AS days
+        FROM (SELECT DISTINCT date(stage_start) AS start_date FROM backlog) s
+        LEFT JOIN business_calendar c ON c.date >= s.start_date
+                                     AND c.date <= date(:now)
+                                     AND c.is_working_day = 1
+        GROUP BY s.start_date
+    ),
+    elapsed AS (
+        -- calculateBusinessHours: 9 hours per working day, hour difference
+        -- when the stage started today
+        SELECT b.*,
+               CASE
+                   WHEN b.stage_start IS NULL THEN NULL
+                   WHEN julianday(b.stage_start) >= julianday(:now) OR COALESCE(wd.days, 0) = 0 THEN 0
+                   WHEN date(b.stage_start) = date(:now) THEN
+                       MAX(0, CAST(strftime('%H', :now) AS INTEGER) - CAST(strftime('%H', b.stage_start) AS INTEGER))
+                   ELSE wd.days * 9
+               END AS business_hours
+        FROM backlog b
+        LEFT JOIN working_days wd ON wd.start_date = date(b.stage_start)
+    )
+    SELECT
+        e.id,
+        e.request_id,
+        e.updated_at,
+        e.stage_start,
+        e.target_hours AS sla_target_hours,
+        CASE WHEN e.business_hours IS NULL THEN 48
+             ELSE MAX(0, e.target_hours - e.business_hours) END AS sla_hours_remaining,
+        CASE WHEN e.business_hours IS NULL THEN 0
+             ELSE MIN(100, CAST(ROUND(e.business_hours * 100.0 / e.target_hours) AS INTEGER)) END AS sla_percent_elapsed,
+        CASE WHEN e.external_deadline IS NOT NULL THEN 1 ELSE 0 END AS has_external_deadline,
+        CASE WHEN e.external_deadline IS NOT NULL
+             THEN MAX(0, CAST(ROUND(julianday(e.external_deadline) - julianday(COALESCE(e.created_at, :now))) AS INTEGER))
+             ELSE 999 END AS days_to_deadline,
+        CASE WHEN e.pie_status = 'Yes' OR e.pie_status = 1 THEN 1 ELSE 0 END AS is_pie,
+        CASE WHEN e.international_operations = 1 OR e.international_operations = 'true' THEN 1 ELSE 0 END AS is_international,
+        CASE WHEN e.service_type = 'STATUTORY_AUDIT' THEN 1 ELSE 0 END AS is_statutory_audit,
+        CASE WHEN e.service_type = 'TAX_COMPLIANCE' THEN 1 ELSE 0 END AS is_tax_compliance,
+        MIN(COALESCE(e.escalation_count, 0), 3) AS escalation_count,
+        CASE e.status
+            WHEN 'Pending Director Approval' THEN 1
+            WHEN 'Pending Compliance' THEN 2
+            WHEN 'Pending Partner' THEN 3
+            WHEN 'Pending Finance' THEN 4
+            WHEN 'Active' THEN 5
+            ELSE 0
+        END AS current_stage,
+        CAST(ROUND((julianday(:now) - julianday(COALESCE(e.stage_start, :now))) * 24) AS INTEGER) AS hours_in_stage,
+        COALESCE(e.workload, 0) AS requester_workload,
+        CAST(strftime('%w', COALESCE(e.created_at, :now)) AS INTEGER) AS day_of_week,
+        CASE WHEN CAST(strftime('%d', COALESCE(e.created_at, :now)) AS INTEGER) > 25 THEN 1 ELSE 0 END AS is_end_of_month,
+        CASE WHEN CAST(strftime('%m', COALESCE(e.created_at, :now)) AS INTEGER) IN (10, 11, 12) THEN 1 ELSE 0 END AS is_q4
+    FROM elapsed e
+"""
+
+BACKLOG_FEATURES_SQL = _BACKLOG_FEATURES_TEMPLATE.format(workload_filter='', ids_filter='')
+BACKLOG_FEATURES_BY_ID_SQL = _BACKLOG_FEATURES_TEMPLATE.format(
+    workload_filter="""AND requester_id IN (
+              SELECT requester_id FROM coi_requests WHERE id IN (SELECT value FROM json_each(:ids))
+          )""",
+    ids_filter='AND r.id IN (SELECT value FROM json_each(:ids))'
+)
+
+UPSERT_SQL = """
+    INSERT INTO ml_priority_cache (
+        id, request_id, model_id, score, level, probability, breakdown, features,
+        input_hash, request_updated_at, scored_at, next_rescore_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        request_id = excluded.request_id,
+        model_id = excluded.model_id,
+        score = excluded.score,
+        level = excluded.level,
+        probability = excluded.probability,
+        breakdown = excluded.breakdown,
+        features = excluded.features,
+        input_hash = excluded.input_hash,
+        request_updated_at = excluded.request_updated_at,
+        scored_at = excluded.scored_at,
+        next_rescore_at = excluded.next_rescore_at
+"""
+
+REMOVE_CLOSED_SQL = f"""
+    DELETE FROM ml_priority_cache
+    WHERE NOT EXISTS (
+        SELECT 1 FROM coi_requests r
+        WHERE r.id = ml_priority_cache.id
+          AND r.status NOT IN {database.CLOSED_STATUSES_SQL}
+    )
+"""
+
+
+def ensure_cache_table():
+    database.execute(PRIORITY_CACHE_SQL)
+    columns = {row['name'] for row in database.query("PRAGMA table_info(ml_priority_cache)")}
+    if 'next_rescore_at' not in columns:
+        database.execute("ALTER TABLE ml_priority_cache ADD COLUMN next_rescore_at DATETIME")
+    for name, target in CACHE_INDEXES:
+        database.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def utc_now():
+    """Current time in SQLite's CURRENT_TIMESTAMP format."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def backlog_features(now=None, ids=None):
+    """
+    Features of every open request (or of the open requests in `ids`),
+    measured at `now` (UTC, default: now). Returns a list of dicts with id,
+    request_id, updated_at, stage_start, sla_target_hours and the model
+    features.
+    """
+    params = {
+        'now': now or utc_now(),
+        'ids': json.dumps(list(ids)) if ids is not None else None
+    }
+    cursor = database.read_connection().cursor()
+    try:
+        cursor.row_factory = None
+        cursor.execute(BACKLOG_FEATURES_SQL if ids is None else BACKLOG_FEATURES_BY_ID_SQL, params)
+        names = [column[0] for column in cursor.description]
+        rows = []
+        while True:
+            chunk = cursor.fetchmany(CHUNK_SIZE)
+            if not chunk:
+                break
+            rows.extend(dict(zip(names, row)) for row in chunk)
+        return rows
+    finally:
+        cursor.close()
+
+
+def input_hash(row, model_id):
+    """
+    Hash of everything a score depends on except the clock. The SLA target
+    is included so that sla_config changes trigger a rescore.
+    """
+    key = [model_id, row['updated_at'], row['stage_start'], row['sla_target_hours']]
+    key.extend(row[name] for name in database.FEATURE_COLUMNS if name not in TIME_FEATURES)
+    return hashlib.blake2b(json.dumps(key).encode(), digest_size=16).hexdigest()
+
+
+def score_rows(scorer, model_id, rows, now):
+    """
+    Score rows in one batch and work out when each is next due (see
+    rescoring_scheduler.next_rescore_times). Returns ml_priority_cache
+    parameter tuples.
+    """
+    from rescoring_scheduler import next_rescore_times
+
+    results = scorer.predict_batch(
+        [{name: row[name] for name in database.FEATURE_COLUMNS} for row in rows],
+        top_k=TOP_FACTORS
+    )
+    due = next_rescore_times(scorer, rows, now)
+    return [
+        (
+            row['id'],
+            row['request_id'],
+            model_id,
+            result['score'],
+            result['level'],
+            result['probability'],
+            json.dumps(result['explanation']),
+            json.dumps({name: row[name] for name in database.FEATURE_COLUMNS}),
+            row['input_hash'],
+            row['updated_at'],
+            next_rescore_at
+        )
+        for row, result, next_rescore_at in zip(rows, results, due)
+    ]
+
+
+def write_scores(params, chunk_size=CHUNK_SIZE):
+    """Upsert cache rows; one transaction per chunk."""
+    written = 0
+    for start in range(0, len(params), chunk_size):
+        written += database.execute_many(UPSERT_SQL, params[start:start + chunk_size])
+    return written
+
+
+def score_backlog(full=False, now=None, ids=None, registry=None):
+    """
+    Rescore open requests whose inputs changed (all of them with full=True;
+    only those in `ids` when given) and drop cache rows of closed requests.
+    With `ids` the closed-row sweep is skipped and left to the next full
+    refresh. Pass a long-lived `registry` to avoid reloading the model on
+    every call. Returns a summary dict; 'schedule' lists the (id,
+    next_rescore_at) pairs that were written.
+    """
+    from model_registry import ModelRegistry
+
+    start = time.perf_counter()
+    if registry is None:
+        registry = ModelRegistry()
+        try:
+            model_id, scorer = registry.active()
+        finally:
+            registry.close()
+    else:
+        model_id, scorer = registry.active()
+
+    now = now or utc_now()
+    ensure_cache_table()
+    rows = backlog_features(now, ids)
+    if ids is None:
+        cached_rows = database.query("SELECT id, input_hash FROM ml_priority_cache")
+    else:
+        cached_rows = database.query(
+            "SELECT id, input_hash FROM ml_priority_cache WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(ids)),)
+        )
+    cached = {row['id']: row['input_hash'] for row in cached_rows}
+
+    changed = []
+    for row in rows:
+        row['input_hash'] = input_hash(row, model_id)
+        if full or cached.get(row['id']) != row['input_hash']:
+            changed.append(row)
+
+    params = score_rows(scorer, model_id, changed, now) if changed else []
+    written = write_scores(params)
+    removed = database.execute(REMOVE_CLOSED_SQL) if ids is None else 0
+
+    return {
+        'model_id': model_id,
+        'open_requests': len(rows),
+        'rescored': written,
+        'unchanged': len(rows) - len(changed),
+        'removed': removed,
+        'seconds': round(time.perf_counter() - start, 3),
+        'schedule': [(p[0], p[-1]) for p in params]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score all open requests into ml_priority_cache')
+    parser.add_argument('--full', action='store_true', help='Rescore every open request')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    try:
+        result = score_backlog(full=args.full)
+        result.pop('schedule')
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"✅ Scored {result['rescored']} of {result['open_requests']} open requests with model "
+          f"{result['model_id']} ({result['unchanged']} unchanged, {result['removed']} closed removed) "
+          f"in {result['seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction Benchmark
+Times the training feature extraction (database.TRAINING_DATA_SQL) on
+synthetic databases of increasing size and checks that it scales linearly.
+
+The scaling exponent is the log-log slope of time against row count between
+the smallest and largest size (1.0 = linear, 2.0 = quadratic). The benchmark
+fails (exit code 1) when it exceeds --max-exponent.
+
+Usage: python benchmarks/bench_feature_extraction.py [--sizes 10000,100000,1000000] [--legacy]
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database
+from synthetic_data import create_synthetic_database
+
+# Previous extraction: one correlated COUNT(*) and one EXISTS per row.
+# Kept for comparison only (--legacy).
+LEGACY_WORKLOAD_SQL = """
+    (SELECT COUNT(*) FROM coi_requests r2
+     WHERE r2.requester_id = r.requester_id
+     AND r2.status NOT IN ('Approved', 'Rejected', 'Lapsed')
+     AND r2.request_id != r.request_id) as requester_workload
+"""
+LEGACY_BREACH_SQL = """
+            WHEN EXISTS (
+                SELECT 1 FROM sla_breach_log b
+                WHERE b.coi_request_id = r.id
+                AND b.breach_type = 'BREACHED'
+                AND b.resolved_at IS NULL
+            ) THEN 1
+"""
+
+
+def legacy_sql():
+    sql = database.TRAINING_DATA_SQL
+    sql = sql[sql.index('    SELECT \n'):]
+    sql = sql.replace('COALESCE(w.open_count, 0) as requester_workload', LEGACY_WORKLOAD_SQL.strip())
+    sql = sql.replace('WHEN b.coi_request_id IS NOT NULL THEN 1', LEGACY_BREACH_SQL.strip())
+    sql = sql.replace('    LEFT JOIN open_workload w ON w.requester_id = r.requester_id\n', '')
+    sql = sql.replace('    LEFT JOIN open_breaches b ON b.coi_request_id = r.id\n', '')
+    return sql
+
+
+def time_query(db_path, sql, repeats):
+    """Best-of-N wall time to execute and fetch the query; returns (seconds, rows)."""
+    best = None
+    rows = 0
+    for _ in range(repeats):
+        conn = sqlite3.connect(db_path)
+        try:
+            start = time.perf_counter()
+            rows = len(conn.execute(sql).fetchall())
+            elapsed = time.perf_counter() - start
+        finally:
+            conn.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training feature extraction benchmark')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Comma-separated numbers of synthetic requests')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true',
+                        help='Also time the correlated-subquery extraction')
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help='Skip the legacy timing above this many requests (it is quadratic)')
+    parser.add_argument('--max-exponent', type=float, default=1.25,
+                        help='Fail when the scaling exponent exceeds this')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f'synthetic_{size}.db')
+            create_synthetic_database(db_path, size)
+
+            os.environ['ML_DATABASE_PATH'] = db_path
+            database.ensure_training_indexes()
+
+            seconds, rows = time_query(db_path, database.TRAINING_DATA_SQL, args.repeats)
+            entry = {
+                'requests': size,
+                'training_rows': rows,
+                'seconds': round(seconds, 4),
+                'us_per_request': round(seconds / size * 1e6, 3)
+            }
+            if args.legacy and size <= args.legacy_max:
+                legacy_seconds, _ = time_query(db_path, legacy_sql(), 1)
+                entry['legacy_seconds'] = round(legacy_seconds, 4)
+            results.append(entry)
+
+            if not args.json:
+                line = f"{size:>10} requests  {rows:>9} rows  {seconds:8.3f}s  ({entry['us_per_request']} us/request)"
+                if 'legacy_seconds' in entry:
+                    line += f"  legacy {entry['legacy_seconds']:.3f}s"
+                print(line, flush=True)
+
+    exponent = None
+    if len(results) >= 2 and results[0]['seconds'] > 0:
+        first, last = results[0], results[-1]
+        exponent = math.log(last['seconds'] / first['seconds']) / math.log(last['requests'] / first['requests'])
+
+    if args.json:
+        print(json.dumps({'results': results, 'scaling_exponent': exponent}, indent=2))
+    elif exponent is not None:
+        print(f"\nScaling exponent: {exponent:.2f} (1.0 = linear)")
+
+    if exponent is not None and exponent > args.max_exponent:
+        print(f"\n❌ Extraction scales worse than linear (exponent {exponent:.2f} > {args.max_exponent})",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Times the priority ML pipeline end to end on synthetic databases of
+increasing size (1k to 1M requests by default):
+
+- get_training_data:   database.get_training_data() (feature store refresh + read)
+- train:               PriorityMLModel.train() on the extracted rows
+- predict / explain:   single-row predict_priority() and explain_prediction()
+                       for the sklearn model and the compiled scorer (p50/p95)
+- batch:               predict_batch() over up to --batch-rows rows
+- save / load:         save_model(), load_model() and CompiledPriorityScorer.load()
+
+Training is called directly, so sizes below train_priority_model.py's
+MIN_RECORDS are measured too. Each size runs in a fresh interpreter against
+its own database and dataset cache directory.
+
+Results are written as JSON (--output) with the git commit and library
+versions, so runs can be compared between versions. With --baseline, every
+timing is compared with a previous result file and the benchmark fails
+(exit code 1) when one is more than --tolerance slower.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000,1000000] [--output results.json]
+                                           [--baseline previous.json] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+DEFAULT_SIZES = '1000,10000,100000,1000000'
+SAMPLES = 200               # single-row calls per measurement
+BATCH_ROWS = 10000
+TOLERANCE = 0.25
+MIN_COMPARABLE_MS = 1.0     # ignore regressions on timings below this (noise)
+
+
+def _percentiles(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return {
+        'p50_ms': round(statistics.median(ms), 4),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4)
+    }
+
+
+def _time_calls(fn, rows):
+    durations = []
+    for row in rows:
+        start = time.perf_counter()
+        fn(row)
+        durations.append(time.perf_counter() - start)
+    return _percentiles(durations)
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def run_worker(samples, batch_rows):
+    """Run every stage once against ML_DATABASE_PATH and print a JSON result line."""
+    import database
+    from compiled_scorer import CompiledPriorityScorer, artifact_path
+    from priority_ml_model import PriorityMLModel
+
+    timings = {}
+
+    start = time.perf_counter()
+    df = database.get_training_data()
+    timings['get_training_data_ms'] = _elapsed_ms(start)
+
+    model = PriorityMLModel()
+    start = time.perf_counter()
+    metrics = model.train(df)
+    timings['train_ms'] = _elapsed_ms(start)
+
+    scorer = CompiledPriorityScorer.from_model(model)
+    features = df[model.feature_names]
+    rows = features.sample(n=min(samples, len(features)), random_state=0).to_dict('records')
+    batch = features.iloc[:batch_rows]
+
+    for name, implementation in (('sklearn', model), ('compiled', scorer)):
+        for method in ('predict_priority', 'explain_prediction'):
+            for stat, value in _time_calls(getattr(implementation, method), rows).items():
+                timings[f'{name}_{method}_{stat}'] = value
+
+        start = time.perf_counter()
+        implementation.predict_batch(batch)
+        timings[f'{name}_predict_batch_ms'] = _elapsed_ms(start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'priority_model.joblib')
+
+        start = time.perf_counter()
+        model.save_model(model_path)
+        timings['save_model_ms'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        PriorityMLModel.load_model(model_path)
+        timings['load_model_ms'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        CompiledPriorityScorer.load(artifact_path(model_path))
+        timings['load_scorer_ms'] = _elapsed_ms(start)
+
+        model_bytes = os.path.getsize(model_path)
+
+    print(json.dumps({
+        'training_rows': len(df),
+        'positive': metrics['n_positive'],
+        'batch_rows': len(batch),
+        'single_row_samples': len(rows),
+        'model_bytes': model_bytes,
+        'timings': timings
+    }))
+
+
+def environment():
+    import numpy
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=ML_DIR, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Timings more than `tolerance` slower than the same size in the baseline."""
+    previous = {r['requests']: r['timings'] for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['requests'])
+        if not before:
+            continue
+        for metric, value in result['timings'].items():
+            old = before.get(metric)
+            if old is None or max(old, value) < MIN_COMPARABLE_MS:
+                continue
+            if value > old * (1 + tolerance):
+                regressions.append({
+                    'requests': result['requests'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': value,
+                    'ratio': round(value / old, 2) if old else None
+                })
+    return regressions
+
+
+def print_table(results):
+    print("=== Priority ML Pipeline ===")
+    metrics = list(results[0]['timings']) if results else []
+    header = f"{'metric':<40}" + ''.join(f"{r['requests']:>12}" for r in results)
+    print(header)
+    print(f"{'training rows':<40}" + ''.join(f"{r['training_rows']:>12}" for r in results))
+    print(f"{'generate database ms':<40}" + ''.join(f"{r['generate_ms']:>12.1f}" for r in results))
+    for metric in metrics:
+        print(f"{metric:<40}" + ''.join(f"{r['timings'][metric]:>12.3f}" for r in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Priority ML pipeline benchmark on synthetic data')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated request counts')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--samples', type=int, default=SAMPLES, help='Single-row calls per measurement')
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Previous --output file to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Allowed slowdown against the baseline (0.25 = 25%%)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.samples, args.batch_rows)
+        return
+
+    from synthetic_data import create_synthetic_database
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            db_path = create_synthetic_database(os.path.join(tmp, 'synthetic.db'), n, seed=args.seed)
+            generate_ms = _elapsed_ms(start)
+
+            env = dict(
+                os.environ,
+                ML_DATABASE_PATH=db_path,
+                ML_DATASET_CACHE_DIR=os.path.join(tmp, 'datasets')
+            )
+            proc = subprocess.run(
+                [sys.executable, __file__, '--worker',
+                 '--samples', str(args.samples), '--batch-rows', str(args.batch_rows)],
+                capture_output=True, text=True, env=env
+            )
+        if proc.returncode != 0:
+            print(f"❌ {n} requests failed: {proc.stderr[-2000:]}", file=sys.stderr)
+            sys.exit(1)
+
+        result = {'requests': n, 'generate_ms': generate_ms}
+        result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+        results.append(result)
+        if not args.json:
+            print(f"  {n} requests: {result['training_rows']} training rows", file=sys.stderr)
+
+    report = {'benchmark': 'priority-pipeline', 'environment': environment(), 'results': results}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(results)
+        if args.output:
+            print(f"\nResults written to {args.output}")
+
+    regressions = report.get('regressions')
+    if regressions:
+        for r in regressions:
+            print(f"❌ {r['metric']} at {r['requests']} requests: {r['baseline']} -> {r['current']} "
+                  f"({r['ratio']}x)", file=sys.stderr)
+        sys.exit(1)
+    if args.baseline and not args.json:
+        print(f"\n✅ No timing more than {args.tolerance:.0%} slower than {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures time to first prediction for a cold `predict_priority.py` spawn,
+which is what the Node.js bridge pays when no prediction server is running.
+
+Each run starts a fresh interpreter with `python -X importtime`, so the
+report also lists the slowest imports. The benchmark fails (exit code 1)
+when the median wall time exceeds the budget or when the inference path
+imports a training-only dependency.
+
+Usage: python benchmarks/bench_startup.py [--model <model_path>] [--runs 5] [--budget-ms 500]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+PREDICT_SCRIPT = ML_DIR / 'predict_priority.py'
+
+# Modules the compiled inference path must not load
+FORBIDDEN_MODULES = ['sklearn', 'pandas', 'joblib', 'scipy']
+
+SAMPLE_FEATURES = {
+    'sla_hours_remaining': 12,
+    'sla_percent_elapsed': 75,
+    'has_external_deadline': 1,
+    'days_to_deadline': 5,
+    'is_pie': 1,
+    'is_international': 0,
+    'is_statutory_audit': 1,
+    'is_tax_compliance': 0,
+    'escalation_count': 1,
+    'current_stage': 2,
+    'hours_in_stage': 30,
+    'requester_workload': 4,
+    'day_of_week': 3,
+    'is_end_of_month': 0,
+    'is_q4': 1
+}
+
+
+def build_sample_model(directory):
+    """Train a small model on random data so the benchmark runs without a database."""
+    sys.path.insert(0, str(ML_DIR))
+    import numpy as np
+    import pandas as pd
+    from priority_ml_model import PriorityMLModel
+
+    rng = np.random.default_rng(42)
+    model = PriorityMLModel()
+    n = 1000
+    df = pd.DataFrame({name: rng.integers(0, 50, n) for name in model.feature_names})
+    df['bad_outcome'] = (df['sla_percent_elapsed'] + rng.normal(0, 10, n) > 25).astype(int)
+    model.train(df)
+
+    model_path = str(Path(directory) / 'bench_model.joblib')
+    model.save_model(model_path)
+    return model_path
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into {module: (self_us, cumulative_us)}."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line.split(':', 1)[1].split('|')
+        if len(fields) != 3:
+            continue
+        imports[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return imports
+
+
+def run_once(model_path):
+    """Spawn one cold prediction; return (wall_seconds, imports)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(PREDICT_SCRIPT), model_path, json.dumps(SAMPLE_FEATURES)],
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"predict_priority.py failed: {result.stderr[-2000:]}")
+    json.loads(result.stdout)
+
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to first prediction benchmark')
+    parser.add_argument('--model', help='Model path (default: train a small sample model)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500.0,
+                        help='Fail when the median time to first prediction exceeds this')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model or build_sample_model(tmp)
+
+        walls = []
+        imports = {}
+        for _ in range(args.runs):
+            wall, imports = run_once(model_path)
+            walls.append(wall)
+
+    median_ms = statistics.median(walls) * 1000
+    import_ms = sum(self_us for self_us, _ in imports.values()) / 1000
+    top_level = {name.split('.')[0] for name in imports}
+    forbidden = sorted(m for m in FORBIDDEN_MODULES if m in top_level)
+    slowest = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)[:10]
+
+    results = {
+        'runs': args.runs,
+        'median_ms': round(median_ms, 1),
+        'min_ms': round(min(walls) * 1000, 1),
+        'max_ms': round(max(walls) * 1000, 1),
+        'import_ms': round(import_ms, 1),
+        'budget_ms': args.budget_ms,
+        'forbidden_imports': forbidden,
+        'slowest_imports': [
+            {'module': name, 'cumulative_ms': round(cumulative / 1000, 1)}
+            for name, (_, cumulative) in slowest
+        ]
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("=== Time to First Prediction ===")
+        print(f"Median: {results['median_ms']} ms (min {results['min_ms']}, max {results['max_ms']}) over {args.runs} runs")
+        print(f"Imports: {results['import_ms']} ms")
+        print("Slowest imports (cumulative):")
+        for entry in results['slowest_imports']:
+            print(f"  {entry['module']:<40} {entry['cumulative_ms']:>8.1f} ms")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"\n❌ Median {median_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    if forbidden:
+        print(f"\n❌ Inference path imported training-only modules: {', '.join(forbidden)}", file=sys.stderr)
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Startup within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Training Data Memory Benchmark
+Compares peak RSS of the training data extraction paths on a synthetic
+database:
+
+- dicts:     database.query() rows -> DataFrame -> pd.to_numeric per column
+             (the extraction before training_data.py)
+- frame:     training_data.extract_training_data().to_frame()
+- matrix:    training_data.extract_training_data().X() / .y
+
+Each path runs in a fresh interpreter so peak RSS (ru_maxrss) is not
+polluted by the others. Reported numbers are the peak minus the RSS after
+imports, i.e. what the extraction itself added.
+
+Usage: python benchmarks/bench_training_memory.py [--requests 1000000] [--source live]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+MODES = ['dicts', 'frame', 'matrix']
+
+
+def _rss_kb():
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_worker(mode, source):
+    """Extract once in this process and print a JSON result line."""
+    import pandas as pd
+    import database
+    import feature_store
+    from training_data import extract_training_data
+
+    if source == 'feature_store':
+        # Build the store outside the measurement
+        feature_store.refresh_features()
+    baseline_kb = _rss_kb()
+
+    start = time.perf_counter()
+    if mode == 'dicts':
+        sql = feature_store.TRAINING_WINDOW_SQL if source == 'feature_store' else database.TRAINING_DATA_SQL
+        df = pd.DataFrame(database.query(sql))
+        for col in database.FEATURE_COLUMNS + ['bad_outcome']:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        rows = len(df)
+        result_bytes = int(df.memory_usage(deep=True).sum())
+    elif mode == 'frame':
+        df = extract_training_data(source).to_frame()
+        rows = len(df)
+        result_bytes = int(df.memory_usage(deep=True).sum())
+    else:
+        data = extract_training_data(source)
+        X, y = data.X(), data.y
+        rows = len(y)
+        result_bytes = int(X.nbytes + y.nbytes)
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round((_rss_kb() - baseline_kb) / 1024, 1),
+        'result_mb': round(result_bytes / 1024 / 1024, 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training data extraction memory benchmark')
+    parser.add_argument('--requests', type=int, default=1000000)
+    parser.add_argument('--source', choices=['live', 'feature_store'], default='live')
+    parser.add_argument('--db', help='Existing database (default: build a synthetic one)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.source)
+        return
+
+    from synthetic_data import create_synthetic_database
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or create_synthetic_database(os.path.join(tmp, 'synthetic.db'), args.requests)
+        env = dict(os.environ, ML_DATABASE_PATH=db_path)
+
+        for mode in MODES:
+            proc = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, '--source', args.source],
+                capture_output=True, text=True, env=env
+            )
+            if proc.returncode != 0:
+                print(f"❌ {mode} failed: {proc.stderr[-2000:]}", file=sys.stderr)
+                sys.exit(1)
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps({'source': args.source, 'results': results}, indent=2))
+        return
+
+    print(f"=== Training Data Extraction Memory ({args.source}) ===")
+    print(f"{'mode':<8} {'rows':>10} {'seconds':>9} {'peak RSS MB':>12} {'result MB':>10}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['rows']:>10} {r['seconds']:>9.3f} {r['peak_rss_mb']:>12.1f} {r['result_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
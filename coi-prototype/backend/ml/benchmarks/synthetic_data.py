@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+Creates a SQLite database with the tables and columns the ML pipeline reads
+(coi_requests, sla_breach_log, ml_weights, ml_predictions, priority_config),
+filled with a realistic mix of statuses, requesters and SLA breaches.
+
+Usage: python benchmarks/synthetic_data.py <db_path> [--requests 100000] [--seed 42]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Subset of database/schema.sql + the ALTERs in backend/src/database/init.js
+SCHEMA_SQL = """
+CREATE TABLE coi_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id VARCHAR(50) UNIQUE NOT NULL,
+    requester_id INTEGER NOT NULL,
+    service_type VARCHAR(100),
+    pie_status VARCHAR(10),
+    international_operations BOOLEAN DEFAULT 0,
+    status VARCHAR(50) DEFAULT 'Draft',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    escalation_count INTEGER DEFAULT 0,
+    external_deadline DATE,
+    stage_entered_at DATETIME,
+    partner_override BOOLEAN DEFAULT 0,
+    complaint_logged BOOLEAN DEFAULT 0
+);
+CREATE INDEX idx_coi_requests_requester ON coi_requests(requester_id);
+CREATE INDEX idx_coi_requests_status ON coi_requests(status);
+CREATE INDEX idx_coi_requests_created_at ON coi_requests(created_at);
+
+CREATE TABLE sla_breach_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    coi_request_id INTEGER NOT NULL REFERENCES coi_requests(id),
+    workflow_stage VARCHAR(100) NOT NULL,
+    breach_type VARCHAR(20) NOT NULL,
+    target_hours INTEGER NOT NULL,
+    actual_hours DECIMAL(10,2) NOT NULL,
+    detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    resolved_at DATETIME,
+    notified_users TEXT
+);
+CREATE INDEX idx_sla_breach_request ON sla_breach_log(coi_request_id);
+CREATE INDEX idx_sla_breach_type ON sla_breach_log(breach_type);
+
+CREATE TABLE ml_weights (
+    model_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_type VARCHAR(50) NOT NULL,
+    model_path VARCHAR(255),
+    weights TEXT NOT NULL,
+    accuracy DECIMAL(5,4),
+    training_records INTEGER,
+    trained_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT 0,
+    activated_by INTEGER,
+    activated_at DATETIME,
+    notes TEXT
+);
+CREATE INDEX idx_ml_weights_active ON ml_weights(model_type, is_active);
+
+CREATE TABLE ml_predictions (
+    prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id VARCHAR(50) NOT NULL,
+    predicted_score INTEGER,
+    predicted_level VARCHAR(20),
+    prediction_method VARCHAR(10),
+    model_id INTEGER REFERENCES ml_weights(model_id),
+    features_snapshot TEXT,
+    predicted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    actual_outcome VARCHAR(20),
+    outcome_recorded_at DATETIME
+);
+CREATE INDEX idx_ml_predictions_request ON ml_predictions(request_id);
+CREATE INDEX idx_ml_predictions_outcome ON ml_predictions(actual_outcome, predicted_at);
+
+CREATE TABLE priority_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    factor_id VARCHAR(50) UNIQUE NOT NULL,
+    factor_name VARCHAR(100) NOT NULL,
+    weight DECIMAL(4,2) NOT NULL DEFAULT 1.0,
+    value_mappings TEXT,
+    is_active BOOLEAN DEFAULT 1
+);
+"""
+
+# (status, share of requests)
+STATUS_MIX = [
+    ('Approved', 0.62),
+    ('Rejected', 0.10),
+    ('Lapsed', 0.08),
+    ('Pending Director Approval', 0.06),
+    ('Pending Compliance', 0.05),
+    ('Pending Partner', 0.04),
+    ('Pending Finance', 0.02),
+    ('Active', 0.02),
+    ('Draft', 0.01),
+]
+
+SERVICE_TYPES = ['STATUTORY_AUDIT', 'TAX_COMPLIANCE', 'ADVISORY', 'VALUATION', 'INTERNAL_AUDIT']
+CLOSED = {'Approved', 'Rejected', 'Lapsed'}
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _weighted_choice(rng, options, weights, size):
+    import numpy as np
+    p = np.array(weights, dtype=float)
+    return rng.choice(len(options), size=size, p=p / p.sum())
+
+
+def generate_requests(n_requests, seed=42, now=None, history_days=240, chunk_size=50000):
+    """
+    Yield chunks of coi_requests rows as tuples in column order:
+    (request_id, requester_id, service_type, pie_status, international_operations,
+     status, created_at, updated_at, escalation_count, external_deadline,
+     stage_entered_at, partner_override, complaint_logged)
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    # Requesters: roughly one per 40 requests, with a skewed (Zipf-like) load
+    n_requesters = max(10, n_requests // 40)
+    statuses = [s for s, _ in STATUS_MIX]
+
+    for start in range(0, n_requests, chunk_size):
+        size = min(chunk_size, n_requests - start)
+
+        requester = (rng.zipf(1.6, size) % n_requesters) + 1
+        status_idx = _weighted_choice(rng, statuses, [w for _, w in STATUS_MIX], size)
+        service_idx = rng.integers(0, len(SERVICE_TYPES), size)
+        age_hours = rng.uniform(0, history_days * 24, size)
+        stage_hours = rng.exponential(40, size)
+        close_hours = rng.exponential(90, size)
+        is_pie = rng.random(size) < 0.18
+        is_international = rng.random(size) < 0.22
+        has_deadline = rng.random(size) < 0.30
+        deadline_days = rng.integers(1, 60, size)
+        escalations = np.where(rng.random(size) < 0.08, rng.integers(1, 5, size), 0)
+        partner_override = rng.random(size) < 0.03
+        complaint = rng.random(size) < 0.02
+
+        rows = []
+        for i in range(size):
+            status = statuses[status_idx[i]]
+            created = now - timedelta(hours=float(age_hours[i]))
+            if status in CLOSED:
+                updated = min(now, created + timedelta(hours=float(close_hours[i])))
+            else:
+                updated = min(now, created + timedelta(hours=float(stage_hours[i])))
+            stage_entered = min(updated, created + timedelta(hours=float(stage_hours[i]) / 2))
+            deadline = (created + timedelta(days=int(deadline_days[i]))).strftime('%Y-%m-%d') \
+                if has_deadline[i] else None
+
+            rows.append((
+                f"COI-SYN-{start + i + 1:08d}",
+                int(requester[i]),
+                SERVICE_TYPES[service_idx[i]],
+                'Yes' if is_pie[i] else 'No',
+                1 if is_international[i] else 0,
+                status,
+                created.strftime(TIME_FORMAT),
+                updated.strftime(TIME_FORMAT),
+                int(escalations[i]),
+                deadline,
+                stage_entered.strftime(TIME_FORMAT),
+                1 if partner_override[i] else 0,
+                1 if complaint[i] else 0,
+            ))
+        yield rows
+
+
+def generate_breaches(conn, seed=42, breach_rate=0.12, resolved_rate=0.6):
+    """Insert sla_breach_log rows for a random subset of requests."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed + 1)
+    n_requests = conn.execute('SELECT COUNT(*) FROM coi_requests').fetchone()[0]
+    n_breaches = int(n_requests * breach_rate)
+    if n_breaches == 0:
+        return 0
+
+    ids = rng.choice(np.arange(1, n_requests + 1), size=n_breaches, replace=False)
+    warning = rng.random(n_breaches) < 0.3
+    resolved = rng.random(n_breaches) < resolved_rate
+
+    conn.executemany("""
+        INSERT INTO sla_breach_log (
+            coi_request_id, workflow_stage, breach_type, target_hours,
+            actual_hours, detected_at, resolved_at
+        )
+        SELECT ?, 'Pending Compliance', ?, 48, ?, datetime(created_at, '+2 days'),
+               CASE WHEN ? THEN datetime(created_at, '+4 days') ELSE NULL END
+        FROM coi_requests WHERE id = ?
+    """, (
+        (int(ids[i]), 'WARNING' if warning[i] else 'BREACHED',
+         float(48 + i % 72), int(resolved[i]), int(ids[i]))
+        for i in range(n_breaches)
+    ))
+    return n_breaches
+
+
+def create_synthetic_database(db_path, n_requests, seed=42, now=None):
+    """
+    Create (or replace) a synthetic database with n_requests COI requests.
+    Returns the path.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.executescript(SCHEMA_SQL)
+
+        for rows in generate_requests(n_requests, seed=seed, now=now):
+            conn.executemany("""
+                INSERT INTO coi_requests (
+                    request_id, requester_id, service_type, pie_status,
+                    international_operations, status, created_at, updated_at,
+                    escalation_count, external_deadline, stage_entered_at,
+                    partner_override, complaint_logged
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        generate_breaches(conn, seed=seed)
+
+        conn.executemany("""
+            INSERT INTO priority_config (factor_id, factor_name, weight, value_mappings)
+            VALUES (?, ?, ?, '{}')
+        """, [
+            ('sla_status', 'SLA Status', 5.0),
+            ('external_deadline', 'External Deadline', 4.0),
+            ('pie_status', 'PIE Status', 3.0),
+            ('service_type', 'Service Type', 2.0),
+            ('escalation_count', 'Escalation Count', 3.0),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a synthetic COI database')
+    parser.add_argument('db_path')
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    create_synthetic_database(args.db_path, args.requests, seed=args.seed)
+    print(f"Created {args.db_path} with {args.requests} requests in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(1)
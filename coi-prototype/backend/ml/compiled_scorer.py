@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Compiled Priority Scorer
+Sklearn-free scorer for a trained PriorityMLModel.
+
+The model is a StandardScaler followed by a LogisticRegression, so scoring
+is a scale, a dot product and a sigmoid. save_model writes the parameters
+to a small JSON artifact next to the .joblib file; this module loads it with
+nothing but NumPy (or pure Python) - no pickle, pandas or scikit-learn.
+
+The NumPy backend repeats the exact floating-point operations of the
+sklearn path (subtract mean, divide by scale, matrix product, expit), so
+scores, probabilities and explanations are bit-for-bit identical. The
+pure-Python backend uses the scale-folded coefficients and agrees to
+within a few ULPs.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+
+ARTIFACT_FORMAT = 'priority-scorer'
+ARTIFACT_VERSION = 1
+
+
+def score_to_level(score):
+    """Convert numeric score to priority level."""
+    if score >= 80:
+        return 'CRITICAL'
+    elif score >= 60:
+        return 'HIGH'
+    elif score >= 40:
+        return 'MEDIUM'
+    else:
+        return 'LOW'
+
+
+def artifact_path(model_path):
+    """Path of the compiled artifact written next to a .joblib model file."""
+    return str(Path(model_path).with_suffix('.scorer.json'))
+
+
+def _expit(value):
+    """Logistic sigmoid, computed the same way as scipy.special.expit."""
+    try:
+        return 1.0 / (1.0 + math.exp(-value))
+    except OverflowError:
+        return 0.0
+
+
+class CompiledPriorityScorer:
+    """
+    Scores requests from the compiled artifact of a PriorityMLModel.
+    Exposes the same prediction API as PriorityMLModel.
+    """
+
+    def __init__(self, feature_names, mean, scale, coef, intercept, backend='auto'):
+        self.feature_names = list(feature_names)
+        self.mean = [float(v) for v in mean]
+        self.scale = [float(v) for v in scale]
+        self.coef = [float(v) for v in coef]
+        self.intercept = float(intercept)
+        self.is_trained = True
+
+        # Scaler folded into the linear model: z = folded_coef . x + folded_intercept
+        self.folded_coef = [c / s for c, s in zip(self.coef, self.scale)]
+        self.folded_intercept = self.intercept - sum(
+            c * m / s for c, m, s in zip(self.coef, self.mean, self.scale)
+        )
+
+        self._np = None
+        if backend in ('auto', 'numpy'):
+            try:
+                import numpy as np
+                self._np = np
+                self._mean_arr = np.array(self.mean)
+                self._scale_arr = np.array(self.scale)
+                self._coef_arr = np.array([self.coef])
+                self._intercept_arr = np.array([self.intercept])
+            except ImportError:
+                if backend == 'numpy':
+                    raise
+        elif backend != 'python':
+            raise ValueError(f"Unknown backend: {backend}")
+
+    @property
+    def backend(self):
+        return 'numpy' if self._np is not None else 'python'
+
+    @classmethod
+    def from_model(cls, model, backend='auto'):
+        """Build a compiled scorer from a trained PriorityMLModel."""
+        if not model.is_trained:
+            raise ValueError("Model not trained yet")
+
+        return cls(
+            model.feature_names,
+            model.scaler.mean_.tolist(),
+            model.scaler.scale_.tolist(),
+            model.model.coef_[0].tolist(),
+            float(model.model.intercept_[0]),
+            backend=backend
+        )
+
+    def to_dict(self):
+        return {
+            'format': ARTIFACT_FORMAT,
+            'version': ARTIFACT_VERSION,
+            'feature_names': self.feature_names,
+            'mean': self.mean,
+            'scale': self.scale,
+            'coef': self.coef,
+            'intercept': self.intercept,
+            'folded_coef': self.folded_coef,
+            'folded_intercept': self.folded_intercept
+        }
+
+    def save(self, filepath):
+        """Write the artifact as JSON (floats are written with full precision)."""
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath, backend='auto'):
+        """Load a compiled artifact."""
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Scorer artifact not found: {filepath}")
+
+        with open(filepath) as f:
+            data = json.load(f)
+
+        if data.get('format') != ARTIFACT_FORMAT or data.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported scorer artifact: {filepath}")
+
+        return cls(
+            data['feature_names'],
+            data['mean'],
+            data['scale'],
+            data['coef'],
+            data['intercept'],
+            backend=backend
+        )
+
+    def get_learned_weights(self):
+        """Coefficients as interpretable weights, sorted by absolute importance."""
+        weights = {
+            name: round(coef, 4)
+            for name, coef in zip(self.feature_names, self.coef)
+        }
+        return dict(sorted(weights.items(), key=lambda x: abs(x[1]), reverse=True))
+
+    def _raw_values(self, requests):
+        """Per-row raw feature values in feature_names order."""
+        if hasattr(requests, 'reindex'):
+            # pandas DataFrame
+            return requests.reindex(columns=self.feature_names, fill_value=0).values.tolist()
+        if hasattr(requests, 'tolist'):
+            # NumPy array
+            if requests.ndim != 2 or requests.shape[1] != len(self.feature_names):
+                raise ValueError(
+                    f"Expected a 2-D array with {len(self.feature_names)} columns, "
+                    f"got shape {requests.shape}"
+                )
+            return requests.tolist()
+        return [
+            [request.get(name, 0) for name in self.feature_names]
+            for request in requests
+        ]
+
+    def _score_rows(self, raw_values):
+        """Return (probabilities, contributions) for a list of raw value rows."""
+        np = self._np
+        if np is not None:
+            # Column-major like the DataFrame-backed sklearn input, so the
+            # matrix product accumulates in the same order
+            X_scaled = np.array(raw_values, dtype=float, order='F')
+            X_scaled -= self._mean_arr
+            X_scaled /= self._scale_arr
+            decision = (X_scaled @ self._coef_arr.T + self._intercept_arr).ravel()
+            probabilities = [_expit(v) for v in decision.tolist()]
+            contributions = (X_scaled * self._coef_arr[0]).tolist()
+            return probabilities, contributions
+
+        probabilities = []
+        contributions = []
+        for row in raw_values:
+            z = self.folded_intercept
+            for value, weight in zip(row, self.folded_coef):
+                z += float(value) * weight
+            probabilities.append(_expit(z))
+            contributions.append([
+                ((float(value) - mean) / scale) * coef
+                for value, mean, scale, coef in zip(row, self.mean, self.scale, self.coef)
+            ])
+        return probabilities, contributions
+
+    def predict_batch(self, requests, top_k=None):
+        """Score and explain many requests; same output as PriorityMLModel.predict_batch."""
+        raw_values = self._raw_values(requests)
+        if not raw_values:
+            return []
+
+        probabilities, contributions = self._score_rows(raw_values)
+        coefficients_rounded = [round(coef, 4) for coef in self.coef]
+
+        results = []
+        for row_values, prob, row_contributions in zip(raw_values, probabilities, contributions):
+            score = round(prob * 100)
+            explanation = [
+                {
+                    'feature': name,
+                    'value': row_values[i],
+                    'coefficient': coefficients_rounded[i],
+                    'contribution': round(row_contributions[i], 4)
+                }
+                for i, name in enumerate(self.feature_names)
+            ]
+            # Sort by contribution magnitude (same order as explain_prediction)
+            explanation.sort(key=lambda x: abs(x['contribution']), reverse=True)
+            if top_k is not None:
+                explanation = explanation[:top_k]
+            results.append({
+                'score': score,
+                'level': score_to_level(score),
+                'probability': prob,
+                'explanation': explanation
+            })
+
+        return results
+
+    def predict_priority(self, request_features):
+        """Predict priority score for a single request."""
+        result = self.predict_batch([request_features])[0]
+        return {
+            'score': result['score'],
+            'level': result['level'],
+            'probability': result['probability']
+        }
+
+    def explain_prediction(self, request_features):
+        """Feature contributions for a single request, largest first."""
+        return self.predict_batch([request_features])[0]['explanation']
+
+
+def load_scorer(model_path, backend='auto'):
+    """
+    Load the fastest available scorer for a model path.
+    Uses the compiled artifact when present (no pickle, no sklearn) and
+    falls back to unpickling the .joblib model otherwise.
+    """
+    if model_path.endswith('.scorer.json'):
+        return CompiledPriorityScorer.load(model_path, backend=backend)
+
+    compiled_path = artifact_path(model_path)
+    if os.path.exists(compiled_path):
+        return CompiledPriorityScorer.load(compiled_path, backend=backend)
+
+    from priority_ml_model import PriorityMLModel
+    return PriorityMLModel.load_model(model_path)
+
+
+def check_parity(model, scorer, requests):
+    """
+    Compare a compiled scorer against the sklearn model on a batch.
+    Returns the number of rows whose output is not bit-for-bit identical
+    and the largest probability difference.
+    """
+    expected = model.predict_batch(requests)
+    actual = scorer.predict_batch(requests)
+
+    mismatches = sum(1 for e, a in zip(expected, actual) if e != a)
+    max_diff = max(
+        (abs(e['probability'] - a['probability']) for e, a in zip(expected, actual)),
+        default=0.0
+    )
+    return {
+        'rows': len(expected),
+        'mismatches': mismatches,
+        'max_probability_diff': max_diff
+    }
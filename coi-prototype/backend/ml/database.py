@@ -3,21 +3,44 @@
 Database Connection Module
 Provides SQLite database access for Python ML scripts.
 Connects to the same database as the Node.js backend.
+
+Connections are pooled per thread (ConnectionManager): query(), execute()
+and friends reuse one tuned connection per thread instead of connecting
+and closing on every call.
 """
 
 import sqlite3
 import os
 import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
+# Applied to every connection
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,           # wait up to 5s for the Node writer instead of failing
+    'cache_size': -65536,           # 64 MB page cache (negative = KiB)
+    'mmap_size': 268435456,         # map up to 256 MB of the file
+    'temp_store': 'MEMORY'          # sorts/temp b-trees for GROUP BY stay in memory
+}
 
-def get_database_path():
-    """
-    Get the path to the SQLite database file.
-    Uses the same logic as Node.js backend to determine database name.
-    """
-    # Get environment (default to development)
-    env = os.getenv('NODE_ENV', 'development')
+# Applied to read-write connections when the database is already in WAL mode
+# (synchronous=NORMAL is only crash-safe there). The journal mode itself is
+# the Node.js app's choice: it is persistent, so we never change it.
+WAL_WRITE_PRAGMAS = {
+    'synchronous': 'NORMAL'
+}
+
+STATEMENT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=16)
+def _resolve_database_path(override, env):
+    if override:
+        return str(Path(override).resolve())
     
     # Map environment to database name (same as Node.js)
     db_names = {
@@ -38,27 +61,142 @@ def get_database_path():
     return str(db_path.resolve())
 
 
-def get_connection():
+def get_database_path():
     """
-    Get a database connection.
-    Returns a sqlite3.Connection object.
+    Get the path to the SQLite database file.
+    Uses the same logic as Node.js backend to determine database name.
+    ML_DATABASE_PATH overrides it (e.g. for benchmarks on a synthetic database).
+    The resolved path is cached per (override, environment).
     """
-    db_path = get_database_path()
-    
+    # Environment defaults to development
+    return _resolve_database_path(os.getenv('ML_DATABASE_PATH'), os.getenv('NODE_ENV', 'development'))
+
+
+def _connect(db_path, read_only=False, pragmas=None, check_same_thread=True):
+    """Open and configure a connection."""
     if not os.path.exists(db_path):
         raise FileNotFoundError(
             f"Database file not found: {db_path}\n"
             f"Please ensure the database has been initialized."
         )
     
-    conn = sqlite3.connect(db_path)
+    if read_only:
+        conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro", uri=True,
+            cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=check_same_thread
+        )
+    else:
+        conn = sqlite3.connect(
+            db_path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=check_same_thread
+        )
     conn.row_factory = sqlite3.Row  # Enable column access by name
+    
+    settings = dict(DEFAULT_PRAGMAS)
+    if not read_only and is_wal(conn):
+        settings.update(WAL_WRITE_PRAGMAS)
+    settings.update(pragmas or {})
+    for name, value in settings.items():
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.OperationalError:
+            # e.g. mmap_size unsupported on this build - not fatal
+            pass
     return conn
 
 
+def is_wal(conn):
+    """Whether the database behind conn is in WAL mode (reading it changes nothing)."""
+    try:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+    except sqlite3.OperationalError:
+        return False
+
+
+class ConnectionManager:
+    """
+    One configured connection per thread (and per process, so forked
+    workers never share a handle), reused across calls.
+    
+    Args:
+        db_path: Database file (default: get_database_path())
+        read_only: Open with the read-only URI mode (mode=ro)
+        pragmas: Extra/overriding PRAGMA settings
+    """
+    
+    def __init__(self, db_path=None, read_only=False, pragmas=None):
+        self.db_path = db_path or get_database_path()
+        self.read_only = read_only
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+    
+    def connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        # check_same_thread=False only so close() can close every thread's
+        # handle; each connection is still used by its own thread only
+        conn = _connect(self.db_path, self.read_only, self.pragmas, check_same_thread=False)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Close every connection opened by this manager."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(read_only=False):
+    """Shared ConnectionManager for the current database path."""
+    key = (get_database_path(), read_only)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = ConnectionManager(key[0], read_only=read_only)
+                _managers[key] = manager
+    return manager
+
+
+def close_connections():
+    """Close all pooled connections (e.g. before handing the database file to another process)."""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
+
+
+def get_connection(read_only=False):
+    """
+    Get a new, dedicated database connection (tuned like the pooled ones).
+    Returns a sqlite3.Connection object; the caller closes it.
+    Use this for long transactions; query()/execute() use the pool.
+    """
+    return _connect(get_database_path(), read_only)
+
+
 def query(sql, params=None):
     """
     Execute a SELECT query and return results as a list of dictionaries.
+    Inside read_snapshot() the query runs against the snapshot.
     
     Args:
         sql: SQL query string
@@ -67,9 +205,9 @@ def query(sql, params=None):
     Returns:
         List of dictionaries (one per row)
     """
-    conn = get_connection()
+    conn = read_connection()
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         if params:
             cursor.execute(sql, params)
         else:
@@ -79,7 +217,7 @@ def query(sql, params=None):
         # Convert Row objects to dictionaries
         return [dict(row) for row in rows]
     finally:
-        conn.close()
+        cursor.close()
 
 
 def query_one(sql, params=None):
@@ -94,8 +232,17 @@ def query_one(sql, params=None):
     Returns:
         Dictionary or None
     """
-    results = query(sql, params)
-    return results[0] if results else None
+    conn = read_connection()
+    cursor = conn.cursor()
+    try:
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        cursor.close()
 
 
 def execute(sql, params=None):
@@ -109,17 +256,20 @@ def execute(sql, params=None):
     Returns:
         Number of rows affected
     """
-    conn = get_connection()
+    conn = get_manager().connection()
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         if params:
             cursor.execute(sql, params)
         else:
             cursor.execute(sql)
         conn.commit()
         return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        cursor.close()
 
 
 def execute_many(sql, params_list):
@@ -133,45 +283,212 @@ def execute_many(sql, params_list):
     Returns:
         Number of rows affected
     """
-    conn = get_connection()
+    conn = get_manager().connection()
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         cursor.executemany(sql, params_list)
         conn.commit()
         return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        cursor.close()
 
 
-def get_training_data():
+
+# ── Read snapshots ──
+# Long training reads can run against one consistent view of the database
+# without holding locks the Node writer needs. While read_snapshot() is
+# active, query()/query_one()/read_connection() on that thread read from the
+# snapshot; execute()/execute_many() still write to the live database.
+
+SNAPSHOT_PAGES_PER_STEP = 1024
+SNAPSHOT_STEP_PAUSE = 0.005
+
+_snapshot_local = threading.local()
+
+
+class ReadSnapshot:
     """
-    Extract training data from the database.
-    This creates a view-like query that extracts all features needed for ML training.
+    A consistent, read-only view of the database.
     
-    Returns:
-        pandas.DataFrame with features and target variable
+    Modes:
+        backup:      copy the database with the online backup API into a temp
+                     file, pages_per_step pages at a time. In WAL mode the copy
+                     runs inside one read transaction (never blocks the writer
+                     and never restarts); otherwise it pauses between steps so
+                     the writer can take the lock.
+        transaction: pin one read transaction on a read-only connection. No
+                     copy, but requires WAL (in rollback-journal mode an open
+                     read transaction blocks writers).
     """
-    import pandas as pd
-    from datetime import datetime
     
-    sql = """
+    def __init__(self, mode='backup', pages_per_step=SNAPSHOT_PAGES_PER_STEP,
+                 step_pause=SNAPSHOT_STEP_PAUSE, directory=None):
+        if mode not in ('backup', 'transaction'):
+            raise ValueError(f"Unknown snapshot mode: {mode}")
+        self.mode = mode
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.directory = directory
+        self.conn = None
+        self.path = None
+        self.steps = 0
+        self.seconds = 0.0
+    
+    def open(self):
+        start = time.perf_counter()
+        if self.mode == 'backup':
+            self._open_backup()
+        else:
+            self._open_transaction()
+        self.seconds = time.perf_counter() - start
+        return self
+    
+    def _open_backup(self):
+        source = _connect(get_database_path(), read_only=True)
+        try:
+            wal = is_wal(source)
+            if wal:
+                # Pin the source view; the backup then copies exactly this view
+                source.execute('BEGIN')
+                source.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone()
+            
+            fd, self.path = tempfile.mkstemp(prefix='coi-snapshot-', suffix='.db', dir=self.directory)
+            os.close(fd)
+            target = sqlite3.connect(self.path)
+            
+            def progress(status, remaining, total):
+                self.steps += 1
+                if not wal and remaining and self.step_pause:
+                    time.sleep(self.step_pause)
+            
+            source.backup(target, pages=self.pages_per_step, progress=progress)
+            target.execute('PRAGMA journal_mode = DELETE')
+            target.close()
+        except Exception:
+            self._remove_file()
+            raise
+        finally:
+            source.close()
+        
+        self.conn = _connect(self.path, read_only=True)
+    
+    def _open_transaction(self):
+        conn = _connect(get_database_path(), read_only=True)
+        if not is_wal(conn):
+            conn.close()
+            raise ValueError(
+                "Transaction snapshots need WAL mode (a pinned read would block the writer). "
+                "Use mode='backup'."
+            )
+        conn.execute('BEGIN')
+        conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone()
+        self.conn = conn
+    
+    def close(self):
+        if self.conn is not None:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            self.conn.close()
+            self.conn = None
+        self._remove_file()
+    
+    def _remove_file(self):
+        if self.path:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                try:
+                    os.remove(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+            self.path = None
+
+
+@contextmanager
+def read_snapshot(mode='backup', **options):
+    """
+    Route this thread's reads to a consistent snapshot for the duration of
+    the block (see ReadSnapshot for modes and options).
+    """
+    previous = getattr(_snapshot_local, 'snapshot', None)
+    snapshot = ReadSnapshot(mode, **options).open()
+    _snapshot_local.snapshot = snapshot
+    try:
+        yield snapshot
+    finally:
+        _snapshot_local.snapshot = previous
+        snapshot.close()
+
+
+def read_connection():
+    """
+    Connection for reads on this thread: the active snapshot if any,
+    otherwise the pooled connection. Do not close it.
+    """
+    snapshot = getattr(_snapshot_local, 'snapshot', None)
+    if snapshot is not None:
+        return snapshot.conn
+    return get_manager().connection()
+
+# Closed statuses - requests in these states have a final outcome
+CLOSED_STATUSES_SQL = "('Approved', 'Rejected', 'Lapsed')"
+
+# Indexes backing the set-based feature extraction below
+TRAINING_INDEXES = [
+    ('idx_coi_requests_requester_status', 'coi_requests(requester_id, status)'),
+    ('idx_coi_requests_status_created', 'coi_requests(status, created_at)'),
+    ('idx_coi_requests_status_updated', 'coi_requests(status, updated_at)'),
+    ('idx_sla_breach_request_type_resolved', 'sla_breach_log(coi_request_id, breach_type, resolved_at)'),
+]
+
+# Feature columns, in model order (plus the bad_outcome target)
+FEATURE_COLUMNS = [
+    'sla_hours_remaining', 'sla_percent_elapsed', 'has_external_deadline',
+    'days_to_deadline', 'is_pie', 'is_international', 'is_statutory_audit',
+    'is_tax_compliance', 'escalation_count', 'current_stage', 'hours_in_stage',
+    'requester_workload', 'day_of_week', 'is_end_of_month', 'is_q4'
+]
+
+# Feature extraction template.
+# Workload and open-breach lookups are pre-aggregated once (CTEs) and joined,
+# instead of a correlated subquery per coi_requests row, so extraction time
+# grows linearly with the number of requests.
+#   {reference_time}  - the moment time-based features are measured at
+#   {extra_columns}   - additional leading columns (after request_id)
+#   {where}           - row filter on coi_requests r
+FEATURE_SQL_TEMPLATE = """
+    WITH open_workload AS (
+        -- Open requests per requester. Training rows are closed, so a row
+        -- never counts towards its own workload.
+        SELECT requester_id, COUNT(*) AS open_count
+        FROM coi_requests
+        WHERE status NOT IN {closed_statuses}
+        GROUP BY requester_id
+    ),
+    open_breaches AS (
+        SELECT DISTINCT coi_request_id
+        FROM sla_breach_log
+        WHERE breach_type = 'BREACHED'
+          AND resolved_at IS NULL
+    )
     SELECT 
-        r.request_id,
+        r.request_id,{extra_columns}
         
         -- Time-based features (calculated using stage_entered_at and default SLA target)
         -- Note: Simplified calculation - uses 48h default target. Actual SLA uses sla_config table.
         -- For training, this approximation is acceptable as ML will learn the patterns.
         CASE 
             WHEN r.stage_entered_at IS NOT NULL THEN
-                CAST((julianday(r.stage_entered_at) + (48.0 / 24.0) - julianday('now')) * 24 AS INTEGER)
+                CAST((julianday(r.stage_entered_at) + (48.0 / 24.0) - julianday({reference_time})) * 24 AS INTEGER)
             ELSE
-                CAST((julianday(r.created_at) + (48.0 / 24.0) - julianday('now')) * 24 AS INTEGER)
+                CAST((julianday(r.created_at) + (48.0 / 24.0) - julianday({reference_time})) * 24 AS INTEGER)
         END as sla_hours_remaining,
         CASE 
             WHEN r.stage_entered_at IS NOT NULL THEN
-                CAST(((julianday('now') - julianday(r.stage_entered_at)) / (48.0 / 24.0)) * 100 AS INTEGER)
+                CAST(((julianday({reference_time}) - julianday(r.stage_entered_at)) / (48.0 / 24.0)) * 100 AS INTEGER)
             ELSE
-                CAST(((julianday('now') - julianday(r.created_at)) / (48.0 / 24.0)) * 100 AS INTEGER)
+                CAST(((julianday({reference_time}) - julianday(r.created_at)) / (48.0 / 24.0)) * 100 AS INTEGER)
         END as sla_percent_elapsed,
         
         -- Deadline features
@@ -186,8 +503,8 @@ def get_training_data():
         CASE WHEN r.service_type = 'STATUTORY_AUDIT' THEN 1 ELSE 0 END as is_statutory_audit,
         CASE WHEN r.service_type = 'TAX_COMPLIANCE' THEN 1 ELSE 0 END as is_tax_compliance,
         
-        -- Escalation
-        LEAST(COALESCE(r.escalation_count, 0), 3) as escalation_count,
+        -- Escalation (capped at 3; SQLite's multi-argument MIN is the scalar minimum)
+        MIN(COALESCE(r.escalation_count, 0), 3) as escalation_count,
         
         -- Stage features
         CASE r.status 
@@ -200,13 +517,10 @@ def get_training_data():
         END as current_stage,
         
         -- Hours in current stage (using stage_entered_at if available)
-        CAST((julianday('now') - julianday(COALESCE(r.stage_entered_at, r.updated_at, r.created_at))) * 24 AS INTEGER) as hours_in_stage,
+        CAST((julianday({reference_time}) - julianday(COALESCE(r.stage_entered_at, r.updated_at, r.created_at))) * 24 AS INTEGER) as hours_in_stage,
         
         -- Requester workload (replaces assignee_workload - field doesn't exist)
-        (SELECT COUNT(*) FROM coi_requests r2 
-         WHERE r2.requester_id = r.requester_id 
-         AND r2.status NOT IN ('Approved', 'Rejected', 'Lapsed')
-         AND r2.request_id != r.request_id) as requester_workload,
+        COALESCE(w.open_count, 0) as requester_workload,
         
         -- Temporal features
         CAST(strftime('%w', r.created_at) AS INTEGER) as day_of_week,
@@ -215,12 +529,7 @@ def get_training_data():
         
         -- TARGET VARIABLE (using actual fields and sla_breach_log table)
         CASE 
-            WHEN EXISTS (
-                SELECT 1 FROM sla_breach_log b 
-                WHERE b.coi_request_id = r.id 
-                AND b.breach_type = 'BREACHED'
-                AND b.resolved_at IS NULL
-            ) THEN 1
+            WHEN b.coi_request_id IS NOT NULL THEN 1
             WHEN COALESCE(r.escalation_count, 0) > 0 THEN 1
             WHEN r.partner_override = 1 THEN 1
             WHEN r.complaint_logged = 1 THEN 1
@@ -228,27 +537,96 @@ def get_training_data():
         END as bad_outcome
         
     FROM coi_requests r
-    WHERE r.status IN ('Approved', 'Rejected', 'Lapsed')
-      AND r.created_at >= datetime('now', '-6 months')
+    LEFT JOIN open_workload w ON w.requester_id = r.requester_id
+    LEFT JOIN open_breaches b ON b.coi_request_id = r.id
+    WHERE {where}
+"""
+
+# Live extraction: closed requests from the last 6 months, measured now
+TRAINING_DATA_SQL = FEATURE_SQL_TEMPLATE.format(
+    closed_statuses=CLOSED_STATUSES_SQL,
+    reference_time="'now'",
+    extra_columns='',
+    where=f"r.status IN {CLOSED_STATUSES_SQL}\n      AND r.created_at >= datetime('now', '-6 months')"
+)
+
+
+def ensure_training_indexes():
     """
+    Create the indexes used by training feature extraction if missing.
+    Returns the names of indexes that were created.
+    """
+    existing = {
+        row['name'] for row in query("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    created = []
+    for name, target in TRAINING_INDEXES:
+        if name not in existing:
+            execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            created.append(name)
+    return created
+
+
+# Progress markers for incremental jobs (feature store refresh, ...)
+JOB_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS ml_job_state (
+        job_name VARCHAR(50) PRIMARY KEY,
+        watermark TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def get_watermark(job_name, conn=None):
+    """
+    Return the stored watermark for an incremental job, or None.
+    Pass conn to read inside an open transaction.
+    """
+    if conn is None:
+        execute(JOB_STATE_SQL)
+        row = query_one("SELECT watermark FROM ml_job_state WHERE job_name = ?", (job_name,))
+    else:
+        conn.execute(JOB_STATE_SQL)
+        row = conn.execute(
+            "SELECT watermark FROM ml_job_state WHERE job_name = ?", (job_name,)
+        ).fetchone()
+    return row['watermark'] if row else None
+
+
+def set_watermark(job_name, watermark, conn=None):
+    """
+    Store the watermark for an incremental job.
+    Pass conn to write inside an open transaction (committed by the caller).
+    """
+    sql = """
+        INSERT INTO ml_job_state (job_name, watermark, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(job_name) DO UPDATE SET
+            watermark = excluded.watermark,
+            updated_at = excluded.updated_at
+    """
+    if conn is None:
+        execute(JOB_STATE_SQL)
+        execute(sql, (job_name, watermark))
+    else:
+        conn.execute(JOB_STATE_SQL)
+        conn.execute(sql, (job_name, watermark))
+
+
+def get_training_data(source='feature_store', refresh=True):
+    """
+    Extract training data from the database.
     
-    rows = query(sql)
-    
-    if not rows:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(rows)
-    
-    # Ensure numeric types
-    numeric_cols = [
-        'sla_hours_remaining', 'sla_percent_elapsed', 'has_external_deadline',
-        'days_to_deadline', 'is_pie', 'is_international', 'is_statutory_audit',
-        'is_tax_compliance', 'escalation_count', 'current_stage', 'hours_in_stage',
-        'requester_workload', 'day_of_week', 'is_end_of_month', 'is_q4', 'bad_outcome'
-    ]
+    Args:
+        source: 'feature_store' (default) refreshes the ml_features table and
+            reads frozen feature rows from it; 'live' recomputes features for
+            the whole window with TRAINING_DATA_SQL.
+        refresh: refresh ml_features before reading (feature_store only)
     
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    Returns:
+        pandas.DataFrame with features and target variable (compact integer
+        columns, see training_data.COLUMN_DTYPES)
+    """
+    from training_data import extract_training_data
     
-    return df
+    return extract_training_data(source, refresh=refresh).to_frame()
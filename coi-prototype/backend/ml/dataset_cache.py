@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Training Dataset Cache
+Keeps extracted training sets on disk as one .npy file per column, so a
+re-run (e.g. after training failed at a later step) or an ad-hoc experiment
+memory-maps the arrays instead of querying SQLite again.
+
+Entries are keyed by a fingerprint of the source data: row counts and
+latest timestamps of coi_requests, sla_breach_log and ml_features, the
+hash of the extraction SQL and the start of the 6-month window (so the key
+rolls over daily as the window moves). Any change to the source produces a
+new key; old entries are evicted by age and total size.
+
+Usage: python dataset_cache.py [--list | --clear | --evict]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+from training_data import COLUMN_DTYPES, TrainingData, extract_training_data
+
+CACHE_DIR = Path(os.getenv('ML_DATASET_CACHE_DIR', Path(__file__).parent / 'cache' / 'datasets'))
+CACHE_FORMAT_VERSION = 1
+MAX_AGE_DAYS = 30
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+
+FINGERPRINT_SQL = {
+    'coi_requests': "SELECT COUNT(*) AS n, MAX(updated_at) AS latest FROM coi_requests",
+    # sla_breach_log has no updated_at - rows change when detected or resolved
+    'sla_breach_log': """
+        SELECT COUNT(*) AS n, MAX(detected_at) AS latest, MAX(resolved_at) AS latest_resolved
+        FROM sla_breach_log
+    """,
+    'ml_features': "SELECT COUNT(*) AS n, MAX(frozen_at) AS latest FROM ml_features"
+}
+
+
+def _extraction_sql(source):
+    if source == 'feature_store':
+        import feature_store
+        return feature_store.TRAINING_WINDOW_SQL
+    return database.TRAINING_DATA_SQL
+
+
+def fingerprint(source='feature_store'):
+    """Describe the source data; equal fingerprints mean equal training sets."""
+    tables = {}
+    for table, sql in FINGERPRINT_SQL.items():
+        if table == 'ml_features' and source != 'feature_store':
+            continue
+        tables[table] = database.query_one(sql)
+
+    return {
+        'format': CACHE_FORMAT_VERSION,
+        'source': source,
+        'tables': tables,
+        'sql_sha256': hashlib.sha256(_extraction_sql(source).encode('utf-8')).hexdigest(),
+        'window_start': database.query_one("SELECT date('now', '-6 months') AS d")['d'],
+        'dtypes': {name: np.dtype(dtype).str for name, dtype in COLUMN_DTYPES.items()}
+    }
+
+
+def cache_key(fp):
+    return hashlib.sha256(json.dumps(fp, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+
+
+class DatasetCache:
+    """
+    On-disk cache of TrainingData, one directory per key:
+        <key>/meta.json, <key>/request_id.npy, <key>/<column>.npy
+    """
+
+    def __init__(self, cache_dir=None, max_age_days=MAX_AGE_DAYS, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.last_key = None
+        self.last_hit = False
+
+    def load(self, key, mmap=True):
+        """Return cached TrainingData for key (memory-mapped), or None."""
+        entry = self.cache_dir / key
+        meta_path = entry / 'meta.json'
+        if not meta_path.exists():
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            mode = 'r' if mmap else None
+            request_ids = np.load(entry / 'request_id.npy', mmap_mode=mode)
+            columns = {
+                name: np.load(entry / f'{name}.npy', mmap_mode=mode)
+                for name in meta['columns']
+            }
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Dataset cache entry {key} unreadable, ignoring: {e}", file=sys.stderr)
+            return None
+
+        # Last use drives eviction
+        os.utime(meta_path)
+        return TrainingData(request_ids, columns)
+
+    def store(self, key, data, fp):
+        """Write data under key (atomically: written to a temp dir, then renamed)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self.cache_dir / key
+        tmp = self.cache_dir / f'.{key}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        try:
+            # Fixed-width strings, so request ids can be memory-mapped too
+            np.save(tmp / 'request_id.npy', np.asarray(data.request_ids, dtype=str))
+            for name, column in data.columns.items():
+                np.save(tmp / f'{name}.npy', column)
+            with open(tmp / 'meta.json', 'w') as f:
+                json.dump({
+                    'key': key,
+                    'rows': len(data),
+                    'columns': list(data.columns),
+                    'created_at': datetime.now().isoformat(),
+                    'fingerprint': fp
+                }, f, indent=2)
+            try:
+                tmp.rename(entry)
+            except OSError:
+                # Another process stored the same key first
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def get_training_data(self, source='feature_store', refresh=True, mmap=True):
+        """
+        Return TrainingData for the current database state, from the cache
+        when the fingerprint matches, otherwise extracted and then cached.
+        """
+        if source == 'feature_store' and refresh:
+            import feature_store
+            feature_store.refresh_features()
+
+        fp = fingerprint(source)
+        key = cache_key(fp)
+        self.last_key = key
+
+        data = self.load(key, mmap=mmap)
+        self.last_hit = data is not None
+        if data is not None:
+            return data
+
+        data = extract_training_data(source, refresh=False)
+        if len(data):
+            self.store(key, data, fp)
+            self.evict(keep=key)
+        return data
+
+    def entries(self):
+        """List cache entries as dicts (key, rows, bytes, last_used)."""
+        result = []
+        if not self.cache_dir.exists():
+            return result
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / 'meta.json'
+            if entry.name.startswith('.') or not meta_path.exists():
+                continue
+            with open(meta_path) as f:
+                meta = json.load(f)
+            result.append({
+                'key': entry.name,
+                'rows': meta.get('rows'),
+                'created_at': meta.get('created_at'),
+                'last_used': meta_path.stat().st_mtime,
+                'bytes': sum(p.stat().st_size for p in entry.iterdir())
+            })
+        return sorted(result, key=lambda e: e['last_used'])
+
+    def evict(self, keep=None):
+        """Drop entries unused for max_age_days, then least recently used ones above max_bytes."""
+        removed = []
+        entries = self.entries()
+        cutoff = time.time() - self.max_age_days * 86400
+
+        for entry in list(entries):
+            if entry['key'] != keep and entry['last_used'] < cutoff:
+                removed.append(entry['key'])
+                entries.remove(entry)
+
+        total = sum(entry['bytes'] for entry in entries)
+        for entry in list(entries):
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            removed.append(entry['key'])
+            total -= entry['bytes']
+
+        for key in removed:
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the training dataset cache')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--list', action='store_true', help='List cached datasets (default)')
+    group.add_argument('--evict', action='store_true', help='Evict stale entries')
+    group.add_argument('--clear', action='store_true', help='Remove every cached dataset')
+    args = parser.parse_args()
+
+    cache = DatasetCache()
+    if args.clear:
+        cache.clear()
+        print(json.dumps({'cleared': str(cache.cache_dir)}))
+    elif args.evict:
+        print(json.dumps({'evicted': cache.evict()}))
+    else:
+        print(json.dumps(cache.entries(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Drift Monitor
+Compares the live feature distribution (ml_predictions.features_snapshot)
+with a reference distribution for the same model, and flags retraining when
+they diverge.
+
+The reference is built from the first snapshots logged for the model, so
+both sides come from the same feature path (Node extractFeatures on open
+requests, with its stage mapping and clamping). Training data is not a
+usable reference: closed requests have current_stage 0 and unclamped
+time/SLA features, so they would never match live traffic. The reference
+profile holds per feature either the exact value counts (flags and small
+codes) or a 10-bin quantile histogram.
+
+Monitoring streams the snapshots logged since a watermark in chunks and
+adds them to histograms over the reference bins. Live counts are kept in
+blocks of BLOCK_ROWS predictions and only the latest WINDOW_ROWS are
+compared, so recent drift is not diluted by months of older traffic. PSI
+and the (binned) KS distance are recomputed from the window. Memory is
+bounded by the number of bins and blocks, not by the number of predictions.
+State (watermark, reference and window per model) lives in ml_drift_stats,
+so each run only reads new predictions.
+
+Usage: python drift_monitor.py [--model-id N] [--psi-threshold 0.2] [--check] [--reset]
+  --check  exit 0 when retraining is recommended, 1 otherwise, e.g.
+           python3 drift_monitor.py --check && python3 train_priority_model.py
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+PROFILE_FORMAT = 'priority-feature-profile'
+PROFILE_VERSION = 2
+
+MAX_CATEGORIES = 20
+N_BINS = 10
+PSI_THRESHOLD = 0.2         # > 0.2 is the usual "significant shift" level
+KS_THRESHOLD = 0.15
+MIN_ROWS = 500              # don't judge drift on a handful of predictions
+REFERENCE_ROWS = 1000       # first predictions per model that form the reference
+WINDOW_ROWS = 5000          # live predictions compared against the reference
+BLOCK_ROWS = 500            # the window advances in blocks of this many rows
+CHUNK_SIZE = 10000
+PSI_EPSILON = 1e-4
+
+# Same fill values as PriorityMLModel.prepare_features (everything else: 0)
+MISSING_DEFAULTS = {'days_to_deadline': 999}
+
+DRIFT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ml_drift_stats (
+        model_id INTEGER PRIMARY KEY REFERENCES ml_weights(model_id),
+        watermark INTEGER NOT NULL DEFAULT 0,
+        rows INTEGER NOT NULL DEFAULT 0,
+        reference TEXT,
+        counts TEXT,
+        stats TEXT,
+        max_psi REAL,
+        drift_detected BOOLEAN DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SNAPSHOTS_SQL = """
+    SELECT prediction_id, features_snapshot
+    FROM ml_predictions
+    WHERE prediction_id > ?
+      AND model_id = ?
+    ORDER BY prediction_id
+"""
+
+
+def ensure_drift_table():
+    database.execute(DRIFT_TABLE_SQL)
+    columns = {row['name'] for row in database.query("PRAGMA table_info(ml_drift_stats)")}
+    if 'reference' not in columns:
+        # Rows from before the reference column were counted against a
+        # training profile; without a reference they are rebuilt on next run
+        database.execute("ALTER TABLE ml_drift_stats ADD COLUMN reference TEXT")
+
+
+# ── Profiles ──
+
+def build_profile(X, feature_names, max_categories=MAX_CATEGORIES, n_bins=N_BINS):
+    """
+    Per-feature histograms of a feature matrix (columns in feature_names order).
+    Features with at most max_categories distinct values keep exact value
+    counts (plus an 'unseen' bucket); others get quantile bin edges.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for j, name in enumerate(feature_names):
+        column = X[:, j]
+        values, counts = np.unique(column, return_counts=True)
+        if len(values) <= max_categories:
+            spec = {'kind': 'categorical', 'values': values.tolist()}
+            counts = np.append(counts, 0)
+        else:
+            quantiles = np.quantile(column, np.linspace(0, 1, n_bins + 1)[1:-1])
+            spec = {'kind': 'binned', 'edges': np.unique(quantiles).tolist()}
+            counts = np.bincount(bucketize(spec, column), minlength=len(spec['edges']) + 1)
+        spec['counts'] = counts.tolist()
+        features[name] = spec
+
+    return {
+        'format': PROFILE_FORMAT,
+        'version': PROFILE_VERSION,
+        'rows': int(X.shape[0]),
+        'feature_names': list(feature_names),
+        'features': features
+    }
+
+
+def bucketize(spec, values):
+    """Map raw values to histogram bucket indices for one feature."""
+    values = np.asarray(values, dtype=np.float64)
+    if spec['kind'] == 'binned':
+        return np.searchsorted(np.asarray(spec['edges']), values, side='right')
+
+    known = np.asarray(spec['values'], dtype=np.float64)
+    index = np.searchsorted(known, values)
+    clipped = np.minimum(index, len(known) - 1)
+    # Values never seen in the reference go to the last ('unseen') bucket
+    return np.where(known[clipped] == values, clipped, len(known))
+
+
+# ── Statistics ──
+
+def psi(expected_counts, actual_counts, epsilon=PSI_EPSILON):
+    """Population Stability Index between two histograms over the same buckets."""
+    expected = np.asarray(expected_counts, dtype=np.float64)
+    actual = np.asarray(actual_counts, dtype=np.float64)
+    e = np.maximum(expected / max(expected.sum(), 1), epsilon)
+    a = np.maximum(actual / max(actual.sum(), 1), epsilon)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks_distance(expected_counts, actual_counts):
+    """Kolmogorov-Smirnov distance between the two binned (ordered) distributions."""
+    expected = np.asarray(expected_counts, dtype=np.float64)
+    actual = np.asarray(actual_counts, dtype=np.float64)
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(e - a)))
+
+
+class DriftMonitor:
+    """
+    Incremental drift statistics for one model: a reference profile from
+    its first reference_rows snapshots, and a sliding window of the latest
+    window_rows snapshots counted over the reference bins.
+    """
+
+    def __init__(self, model_id, feature_names=None, psi_threshold=PSI_THRESHOLD,
+                 ks_threshold=KS_THRESHOLD, min_rows=MIN_ROWS, reference_rows=REFERENCE_ROWS,
+                 window_rows=WINDOW_ROWS, block_rows=BLOCK_ROWS):
+        self.model_id = model_id
+        self.feature_names = list(feature_names or database.FEATURE_COLUMNS)
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.min_rows = min_rows
+        self.reference_rows = reference_rows
+        self.block_rows = block_rows
+        self.max_blocks = max(1, window_rows // block_rows)
+
+        self.watermark = 0
+        self.profile = None
+        self.pending = []       # reference rows collected so far (until the profile is built)
+        self.blocks = []        # [{'rows': n, 'counts': {name: array}}], oldest first
+
+    # ── State ──
+
+    def load_state(self):
+        row = database.query_one(
+            "SELECT watermark, reference, counts FROM ml_drift_stats WHERE model_id = ?", (self.model_id,)
+        )
+        if not row or not row['reference']:
+            return
+        reference = json.loads(row['reference'])
+        if 'pending' in reference:
+            self.pending = reference['pending']
+        elif reference.get('format') == PROFILE_FORMAT and reference.get('version') == PROFILE_VERSION:
+            self.profile = reference
+            self.blocks = [
+                {'rows': block['rows'], 'counts': {name: np.asarray(c, dtype=np.int64)
+                                                   for name, c in block['counts'].items()}}
+                for block in json.loads(row['counts'] or '[]')
+            ]
+        else:
+            return
+        self.watermark = row['watermark']
+
+    def save_state(self, stats):
+        reference = self.profile if self.profile is not None else {'pending': self.pending}
+        database.execute("""
+            INSERT INTO ml_drift_stats (model_id, watermark, rows, reference, counts, stats, max_psi,
+                                        drift_detected, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(model_id) DO UPDATE SET
+                watermark = excluded.watermark,
+                rows = excluded.rows,
+                reference = excluded.reference,
+                counts = excluded.counts,
+                stats = excluded.stats,
+                max_psi = excluded.max_psi,
+                drift_detected = excluded.drift_detected,
+                updated_at = excluded.updated_at
+        """, (
+            self.model_id,
+            self.watermark,
+            stats['rows'],
+            json.dumps(reference),
+            json.dumps([
+                {'rows': block['rows'], 'counts': {name: c.tolist() for name, c in block['counts'].items()}}
+                for block in self.blocks
+            ]),
+            json.dumps(stats['features']),
+            stats['max_psi'],
+            1 if stats['drift_detected'] else 0
+        ))
+
+    # ── Streaming ──
+
+    @property
+    def rows(self):
+        """Predictions in the current window."""
+        return sum(block['rows'] for block in self.blocks)
+
+    def _new_block(self):
+        return {
+            'rows': 0,
+            'counts': {
+                name: np.zeros(len(spec['counts']), dtype=np.int64)
+                for name, spec in self.profile['features'].items()
+            }
+        }
+
+    def add_snapshots(self, snapshots):
+        """Add a chunk of feature dicts: first to the reference, then to the window."""
+        if not snapshots:
+            return
+        X = np.array(
+            [
+                [
+                    value if (value := snapshot.get(name)) is not None else MISSING_DEFAULTS.get(name, 0)
+                    for name in self.feature_names
+                ]
+                for snapshot in snapshots
+            ],
+            dtype=np.float64
+        )
+
+        if self.profile is None:
+            needed = self.reference_rows - len(self.pending)
+            self.pending.extend(X[:needed].tolist())
+            X = X[needed:]
+            if len(self.pending) < self.reference_rows:
+                return
+            self.profile = build_profile(self.pending, self.feature_names)
+            self.pending = []
+
+        while len(X):
+            if not self.blocks or self.blocks[-1]['rows'] >= self.block_rows:
+                self.blocks.append(self._new_block())
+                # Slide the window: drop the oldest block
+                del self.blocks[:-self.max_blocks]
+            block = self.blocks[-1]
+            part, X = X[:self.block_rows - block['rows']], X[self.block_rows - block['rows']:]
+            for j, name in enumerate(self.feature_names):
+                spec = self.profile['features'][name]
+                block['counts'][name] += np.bincount(bucketize(spec, part[:, j]),
+                                                     minlength=len(block['counts'][name]))
+            block['rows'] += len(part)
+
+    def consume(self, chunk_size=CHUNK_SIZE):
+        """Stream predictions logged since the watermark. Returns the number of rows read."""
+        cursor = database.read_connection().cursor()
+        read = 0
+        try:
+            cursor.row_factory = None
+            cursor.arraysize = chunk_size
+            cursor.execute(SNAPSHOTS_SQL, (self.watermark, self.model_id))
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                snapshots = []
+                for prediction_id, snapshot in rows:
+                    try:
+                        features = json.loads(snapshot) if snapshot else None
+                    except ValueError:
+                        features = None
+                    # Rows logged without features ('{}') carry no information
+                    if features:
+                        snapshots.append(features)
+                self.add_snapshots(snapshots)
+                self.watermark = rows[-1][0]
+                read += len(rows)
+        finally:
+            cursor.close()
+        return read
+
+    def statistics(self):
+        if self.profile is None:
+            return {
+                'model_id': self.model_id,
+                'rows': 0,
+                'reference_rows': len(self.pending),
+                'watermark': self.watermark,
+                'max_psi': 0.0,
+                'drifted_features': [],
+                'drift_detected': False,
+                'features': {}
+            }
+
+        features = {}
+        for name, spec in self.profile['features'].items():
+            window = sum((block['counts'][name] for block in self.blocks), np.zeros(len(spec['counts'])))
+            features[name] = {
+                'psi': round(psi(spec['counts'], window), 4),
+                'ks': round(ks_distance(spec['counts'], window), 4)
+            }
+
+        max_psi = max((f['psi'] for f in features.values()), default=0.0)
+        drifted = sorted(
+            name for name, f in features.items()
+            if f['psi'] > self.psi_threshold or f['ks'] > self.ks_threshold
+        )
+        rows = self.rows
+        enough = rows >= self.min_rows
+        return {
+            'model_id': self.model_id,
+            'rows': rows,
+            'reference_rows': self.profile['rows'],
+            'watermark': self.watermark,
+            'max_psi': max_psi,
+            'drifted_features': drifted if enough else [],
+            'drift_detected': bool(enough and drifted),
+            'features': features
+        }
+
+
+def active_model():
+    return database.query_one("""
+        SELECT model_id, model_path
+        FROM ml_weights
+        WHERE model_type = 'priority_weights'
+          AND is_active = 1
+        ORDER BY trained_at DESC
+        LIMIT 1
+    """)
+
+
+def run(model_id=None, reset=False, **thresholds):
+    """Update drift statistics for a model (default: the active one)."""
+    if model_id is None:
+        row = active_model()
+        if row is None:
+            raise ValueError("No active ML model")
+    else:
+        row = database.query_one("SELECT model_id, model_path FROM ml_weights WHERE model_id = ?", (model_id,))
+        if row is None:
+            raise ValueError(f"Unknown model_id: {model_id}")
+
+    ensure_drift_table()
+    monitor = DriftMonitor(row['model_id'], **thresholds)
+    if not reset:
+        monitor.load_state()
+    monitor.consume()
+    stats = monitor.statistics()
+    monitor.save_state(stats)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feature drift monitor')
+    parser.add_argument('--model-id', type=int, help='Model to check (default: active model)')
+    parser.add_argument('--psi-threshold', type=float, default=PSI_THRESHOLD)
+    parser.add_argument('--ks-threshold', type=float, default=KS_THRESHOLD)
+    parser.add_argument('--min-rows', type=int, default=MIN_ROWS)
+    parser.add_argument('--reference-rows', type=int, default=REFERENCE_ROWS,
+                        help='First predictions of the model used as the reference')
+    parser.add_argument('--window-rows', type=int, default=WINDOW_ROWS,
+                        help='Latest predictions compared against the reference')
+    parser.add_argument('--reset', action='store_true',
+                        help='Discard the reference and counts and rebuild them from all logged predictions')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit 0 when retraining is recommended, 1 otherwise')
+    args = parser.parse_args()
+
+    try:
+        stats = run(
+            args.model_id, reset=args.reset, psi_threshold=args.psi_threshold,
+            ks_threshold=args.ks_threshold, min_rows=args.min_rows,
+            reference_rows=args.reference_rows, window_rows=args.window_rows
+        )
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(2 if args.check else 1)
+
+    print(json.dumps(stats))
+    if args.check:
+        sys.exit(0 if stats['drift_detected'] else 1)
+
+
+if __name__ == '__main__':
+    main()
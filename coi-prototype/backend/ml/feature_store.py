@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Feature Store
+Materialized training features in the ml_features table.
+
+A request's feature row is computed once, when it reaches a closed status
+(Approved, Rejected, Lapsed), and never recomputed: time-based features are
+measured at the request's updated_at (the moment it closed) instead of
+julianday('now'), so the same request yields the same row on every training
+run. Requester workload and open SLA breaches are taken at refresh time, so
+refresh regularly (training does it automatically) to keep them close to
+the closing moment.
+
+Refreshes are incremental: only closed requests with updated_at at or past
+the stored watermark are scanned, and rows that already exist are left as
+they are (INSERT OR IGNORE), which also makes a refresh safe to repeat.
+
+Every inserted row gets a seq number, increasing across refreshes and never
+reused (rowid is not stable: VACUUM may renumber it). Jobs that consume new
+rows (incremental_model.py, outcome_backfill.py) use (generation, seq) from
+get_position() as their watermark; generation is bumped by every rebuild.
+
+Usage: python feature_store.py [--rebuild]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+JOB_NAME = 'ml_features'
+GENERATION_JOB = 'ml_features.generation'
+
+FEATURES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ml_features (
+        request_id VARCHAR(50) PRIMARY KEY,
+        created_at DATETIME NOT NULL,
+        closed_at DATETIME,
+        sla_hours_remaining INTEGER,
+        sla_percent_elapsed INTEGER,
+        has_external_deadline INTEGER,
+        days_to_deadline INTEGER,
+        is_pie INTEGER,
+        is_international INTEGER,
+        is_statutory_audit INTEGER,
+        is_tax_compliance INTEGER,
+        escalation_count INTEGER,
+        current_stage INTEGER,
+        hours_in_stage INTEGER,
+        requester_workload INTEGER,
+        day_of_week INTEGER,
+        is_end_of_month INTEGER,
+        is_q4 INTEGER,
+        bad_outcome INTEGER NOT NULL,
+        frozen_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        seq INTEGER
+    )
+"""
+
+FEATURES_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_ml_features_created ON ml_features(created_at)"
+SEQ_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_ml_features_seq ON ml_features(seq)"
+
+_STORED_COLUMNS = ['request_id', 'created_at', 'closed_at', 'seq'] + database.FEATURE_COLUMNS + ['bad_outcome']
+
+# Closed requests updated in [watermark, cutoff], measured at their close time
+REFRESH_SQL = f"""
+    INSERT OR IGNORE INTO ml_features ({', '.join(_STORED_COLUMNS)})
+""" + database.FEATURE_SQL_TEMPLATE.format(
+    closed_statuses=database.CLOSED_STATUSES_SQL,
+    reference_time='r.updated_at',
+    extra_columns='\n        r.created_at,\n        r.updated_at as closed_at,'
+                  '\n        :seq + ROW_NUMBER() OVER (ORDER BY r.updated_at, r.request_id) as seq,',
+    where=f"r.status IN {database.CLOSED_STATUSES_SQL}\n"
+          "      AND r.updated_at >= :watermark\n"
+          "      AND r.updated_at <= :cutoff"
+)
+
+CUTOFF_SQL = f"""
+    SELECT MAX(updated_at) AS cutoff
+    FROM coi_requests
+    WHERE status IN {database.CLOSED_STATUSES_SQL}
+      AND updated_at >= ?
+"""
+
+# Highest seq and the rebuild generation, read in one statement
+POSITION_SQL = f"""
+    SELECT (SELECT COALESCE(MAX(seq), 0) FROM ml_features) AS seq,
+           (SELECT watermark FROM ml_job_state WHERE job_name = '{GENERATION_JOB}') AS generation
+"""
+
+# Training read: the same 6-month window as the live extraction
+TRAINING_WINDOW_SQL = f"""
+    SELECT request_id, {', '.join(database.FEATURE_COLUMNS)}, bad_outcome
+    FROM ml_features
+    WHERE created_at >= datetime('now', '-6 months')
+"""
+
+
+def ensure_feature_store(conn):
+    conn.execute(FEATURES_TABLE_SQL)
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(ml_features)")}
+    if 'seq' not in columns:
+        # Tables created before seq existed: number the rows in insertion order
+        conn.execute("ALTER TABLE ml_features ADD COLUMN seq INTEGER")
+        conn.execute("UPDATE ml_features SET seq = rowid")
+    conn.execute(FEATURES_INDEX_SQL)
+    conn.execute(SEQ_INDEX_SQL)
+
+
+def get_position():
+    """
+    Current (generation, seq) of ml_features: the rebuild generation and the
+    highest seq. Rows with seq above a stored position were added after it;
+    a different generation means the table was rebuilt in between.
+    """
+    database.execute(database.JOB_STATE_SQL)
+    row = database.query_one(POSITION_SQL)
+    return int(row['generation'] or 0), int(row['seq'])
+
+
+def refresh_features(rebuild=False):
+    """
+    Freeze feature rows for requests closed since the last refresh.
+    With rebuild=True the table is cleared and repopulated from scratch.
+
+    Returns:
+        dict with rows_added, watermark (before) and cutoff (new watermark)
+    """
+    database.ensure_training_indexes()
+
+    conn = database.get_connection()
+    try:
+        # Take the write lock up front so the watermark and the rows it covers
+        # are read and written in one consistent step
+        conn.execute('BEGIN IMMEDIATE')
+        ensure_feature_store(conn)
+
+        # seq keeps counting across rebuilds, so a number is never reused
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM ml_features").fetchone()['seq']
+        if rebuild:
+            conn.execute('DELETE FROM ml_features')
+            generation = int(database.get_watermark(GENERATION_JOB, conn) or 0) + 1
+            database.set_watermark(GENERATION_JOB, str(generation), conn)
+            watermark = ''
+        else:
+            watermark = database.get_watermark(JOB_NAME, conn) or ''
+
+        cutoff = conn.execute(CUTOFF_SQL, (watermark,)).fetchone()['cutoff']
+        rows_added = 0
+        if cutoff is not None:
+            cursor = conn.execute(REFRESH_SQL, {'watermark': watermark, 'cutoff': cutoff, 'seq': seq})
+            rows_added = cursor.rowcount
+            database.set_watermark(JOB_NAME, cutoff, conn)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        'rows_added': rows_added,
+        'watermark': watermark or None,
+        'cutoff': cutoff or watermark or None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the ml_features table')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Clear the table and recompute every closed request')
+    args = parser.parse_args()
+
+    try:
+        result = refresh_features(rebuild=args.rebuild)
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Incremental Priority Model
+Keeps a linear model current between the monthly full retrains.
+
+The model is a logistic-loss SGDClassifier updated with partial_fit on the
+requests closed since the last checkpoint (new ml_features rows), with a
+running StandardScaler (partial_fit) in front of it. Each update reads only
+the new rows, so its cost is proportional to the number of newly closed
+requests, not to the 6-month window. Class imbalance is handled like
+class_weight='balanced' in the batch model, using the cumulative class
+counts as sample weights.
+
+Checkpoints are saved as a model file plus the compiled scorer artifact and
+recorded in ml_weights with model_type 'priority_incremental' (inactive),
+next to the batch 'priority_weights' rows. The checkpoint covers ml_features
+up to a (generation, seq) position (see feature_store.get_position), also
+recorded in notes. The first run, and the first run after a feature store
+rebuild, bootstraps from the whole training window.
+
+Usage: python incremental_model.py [--bootstrap-epochs 5] [--rebuild]
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+from priority_ml_model import PriorityMLModel
+
+MODEL_TYPE = 'priority_incremental'
+
+LATEST_CHECKPOINT_SQL = """
+    SELECT model_id, model_path, notes
+    FROM ml_weights
+    WHERE model_type = ?
+    ORDER BY trained_at DESC, model_id DESC
+    LIMIT 1
+"""
+
+# ml_features.seq increases with every inserted row, so it is the watermark
+NEW_ROWS_SQL = f"""
+    SELECT request_id, {', '.join(database.FEATURE_COLUMNS)}, bad_outcome
+    FROM ml_features
+    WHERE seq > ? AND seq <= ?
+"""
+
+BOOTSTRAP_SQL = f"""
+    SELECT request_id, {', '.join(database.FEATURE_COLUMNS)}, bad_outcome
+    FROM ml_features
+    WHERE seq <= ?
+      AND created_at >= datetime('now', '-6 months')
+"""
+
+
+class IncrementalPriorityModel(PriorityMLModel):
+    """
+    PriorityMLModel backed by SGDClassifier(loss='log_loss') and updated in
+    place with partial_fit. Scoring, explanations, get_learned_weights and
+    the compiled artifact work exactly as for the batch model.
+    """
+
+    def __init__(self, alpha=1e-3):
+        super().__init__()
+        from sklearn.linear_model import SGDClassifier
+
+        self.model = SGDClassifier(
+            loss='log_loss',        # logistic regression, so predict_proba is available
+            penalty='l2',
+            alpha=alpha,
+            average=True,           # averaged SGD: stable coefficients from noisy updates
+            random_state=42
+        )
+        self.class_counts = np.zeros(2, dtype=np.int64)
+        self.feature_generation = None
+        self.watermark = 0
+        self.n_updates = 0
+
+    def _sample_weight(self, y):
+        # Same weights as class_weight='balanced', from all rows seen so far
+        counts = np.maximum(self.class_counts, 1)
+        weights = counts.sum() / (2.0 * counts)
+        return weights[y]
+
+    def partial_fit(self, X, y, epochs=1):
+        """
+        Update the scaler and the model with one batch.
+        X: raw feature matrix (columns in feature_names order), y: 0/1 labels.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.int64)
+        if len(y) == 0:
+            return 0
+
+        self.class_counts += np.bincount(y, minlength=2)
+        self.scaler.partial_fit(X)
+        X_scaled = self.scaler.transform(X)
+        sample_weight = self._sample_weight(y)
+
+        for _ in range(epochs):
+            self.model.partial_fit(X_scaled, y, classes=np.array([0, 1]), sample_weight=sample_weight)
+        self.is_trained = True
+        self.n_updates += 1
+        return len(y)
+
+    def evaluate(self, X, y):
+        """Accuracy on a batch (before it is learned, this is the prequential accuracy)."""
+        if not self.is_trained or len(y) == 0:
+            return None
+        X_scaled = self.scaler.transform(np.asarray(X, dtype=np.float64))
+        return float(self.model.score(X_scaled, np.asarray(y)))
+
+    def _model_state(self):
+        state = super()._model_state()
+        state.update({
+            'class_counts': self.class_counts,
+            'feature_generation': self.feature_generation,
+            'watermark': self.watermark,
+            'n_updates': self.n_updates
+        })
+        return state
+
+    def _set_model_state(self, data):
+        super()._set_model_state(data)
+        self.class_counts = data.get('class_counts', np.zeros(2, dtype=np.int64))
+        # Checkpoints from before seq watermarks have no generation: bootstrap
+        self.feature_generation = data.get('feature_generation')
+        self.watermark = data.get('watermark', 0)
+        self.n_updates = data.get('n_updates', 0)
+
+
+def _load_rows(sql, params):
+    from training_data import stream_training_data
+
+    data = stream_training_data(sql, params)
+    return data.X(), data.y.astype(np.int64)
+
+
+def update(bootstrap_epochs=5, rebuild=False, chunk_size=50000):
+    """
+    Apply the ml_features rows added since the latest checkpoint and save a
+    new checkpoint. Returns a summary dict (no checkpoint when nothing changed).
+    """
+    import feature_store
+
+    feature_store.refresh_features()
+    generation, max_seq = feature_store.get_position()
+
+    latest = None if rebuild else database.query_one(LATEST_CHECKPOINT_SQL, (MODEL_TYPE,))
+    model = None
+    if latest and latest['model_path'] and os.path.exists(latest['model_path']):
+        model = IncrementalPriorityModel.load_model(latest['model_path'])
+        if model.feature_generation != generation:
+            print("ml_features was rebuilt since the last checkpoint; bootstrapping", file=sys.stderr)
+            model = None
+
+    if model is None:
+        model = IncrementalPriorityModel()
+        model.feature_generation = generation
+        X, y = _load_rows(BOOTSTRAP_SQL, (max_seq,))
+        mode = 'bootstrap'
+        epochs = bootstrap_epochs
+    else:
+        X, y = _load_rows(NEW_ROWS_SQL, (model.watermark, max_seq))
+        mode = 'update'
+        epochs = 1
+
+    previous_watermark = model.watermark
+    if len(y) == 0:
+        return {'mode': mode, 'rows': 0, 'watermark': previous_watermark, 'model_id': latest and latest['model_id']}
+
+    # Accuracy on the new rows before learning them
+    prequential_accuracy = model.evaluate(X, y)
+    for start in range(0, len(y), chunk_size):
+        model.partial_fit(X[start:start + chunk_size], y[start:start + chunk_size], epochs=epochs)
+    model.watermark = max_seq
+
+    models_dir = Path(__file__).parent / 'models'
+    models_dir.mkdir(exist_ok=True)
+    model_path = models_dir / f"priority_incremental_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.joblib"
+    model.save_model(str(model_path))
+
+    # Bootstrap has no held-out rows - report accuracy on the window instead
+    accuracy = model.evaluate(X, y) if prequential_accuracy is None else prequential_accuracy
+    database.execute("""
+        INSERT INTO ml_weights (model_type, model_path, weights, accuracy, training_records, trained_at, is_active, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        MODEL_TYPE,
+        str(model_path),
+        json.dumps(model.get_learned_weights()),
+        accuracy,
+        int(model.class_counts.sum()),
+        datetime.now().isoformat(),
+        0,
+        json.dumps({
+            'generation': generation,
+            'watermark': max_seq,
+            'previous_watermark': previous_watermark,
+            'rows': int(len(y)),
+            'mode': mode,
+            'accuracy': 'prequential' if prequential_accuracy is not None else 'training'
+        })
+    ))
+    model_id = database.query_one(LATEST_CHECKPOINT_SQL, (MODEL_TYPE,))['model_id']
+
+    return {
+        'mode': mode,
+        'rows': int(len(y)),
+        'watermark': max_seq,
+        'accuracy': accuracy,
+        'model_id': model_id,
+        'model_path': str(model_path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally update the priority model')
+    parser.add_argument('--bootstrap-epochs', type=int, default=5,
+                        help='Passes over the training window when there is no checkpoint yet')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Ignore existing checkpoints and bootstrap again')
+    args = parser.parse_args()
+
+    try:
+        result = update(bootstrap_epochs=args.bootstrap_epochs, rebuild=args.rebuild)
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Model Registry
+Caches loaded priority models and follows activation changes in ml_weights.
+
+- Models are cached by model_id and validated against the file's
+  mtime/size (and content hash when those change), with LRU eviction.
+- The active model is found by polling ml_weights. Polls are cheap:
+  PRAGMA data_version tells us whether anything was committed since the
+  last poll, and only then is ml_weights queried.
+- Swaps are atomic: callers take a (model_id, scorer) snapshot, so a
+  prediction that started on the old model finishes on it.
+- A candidate model can be kept warm next to the active one so both can
+  score the same batch.
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+from compiled_scorer import artifact_path, load_scorer
+
+ACTIVE_MODEL_SQL = """
+    SELECT model_id, model_path, accuracy
+    FROM ml_weights
+    WHERE model_type = ?
+      AND is_active = 1
+    ORDER BY trained_at DESC
+    LIMIT 1
+"""
+
+MODEL_BY_ID_SQL = """
+    SELECT model_id, model_path, accuracy
+    FROM ml_weights
+    WHERE model_id = ?
+"""
+
+
+def _file_fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _CachedModel:
+    def __init__(self, model_id, model_path, source_path, fingerprint, content_hash, scorer):
+        self.model_id = model_id
+        self.model_path = model_path
+        self.source_path = source_path
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self.scorer = scorer
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of loaded models keyed by ml_weights.model_id.
+    """
+
+    def __init__(self, model_type='priority_weights', max_models=4, poll_interval=5.0,
+                 min_accuracy=0.7, db_path=None):
+        self.model_type = model_type
+        self.max_models = max_models
+        self.poll_interval = poll_interval
+        self.min_accuracy = min_accuracy
+        self.db_path = db_path or database.get_database_path()
+
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._conn = None
+        self._data_version = None
+        self._last_poll = 0.0
+
+        # (model_id, scorer) snapshots, replaced atomically
+        self._active = (None, None)
+        self._candidate = (None, None)
+
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    # ── Database polling ──
+
+    def _connection(self):
+        if self._conn is None:
+            if not os.path.exists(self.db_path):
+                raise FileNotFoundError(f"Database file not found: {self.db_path}")
+            self._conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _lookup(self, sql, params):
+        with self._lock:
+            row = self._connection().execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def poll(self, force=False):
+        """
+        Check ml_weights for an activation change and swap the active model.
+        Returns True when the active model changed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_poll < self.poll_interval:
+                return False
+            self._last_poll = now
+
+            conn = self._connection()
+            data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+            active_id = self._active[0]
+            if not force and data_version == self._data_version and active_id is not None:
+                # No commits since last poll - only pick up an in-place file change
+                return self._refresh_active(active_id, self._cache[active_id].model_path)
+            self._data_version = data_version
+
+            row = conn.execute(ACTIVE_MODEL_SQL, (self.model_type,)).fetchone()
+
+        if row is None or (row['accuracy'] or 0) < self.min_accuracy:
+            changed = self._active[0] is not None
+            self._active = (None, None)
+            return changed
+
+        if row['model_id'] == self._active[0]:
+            return self._refresh_active(row['model_id'], row['model_path'])
+
+        scorer = self.get(row['model_id'], row['model_path'])
+        self._active = (row['model_id'], scorer)
+        print(f"Active model is now {row['model_id']} ({row['model_path']})", file=sys.stderr)
+        return True
+
+    def _refresh_active(self, model_id, model_path):
+        """Reload the active model if its file changed; returns True when swapped."""
+        previous = self._active[1]
+        scorer = self.get(model_id, model_path)
+        self._active = (model_id, scorer)
+        return scorer is not previous
+
+    # ── Cache ──
+
+    def get(self, model_id, model_path=None):
+        """
+        Return the scorer for model_id, loading it if missing or changed on disk.
+        model_path is looked up in ml_weights when not given.
+        """
+        if model_path is None:
+            row = self._lookup(MODEL_BY_ID_SQL, (model_id,))
+            if row is None:
+                raise ValueError(f"Unknown model_id: {model_id}")
+            model_path = row['model_path']
+
+        with self._lock:
+            entry = self._cache.get(model_id)
+            if entry is not None and entry.model_path == model_path:
+                try:
+                    fingerprint = _file_fingerprint(entry.source_path)
+                except OSError:
+                    # File being replaced - keep serving the cached copy
+                    fingerprint = entry.fingerprint
+                if fingerprint == entry.fingerprint:
+                    self._cache.move_to_end(model_id)
+                    self.hits += 1
+                    return entry.scorer
+                if _file_hash(entry.source_path) == entry.content_hash:
+                    # Touched but unchanged
+                    entry.fingerprint = fingerprint
+                    self._cache.move_to_end(model_id)
+                    self.hits += 1
+                    return entry.scorer
+
+        # Load outside the lock so other models keep serving meanwhile
+        compiled_path = artifact_path(model_path)
+        source_path = compiled_path if os.path.exists(compiled_path) else model_path
+        fingerprint = _file_fingerprint(source_path)
+        content_hash = _file_hash(source_path)
+        scorer = load_scorer(model_path)
+
+        with self._lock:
+            self._cache[model_id] = _CachedModel(
+                model_id, model_path, source_path, fingerprint, content_hash, scorer
+            )
+            self._cache.move_to_end(model_id)
+            self.loads += 1
+            self._evict()
+        return scorer
+
+    def _evict(self):
+        pinned = {self._active[0], self._candidate[0]}
+        while len(self._cache) > self.max_models:
+            victim = next((mid for mid in self._cache if mid not in pinned), None)
+            if victim is None:
+                break
+            del self._cache[victim]
+            self.evictions += 1
+
+    # ── Active / candidate ──
+
+    def active(self):
+        """Return the (model_id, scorer) snapshot of the active model, polling if due."""
+        try:
+            self.poll()
+        except Exception as e:
+            # Database busy or model file unreadable - keep serving the current model
+            if self._active[1] is None:
+                raise
+            print(f"Model registry poll failed, keeping model {self._active[0]}: {e}", file=sys.stderr)
+        if self._active[1] is None:
+            raise ValueError("No active ML model")
+        return self._active
+
+    def set_candidate(self, model_id):
+        """Keep another model warm next to the active one (None to clear)."""
+        if model_id is None:
+            self._candidate = (None, None)
+            return
+        self._candidate = (model_id, self.get(model_id))
+
+    def candidate(self):
+        return self._candidate
+
+    def score(self, requests, top_k=None):
+        """Score a batch with the active model."""
+        model_id, scorer = self.active()
+        return {'model_id': model_id, 'results': scorer.predict_batch(requests, top_k=top_k)}
+
+    def score_with_candidate(self, requests, top_k=None):
+        """Score the same batch with the active and the candidate model."""
+        active_id, active_scorer = self.active()
+        candidate_id, candidate_scorer = self._candidate
+        result = {
+            'active': {
+                'model_id': active_id,
+                'results': active_scorer.predict_batch(requests, top_k=top_k)
+            }
+        }
+        if candidate_scorer is not None:
+            # Refresh in case the candidate file changed on disk
+            candidate_scorer = self.get(candidate_id)
+            result['candidate'] = {
+                'model_id': candidate_id,
+                'results': candidate_scorer.predict_batch(requests, top_k=top_k)
+            }
+        return result
+
+    def stats(self):
+        return {
+            'active_model_id': self._active[0],
+            'candidate_model_id': self._candidate[0],
+            'cached_models': list(self._cache.keys()),
+            'loads': self.loads,
+            'hits': self.hits,
+            'evictions': self.evictions
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
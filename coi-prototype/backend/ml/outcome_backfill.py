@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Outcome Backfill
+Fills ml_predictions.actual_outcome / outcome_recorded_at once a request is
+closed, and reports prediction quality per model.
+
+The outcome is the training label: a prediction is 'BAD' when the request's
+frozen ml_features row has bad_outcome = 1, 'GOOD' otherwise, so monitoring
+and training agree by construction.
+
+Each run is incremental. Two watermarks in ml_job_state bound the work:
+- ml_features (generation, seq): requests that closed since the last run,
+  matched to their pending predictions through idx_ml_predictions_request.
+  After a feature store rebuild every row is matched again.
+- ml_predictions prediction_id: predictions logged since the last run whose
+  request was already closed
+Updates are written with executemany in chunked transactions so the Node
+writer never waits long for the lock.
+
+Usage: python outcome_backfill.py [--report] [--days 30] [--json]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+FEATURES_JOB = 'outcome_backfill.features'
+PREDICTIONS_JOB = 'outcome_backfill.predictions'
+CHUNK_SIZE = 5000
+
+BACKFILL_INDEXES = [
+    ('idx_ml_predictions_recorded', 'ml_predictions(outcome_recorded_at)'),
+]
+
+# ml_predictions.request_id holds coi_requests.request_id, or the numeric id
+# when the request had no request_id yet - match both, each through an index.
+# The unary + keeps SQLite from driving the join off the (mostly NULL)
+# actual_outcome index, which would scan every pending prediction.
+_OUTCOME_SELECT = """
+    SELECT p.prediction_id,
+           CASE WHEN f.bad_outcome = 1 THEN 'BAD' ELSE 'GOOD' END AS outcome
+"""
+
+NEWLY_CLOSED_SQL = _OUTCOME_SELECT + """
+    FROM ml_features f
+    JOIN coi_requests r ON r.request_id = f.request_id
+    JOIN ml_predictions p ON p.request_id IN (f.request_id, CAST(r.id AS TEXT))
+    WHERE f.seq > ? AND f.seq <= ?
+      AND +p.actual_outcome IS NULL
+"""
+
+NEW_PREDICTIONS_SQL = _OUTCOME_SELECT + """
+    FROM ml_predictions p
+    LEFT JOIN coi_requests r ON r.id = CAST(p.request_id AS INTEGER)
+                             AND p.request_id GLOB '[0-9]*'
+    JOIN ml_features f ON f.request_id = COALESCE(r.request_id, p.request_id)
+    WHERE p.prediction_id > ? AND p.prediction_id <= ?
+      AND +p.actual_outcome IS NULL
+"""
+
+UPDATE_SQL = """
+    UPDATE ml_predictions
+    SET actual_outcome = ?, outcome_recorded_at = CURRENT_TIMESTAMP
+    WHERE prediction_id = ? AND actual_outcome IS NULL
+"""
+
+REPORT_SQL = """
+    SELECT prediction_method, COALESCE(model_id, 0) AS model_id, predicted_score,
+           CASE WHEN actual_outcome = 'BAD' THEN 1 ELSE 0 END AS bad
+    FROM ml_predictions
+    WHERE outcome_recorded_at >= datetime('now', ?)
+      AND actual_outcome IS NOT NULL
+"""
+
+# Levels that count as "predicted bad" (score >= 60, see score_to_level)
+POSITIVE_SCORE = 60
+CALIBRATION_BINS = 10
+
+
+def ensure_indexes():
+    existing = {
+        row['name'] for row in database.query("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    for name, target in BACKFILL_INDEXES:
+        if name not in existing:
+            database.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def _write_outcomes(updates, chunk_size):
+    """Apply (outcome, prediction_id) pairs in chunks; one transaction per chunk."""
+    written = 0
+    for start in range(0, len(updates), chunk_size):
+        written += database.execute_many(UPDATE_SQL, updates[start:start + chunk_size])
+    return written
+
+
+def backfill(chunk_size=CHUNK_SIZE):
+    """
+    Record outcomes for predictions whose request closed since the last run.
+    Returns counts of rows examined and written.
+    """
+    import feature_store
+
+    feature_store.refresh_features()
+    ensure_indexes()
+
+    # FEATURES_JOB holds "generation:seq"; a rebuild (or a value in an older
+    # format) starts over from the first row
+    generation, features_to = feature_store.get_position()
+    stored = (database.get_watermark(FEATURES_JOB) or '').split(':')
+    features_from = int(stored[1]) if len(stored) == 2 and int(stored[0]) == generation else 0
+    predictions_from = int(database.get_watermark(PREDICTIONS_JOB) or 0)
+    predictions_to = database.query_one(
+        "SELECT COALESCE(MAX(prediction_id), 0) AS n FROM ml_predictions"
+    )['n']
+
+    updates = {}
+    for sql, params in (
+        (NEWLY_CLOSED_SQL, (features_from, features_to)),
+        (NEW_PREDICTIONS_SQL, (predictions_from, predictions_to)),
+    ):
+        for row in database.query(sql, params):
+            updates[row['prediction_id']] = row['outcome']
+
+    pairs = [(outcome, prediction_id) for prediction_id, outcome in sorted(updates.items())]
+    written = _write_outcomes(pairs, chunk_size)
+
+    database.set_watermark(FEATURES_JOB, f"{generation}:{features_to}")
+    database.set_watermark(PREDICTIONS_JOB, str(predictions_to))
+
+    # seq can have gaps (numbers taken by rows a refresh skipped), so count rows
+    newly_closed = database.query_one(
+        "SELECT COUNT(*) AS n FROM ml_features WHERE seq > ? AND seq <= ?", (features_from, features_to)
+    )['n']
+
+    return {
+        'newly_closed_requests': newly_closed,
+        'new_predictions': predictions_to - predictions_from,
+        'outcomes_recorded': written
+    }
+
+
+def _metrics(scores, bad):
+    """Vectorized quality metrics for one group of predictions."""
+    predicted_bad = scores >= POSITIVE_SCORE
+    actual_bad = bad == 1
+    tp = int(np.sum(predicted_bad & actual_bad))
+    fp = int(np.sum(predicted_bad & ~actual_bad))
+    fn = int(np.sum(~predicted_bad & actual_bad))
+
+    probability = scores / 100.0
+    bins = np.minimum((probability * CALIBRATION_BINS).astype(np.int64), CALIBRATION_BINS - 1)
+    counts = np.bincount(bins, minlength=CALIBRATION_BINS)
+    predicted_sum = np.bincount(bins, weights=probability, minlength=CALIBRATION_BINS)
+    observed_sum = np.bincount(bins, weights=bad, minlength=CALIBRATION_BINS)
+    nonempty = counts > 0
+    mean_predicted = np.divide(predicted_sum, counts, out=np.zeros(CALIBRATION_BINS), where=nonempty)
+    observed_rate = np.divide(observed_sum, counts, out=np.zeros(CALIBRATION_BINS), where=nonempty)
+
+    n = len(scores)
+    return {
+        'predictions': n,
+        'bad_rate': round(float(bad.mean()), 4),
+        'accuracy': round(float(np.mean(predicted_bad == actual_bad)), 4),
+        'precision': round(tp / (tp + fp), 4) if tp + fp else None,
+        'recall': round(tp / (tp + fn), 4) if tp + fn else None,
+        'brier': round(float(np.mean((probability - bad) ** 2)), 4),
+        # Expected calibration error: count-weighted gap between predicted and observed
+        'ece': round(float(np.sum(counts * np.abs(mean_predicted - observed_rate)) / n), 4),
+        'calibration': [
+            {
+                'bin': f"{i * 100 // CALIBRATION_BINS}-{(i + 1) * 100 // CALIBRATION_BINS}",
+                'count': int(counts[i]),
+                'mean_predicted': round(float(mean_predicted[i]), 4),
+                'observed_rate': round(float(observed_rate[i]), 4)
+            }
+            for i in range(CALIBRATION_BINS) if nonempty[i]
+        ]
+    }
+
+
+def accuracy_report(days=30):
+    """
+    Quality metrics per (prediction_method, model_id) for outcomes recorded
+    in the last `days` days. Scores >= 60 (HIGH/CRITICAL) count as predicted bad.
+    """
+    cursor = database.read_connection().cursor()
+    try:
+        cursor.row_factory = None
+        cursor.execute(REPORT_SQL, (f'-{int(days)} days',))
+        methods, model_ids, scores, bad = [], [], [], []
+        while True:
+            rows = cursor.fetchmany(50000)
+            if not rows:
+                break
+            m, i, s, b = zip(*rows)
+            methods.extend(m)
+            model_ids.append(np.array(i, dtype=np.int64))
+            scores.append(np.array([v or 0 for v in s], dtype=np.float64))
+            bad.append(np.array(b, dtype=np.float64))
+    finally:
+        cursor.close()
+
+    if not methods:
+        return []
+
+    methods = np.array(methods, dtype=object)
+    model_ids = np.concatenate(model_ids)
+    scores = np.concatenate(scores)
+    bad = np.concatenate(bad)
+
+    report = []
+    for method in sorted(set(methods)):
+        in_method = methods == method
+        for model_id in np.unique(model_ids[in_method]):
+            mask = in_method & (model_ids == model_id)
+            entry = {'prediction_method': method, 'model_id': int(model_id) or None}
+            entry.update(_metrics(scores[mask], bad[mask]))
+            report.append(entry)
+    return report
+
+
+def print_report(report):
+    print(f"{'method':<8} {'model':>6} {'n':>9} {'acc':>7} {'prec':>7} {'recall':>7} {'brier':>7} {'ece':>7}")
+    for entry in report:
+        fmt = lambda v: f"{v:>7.3f}" if v is not None else f"{'-':>7}"
+        print(f"{entry['prediction_method']:<8} {str(entry['model_id'] or '-'):>6} {entry['predictions']:>9} "
+              f"{fmt(entry['accuracy'])} {fmt(entry['precision'])} {fmt(entry['recall'])} "
+              f"{fmt(entry['brier'])} {fmt(entry['ece'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill prediction outcomes and report accuracy')
+    parser.add_argument('--report', action='store_true', help='Print the accuracy report after the backfill')
+    parser.add_argument('--days', type=int, default=30, help='Report window (outcomes recorded in the last N days)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    try:
+        result = backfill()
+        report = accuracy_report(args.days) if args.report else None
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps({'backfill': result, 'report': report}, indent=2))
+        return
+
+    print(f"Recorded {result['outcomes_recorded']} outcomes "
+          f"({result['newly_closed_requests']} newly closed requests, {result['new_predictions']} new predictions)")
+    if report is not None:
+        print()
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
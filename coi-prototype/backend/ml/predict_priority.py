@@ -4,19 +4,166 @@ Priority Prediction Script
 Called by Node.js to get ML predictions for priority scoring.
 
 Usage: python predict_priority.py <model_path> <features_json>
+       python predict_priority.py --batch <model_path> <requests_file|-> [--top-k <n>]
+       python predict_priority.py --serve <model_path>|--active [--socket <path>] [--cache-size <n>] [--log-predictions]
+
+With --batch the file (or stdin for '-') holds a JSON array of feature
+objects or one JSON object per line (NDJSON); a JSON array of results is
+printed in the same order.
+
+With --serve the model is loaded once and newline-delimited JSON requests are
+answered over stdin/stdout (or a Unix socket). With --active the server
+follows the active model in ml_weights instead of a fixed file, and
+--cache-size memoizes results for repeated feature vectors.
+--log-predictions writes requests that carry a "log" object to ml_predictions
+through a buffered logger (prediction_logger.py).
+See prediction_server.py and model_registry.py.
 """
 
 import sys
 import json
+import signal
 from pathlib import Path
 
 # Add parent directory to path to import modules
 sys.path.insert(0, str(Path(__file__).parent))
 
-from priority_ml_model import PriorityMLModel
+from compiled_scorer import load_scorer
+
+
+def read_batch(source):
+    """Read feature dicts from a JSON array or an NDJSON file ('-' for stdin)."""
+    if source == '-':
+        text = sys.stdin.read()
+    else:
+        with open(source, encoding='utf-8') as f:
+            text = f.read()
+
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def int_option(args, name, default=None):
+    """Integer value of `name <n>` in args; JSON error and exit 1 if missing or not an integer."""
+    if name not in args:
+        return default
+    index = args.index(name)
+    try:
+        return int(args[index + 1])
+    except (IndexError, ValueError):
+        print(json.dumps({'error': f'{name} requires an integer'}), file=sys.stderr)
+        sys.exit(1)
+
+
+def batch(args):
+    """Score a whole queue of requests in one call."""
+    if len(args) < 2:
+        print(json.dumps({
+            'error': 'Usage: python predict_priority.py --batch <model_path> <requests_file|-> [--top-k <n>]'
+        }), file=sys.stderr)
+        sys.exit(1)
+
+    model_path, source = args[0], args[1]
+    top_k = int_option(args, '--top-k')
+
+    try:
+        requests = read_batch(source)
+        model = load_scorer(model_path)
+        results = model.predict_batch(requests, top_k=top_k)
+        print(json.dumps(results))
+    except FileNotFoundError as e:
+        print(json.dumps({
+            'error': f'File not found: {e}'
+        }), file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(json.dumps({
+            'error': f'Model error: {e}'
+        }), file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({
+            'error': f'Unexpected error: {str(e)}'
+        }), file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def serve(args):
+    """Run the long-lived prediction server."""
+    from prediction_server import PredictionServer
+
+    if not args:
+        print(json.dumps({
+            'error': 'Usage: python predict_priority.py --serve <model_path>|--active [--socket <path>] [--cache-size <n>] [--log-predictions]'
+        }), file=sys.stderr)
+        sys.exit(1)
+
+    model_path = args[0]
+    registry = None
+    if model_path == '--active':
+        from model_registry import ModelRegistry
+        model_path = None
+        registry = ModelRegistry()
+
+    socket_path = None
+    if '--socket' in args:
+        index = args.index('--socket')
+        if index + 1 >= len(args):
+            print(json.dumps({'error': '--socket requires a path'}), file=sys.stderr)
+            sys.exit(1)
+        socket_path = args[index + 1]
+
+    cache_size = int_option(args, '--cache-size', default=0)
+
+    logger = None
+    if '--log-predictions' in args:
+        from prediction_logger import PredictionLogger
+        logger = PredictionLogger()
+
+    try:
+        server = PredictionServer(model_path, registry=registry, cache_size=cache_size, logger=logger)
+    except FileNotFoundError as e:
+        print(json.dumps({
+            'error': f'Model file not found: {e}'
+        }), file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(json.dumps({
+            'error': f'Model error: {e}'
+        }), file=sys.stderr)
+        sys.exit(1)
+
+    # SIGTERM (e.g. from Node.js) unwinds normally so queued predictions are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if socket_path:
+            server.serve_unix_socket(socket_path)
+        else:
+            server.serve_stdio()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if logger is not None:
+            unwritten = logger.close()
+            if unwritten:
+                print(json.dumps({'error': f'{unwritten} logged predictions were not written'}), file=sys.stderr)
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch(sys.argv[2:])
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(sys.argv[2:])
+        return
+
     if len(sys.argv) < 3:
         print(json.dumps({
             'error': 'Usage: python predict_priority.py <model_path> <features_json>'
@@ -30,8 +177,8 @@ def main():
         # Parse features
         features = json.loads(features_json)
         
-        # Load model
-        model = PriorityMLModel.load_model(model_path)
+        # Load model (compiled artifact when available)
+        model = load_scorer(model_path)
         
         # Make prediction
         prediction = model.predict_priority(features)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Prediction Logger
+Write-behind logging of predictions to ml_predictions.
+
+Logging one prediction per INSERT means one write transaction (and one WAL
+sync) per prediction against the database the app uses. PredictionLogger
+queues records in memory and a background thread writes them with
+executemany, one transaction per batch: a batch is flushed when it reaches
+batch_size records or when its oldest record is flush_interval seconds old.
+
+log() never blocks scoring: when the queue is full the record is dropped and
+counted. A batch that could not be written because the database stayed
+locked is retried with the next flush, keeping at most max_pending records
+(older ones are dropped and counted); other database errors drop the batch.
+If the writer thread stops on an unexpected error, log() drops from then on. predicted_at is taken when the record is logged, not when it is
+written. close() drains the queue and commits the last batch with
+synchronous=FULL, so everything logged before shutdown is on disk; it
+returns the number of logged records that could not be written (e.g. the
+database stayed locked), which is also reported on stderr.
+
+metrics() reports queue depth, records written/dropped and flush latency.
+"""
+
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0        # seconds a record may wait before its batch is written
+MAX_QUEUE = 50000
+MAX_PENDING = 50000         # records kept for retry while the database stays locked
+RETRY_DELAYS = (0.05, 0.2, 1.0)   # database locked: back off, then keep the batch for the next flush
+
+INSERT_SQL = """
+    INSERT INTO ml_predictions (
+        request_id, predicted_score, predicted_level, prediction_method,
+        model_id, features_snapshot, predicted_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_FLUSH = object()
+_STOP = object()
+
+
+class PredictionLogger:
+    """
+    Buffered ml_predictions writer with a single background writer thread.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE,
+                 max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flushed = threading.Condition()
+        self._flush_requests = 0
+        self._flushes_done = 0
+        self._closed = False
+
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.flush_seconds_last = 0.0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name='prediction-logger', daemon=True)
+        self._thread.start()
+
+    # ── Producer side ──
+
+    def log(self, request_id, score, level, method, model_id, features_json):
+        """Queue one prediction. Returns False if it was dropped (queue full or closed)."""
+        if self._closed or not self._thread.is_alive():
+            self.dropped += 1
+            return False
+        record = (
+            str(request_id),
+            score,
+            level,
+            method,
+            model_id,
+            features_json,
+            datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        )
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.logged += 1
+        return True
+
+    def flush(self, timeout=10.0):
+        """Write everything queued so far; waits until it is committed."""
+        if not self._thread.is_alive():
+            return False
+        with self._flushed:
+            self._flush_requests += 1
+            target = self._flush_requests
+        self._queue.put(_FLUSH)
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._flushes_done >= target, timeout)
+
+    def close(self, timeout=30.0):
+        """
+        Drain the queue, commit durably and stop the writer thread.
+        Returns the number of logged records that were not written.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        return self.logged - self.written
+
+    # ── Writer thread ──
+
+    def _run(self):
+        conn = database.get_connection()
+        batch = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    # Pick up anything queued behind the stop marker, then write durably
+                    while True:
+                        try:
+                            record = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if isinstance(record, tuple):
+                            batch.append(record)
+                    unwritten = self._write(conn, batch, durable=True)
+                    if unwritten:
+                        print(f"Prediction logger stopped with {len(unwritten)} unwritten records",
+                              file=sys.stderr)
+                    break
+
+                if item is _FLUSH:
+                    batch = self._write(conn, batch)
+                    deadline = None
+                    with self._flushed:
+                        self._flushes_done += 1
+                        self._flushed.notify_all()
+                    continue
+
+                if item is not None:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                if len(batch) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                    batch = self._write(conn, batch)
+                    deadline = time.monotonic() + self.flush_interval if batch else None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Prediction logger stopped: {e}", file=sys.stderr)
+        finally:
+            conn.close()
+            with self._flushed:
+                self._flushes_done = self._flush_requests
+                self._flushed.notify_all()
+
+    def _write(self, conn, batch, durable=False):
+        """
+        Write a batch in one transaction. Returns the records still pending:
+        empty on success or on a non-retryable database error (the batch is
+        dropped), otherwise the batch capped at max_pending records.
+        """
+        if not batch:
+            return batch
+
+        start = time.perf_counter()
+        if durable:
+            conn.execute("PRAGMA synchronous = FULL")
+        for delay in RETRY_DELAYS + (None,):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(INSERT_SQL, batch)
+                conn.commit()
+                break
+            except sqlite3.Error as e:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+                self.last_error = str(e)
+                if not isinstance(e, sqlite3.OperationalError):
+                    # Constraint or corruption errors won't go away on retry
+                    self.failed_flushes += 1
+                    self.dropped += len(batch)
+                    print(f"Prediction log flush failed, {len(batch)} records dropped: {e}", file=sys.stderr)
+                    return []
+                if delay is None:
+                    self.failed_flushes += 1
+                    excess = len(batch) - self.max_pending
+                    if excess > 0:
+                        self.dropped += excess
+                        batch = batch[excess:]
+                    print(f"Prediction log flush failed, {len(batch)} records kept: {e}", file=sys.stderr)
+                    return batch
+                time.sleep(delay)
+
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.written += len(batch)
+        self.flush_seconds_last = elapsed
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        return []
+
+    # ── Metrics ──
+
+    def metrics(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'logged': self.logged,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'avg_batch': round(self.written / self.flushes, 1) if self.flushes else 0,
+            'flush_ms_last': round(self.flush_seconds_last * 1000, 3),
+            'flush_ms_avg': round(self.flush_seconds_total * 1000 / self.flushes, 3) if self.flushes else 0,
+            'flush_ms_max': round(self.flush_seconds_max * 1000, 3),
+            'last_error': self.last_error
+        }
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Priority Prediction Server
+Long-lived prediction process used by Node.js instead of one spawn per request.
+
+The model is loaded once and requests are answered as newline-delimited JSON,
+either over stdin/stdout or over a local Unix socket. The model file is watched
+for changes and reloaded in place; requests already running keep the model
+they started with, and a failed reload keeps serving the previous model.
+
+With a ModelRegistry (--active) the server follows the active row in
+ml_weights instead of a fixed file, and can keep a candidate model warm to
+score the same batch for comparison.
+
+With cache_size > 0 results are memoized per feature vector and model
+(see scoring_cache.py); the cache is cleared whenever the model changes.
+
+With a PredictionLogger, requests that carry a "log" object are written to
+ml_predictions in batches by the logger's writer thread (see
+prediction_logger.py) instead of one INSERT per prediction by the caller.
+
+Request:  {"id": 1, "features": {...}}
+          {"id": 1, "features": {...}, "log": {"request_id": "COI-1", "model_id": 3}}
+Response: {"id": 1, "score": 72, "level": "HIGH", "probability": 0.72, "explanation": [...]}
+
+Commands:
+    {"id": 2, "command": "predict_batch", "requests": [{...}, ...], "top_k": 5}
+    {"id": 3, "command": "ping"}
+    {"id": 4, "command": "reload", "model_path": "/path/to/model.joblib"}
+    {"id": 5, "command": "candidate", "model_id": 12}          (registry mode)
+    {"id": 6, "command": "predict_batch", "requests": [...], "compare": true}
+    {"id": 7, "command": "predict_batch", "requests": [...], "log": [{"request_id": ...}, ...]}
+    {"id": 8, "command": "flush"}                               (with a logger)
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from compiled_scorer import artifact_path, load_scorer
+from scoring_cache import MemoizedScorer
+
+
+class PredictionServer:
+    """
+    Holds a loaded model and answers prediction requests.
+    Thread-safe: the model reference is swapped atomically on reload.
+    """
+
+    def __init__(self, model_path=None, registry=None, reload_check_interval=1.0, cache_size=0,
+                 logger=None):
+        self.registry = registry
+        self.logger = logger
+        self.reload_check_interval = reload_check_interval
+        self._lock = threading.Lock()
+        self._model = None
+        self._model_path = None
+        self._model_mtime = None
+        self._loaded_at = None
+        self._last_check = 0.0
+        # Bumped under _lock on every model swap; part of the result cache key
+        self._generation = 0
+        self._keyed_model = None
+        self.requests_served = 0
+        self.log_skipped = 0
+        self.cache = MemoizedScorer(self._cache_model, cache_size) if cache_size > 0 else None
+        if registry is not None:
+            registry.poll(force=True)
+            registry.active()
+        else:
+            self.load(model_path)
+
+    def load(self, model_path):
+        """Load a model and swap it in. Raises if the file cannot be loaded."""
+        mtime = self._artifact_mtime(model_path)
+        model = load_scorer(model_path)
+
+        with self._lock:
+            self._model = model
+            self._generation += 1
+            self._model_path = model_path
+            self._model_mtime = mtime
+            self._loaded_at = time.time()
+            self._last_check = time.monotonic()
+
+    @staticmethod
+    def _artifact_mtime(model_path):
+        """Modification time of the file load_scorer will read for model_path."""
+        compiled_path = artifact_path(model_path)
+        if os.path.exists(compiled_path):
+            return os.stat(compiled_path).st_mtime_ns
+        return os.stat(model_path).st_mtime_ns
+
+    def _maybe_reload(self):
+        """Reload the model if its file changed on disk (checked at most once per interval)."""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_check_interval:
+            return
+        self._last_check = now
+
+        model_path = self._model_path
+        try:
+            mtime = self._artifact_mtime(model_path)
+        except OSError:
+            # File temporarily missing (e.g. being replaced) - keep the current model
+            return
+
+        if mtime != self._model_mtime:
+            try:
+                self.load(model_path)
+                print(f"Reloaded model: {model_path}", file=sys.stderr)
+            except Exception as e:
+                # Keep serving the previous model; retry on the next check
+                print(f"Model reload failed, keeping previous model: {e}", file=sys.stderr)
+
+    def _current_model(self):
+        """Return (model_id, scorer) for the model that should serve the next request."""
+        if self.registry is not None:
+            return self.registry.active()
+        self._maybe_reload()
+        return None, self._model
+
+    def _cache_model(self):
+        """
+        Model provider for the result cache; the key changes on any swap or
+        reload. The last keyed model is kept referenced, so a new model can't
+        be mistaken for it (registry swaps don't go through load()).
+        """
+        model_id, model = self._current_model()
+        with self._lock:
+            if model is not self._keyed_model:
+                self._keyed_model = model
+                self._generation += 1
+            return (model_id, self._generation), model
+
+    def _count(self, n):
+        with self._lock:
+            self.requests_served += n
+
+    def _score(self, requests, top_k=None):
+        """Score a batch through the cache when enabled; returns (model_id, results)."""
+        if self.cache is not None:
+            (model_id, _), results = self.cache.score_batch(requests, top_k=top_k)
+            return model_id, results
+        model_id, model = self._current_model()
+        return model_id, model.predict_batch(requests, top_k=top_k)
+
+    def _log(self, log, features, result, model_id):
+        """
+        Queue one prediction with the logger (no-op without a logger or log info).
+        Log info without a request_id is skipped and counted, so a malformed
+        log object never fails a prediction that was already scored.
+        """
+        if self.logger is None or not log:
+            return
+        if not isinstance(log, dict) or log.get('request_id') is None:
+            with self._lock:
+                self.log_skipped += 1
+            return
+        self.logger.log(
+            log['request_id'],
+            result['score'],
+            result['level'],
+            log.get('method', 'ML'),
+            model_id if model_id is not None else log.get('model_id'),
+            json.dumps(features)
+        )
+
+    def predict(self, features, log=None):
+        """Score one feature dict and return the same payload as predict_priority.py."""
+        model_id, results = self._score([features])
+        self._log(log, features, results[0], model_id)
+
+        self._count(1)
+        response = results[0]
+        if model_id is not None:
+            response['model_id'] = model_id
+        return response
+
+    def predict_batch(self, requests, top_k=None, compare=False, log=None):
+        """
+        Score a list of feature dicts in one vectorized pass.
+        log: optional list of per-request log info, parallel to requests.
+        """
+        if compare:
+            if self.registry is None:
+                raise ValueError("compare requires registry mode (--active)")
+            response = self.registry.score_with_candidate(requests, top_k=top_k)
+            self._count(len(requests))
+            return response
+
+        model_id, results = self._score(requests, top_k=top_k)
+        if log:
+            for features, result, entry in zip(requests, results, log):
+                self._log(entry, features, result, model_id)
+        self._count(len(results))
+        response = {'results': results}
+        if model_id is not None:
+            response['model_id'] = model_id
+        return response
+
+    def status(self):
+        """Return information about the loaded model."""
+        status = {
+            'ok': True,
+            'model_path': self._model_path,
+            'loaded_at': self._loaded_at,
+            'requests_served': self.requests_served,
+            'pid': os.getpid()
+        }
+        if self.registry is not None:
+            status['registry'] = self.registry.stats()
+        if self.cache is not None:
+            status['cache'] = self.cache.stats()
+        if self.logger is not None:
+            status['logger'] = dict(self.logger.metrics(), skipped_invalid=self.log_skipped)
+        return status
+
+    def handle(self, request):
+        """Handle one decoded request and return the response dict."""
+        request_id = request.get('id')
+        command = request.get('command', 'predict')
+
+        try:
+            if command == 'predict':
+                if 'features' not in request:
+                    raise ValueError("Missing 'features'")
+                response = self.predict(request['features'], request.get('log'))
+            elif command == 'predict_batch':
+                if not isinstance(request.get('requests'), list):
+                    raise ValueError("'requests' must be a list")
+                response = self.predict_batch(
+                    request['requests'], request.get('top_k'), bool(request.get('compare')),
+                    request.get('log')
+                )
+            elif command == 'ping':
+                response = self.status()
+            elif command == 'flush':
+                if self.logger is None:
+                    raise ValueError("flush requires a prediction logger (--log-predictions)")
+                self.logger.flush()
+                response = self.status()
+            elif command == 'reload':
+                if self.registry is not None:
+                    self.registry.poll(force=True)
+                else:
+                    self.load(request.get('model_path') or self._model_path)
+                response = self.status()
+            elif command == 'candidate':
+                if self.registry is None:
+                    raise ValueError("candidate requires registry mode (--active)")
+                self.registry.set_candidate(request.get('model_id'))
+                response = self.status()
+            else:
+                raise ValueError(f"Unknown command: {command}")
+        except FileNotFoundError as e:
+            response = {'error': f'Model file not found: {e}'}
+        except ValueError as e:
+            response = {'error': f'Model error: {e}'}
+        except Exception as e:
+            response = {'error': f'Unexpected error: {str(e)}'}
+
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    def handle_line(self, line):
+        """Decode one NDJSON line and return the encoded response line (or None for blank lines)."""
+        line = line.strip()
+        if not line:
+            return None
+
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return json.dumps({'error': f'Invalid JSON: {e}'})
+
+        if not isinstance(request, dict):
+            return json.dumps({'error': 'Request must be a JSON object'})
+
+        return json.dumps(self.handle(request))
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """Serve requests from stdin until EOF, one JSON response per line on stdout."""
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+
+        for line in stdin:
+            response = self.handle_line(line)
+            if response is not None:
+                stdout.write(response + '\n')
+                stdout.flush()
+
+    def serve_unix_socket(self, socket_path):
+        """Serve requests on a Unix domain socket; each connection is an NDJSON stream."""
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    response = server.handle_line(raw.decode('utf-8'))
+                    if response is not None:
+                        self.wfile.write((response + '\n').encode('utf-8'))
+                        self.wfile.flush()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as unix_server:
+            unix_server.daemon_threads = True
+            print(f"Prediction server listening on {socket_path}", file=sys.stderr)
+            try:
+                unix_server.serve_forever()
+            finally:
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
@@ -3,16 +3,17 @@
 Priority ML Model
 Logistic Regression model to learn optimal priority weights.
 Designed to be simple, explainable, and compliance-friendly.
+
+Heavy dependencies (pandas, scikit-learn, joblib) are imported on first
+use so that importing this module stays cheap; scoring through the
+compiled artifact (compiled_scorer.py) never loads them at all.
 """
 
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split, cross_val_score
-import joblib
 import os
 
+from compiled_scorer import CompiledPriorityScorer, artifact_path, score_to_level
+
 
 class PriorityMLModel:
     """
@@ -21,6 +22,9 @@ class PriorityMLModel:
     """
     
     def __init__(self):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler
+        
         self.model = LogisticRegression(
             penalty='l2',           # Ridge regularization (prevents overfitting)
             C=1.0,                  # Regularization strength
@@ -64,8 +68,17 @@ class PriorityMLModel:
         
         return X
     
-    def train(self, df):
-        """Train model on historical data."""
+    def train(self, df, search=False, search_options=None):
+        """
+        Train model on historical data.
+        
+        With search=True, C / class_weight / solver are first selected by a
+        parallel cross-validated grid search (model_selection.search) on the
+        training split; search_options are passed through to it (grid, cv,
+        n_jobs, scoring). The search results are returned under 'search'.
+        """
+        from sklearn.model_selection import train_test_split, cross_val_score
+        
         X = self.prepare_features(df)
         y = df['bad_outcome']
         
@@ -79,6 +92,12 @@ class PriorityMLModel:
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
+        search_results = None
+        if search:
+            import model_selection
+            search_results = model_selection.search(self.model, X_train, y_train, **(search_options or {}))
+            self.model.set_params(**search_results['best_params'])
+        
         # Scale features
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
@@ -90,17 +109,26 @@ class PriorityMLModel:
         # Evaluate
         train_score = self.model.score(X_train_scaled, y_train)
         test_score = self.model.score(X_test_scaled, y_test)
-        cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
+        if search_results is not None:
+            # The search already cross-validated the chosen candidate
+            best = search_results['candidates'][0]
+            cv_mean, cv_std = best['accuracy_mean'], best['accuracy_std']
+        else:
+            cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
+            cv_mean, cv_std = cv_scores.mean(), cv_scores.std()
         
-        return {
+        metrics = {
             'train_accuracy': float(train_score),
             'test_accuracy': float(test_score),
-            'cv_mean': float(cv_scores.mean()),
-            'cv_std': float(cv_scores.std()),
+            'cv_mean': float(cv_mean),
+            'cv_std': float(cv_std),
             'n_samples': len(df),
             'n_positive': int(positive_count),
             'n_negative': int(len(y) - positive_count)
         }
+        if search_results is not None:
+            metrics['search'] = search_results
+        return metrics
     
     def get_learned_weights(self):
         """Extract coefficients as interpretable weights."""
@@ -131,6 +159,8 @@ class PriorityMLModel:
         if not self.is_trained:
             raise ValueError("Model not trained yet")
         
+        import pandas as pd
+        
         # Ensure all features are present
         feature_dict = {}
         for name in self.feature_names:
@@ -159,6 +189,8 @@ class PriorityMLModel:
         if not self.is_trained:
             raise ValueError("Model not trained yet")
         
+        import pandas as pd
+        
         # Ensure all features are present
         feature_dict = {}
         for name in self.feature_names:
@@ -182,28 +214,102 @@ class PriorityMLModel:
         
         return contributions
     
+    def _feature_matrix(self, requests):
+        """
+        Build a raw feature matrix for a batch of requests.
+        Accepts a list of feature dicts, a DataFrame or a 2-D array
+        (columns in feature_names order). Missing features default to 0.
+        Returns (DataFrame, raw_values) where raw_values is a list of
+        per-row value lists used for explanations.
+        """
+        import pandas as pd
+        
+        if isinstance(requests, pd.DataFrame):
+            X = requests.reindex(columns=self.feature_names, fill_value=0)
+            return X, X.values.tolist()
+        
+        if isinstance(requests, np.ndarray):
+            if requests.ndim != 2 or requests.shape[1] != len(self.feature_names):
+                raise ValueError(
+                    f"Expected a 2-D array with {len(self.feature_names)} columns, "
+                    f"got shape {requests.shape}"
+                )
+            X = pd.DataFrame(np.asfortranarray(requests), columns=self.feature_names)
+            return X, requests.tolist()
+        
+        raw_values = [
+            [request.get(name, 0) for name in self.feature_names]
+            for request in requests
+        ]
+        X = pd.DataFrame(raw_values, columns=self.feature_names)
+        return X, raw_values
+    
+    def predict_batch(self, requests, top_k=None):
+        """
+        Score and explain many requests with one scaler and one matrix pass.
+        Returns one dict per row with score, level, probability and the
+        top_k feature contributions (all features when top_k is None).
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        
+        X, raw_values = self._feature_matrix(requests)
+        if len(X) == 0:
+            return []
+        
+        X_scaled = self.scaler.transform(X)
+        probabilities = self.model.predict_proba(X_scaled)[:, 1]
+        
+        coefficients = self.model.coef_[0]
+        contributions = (X_scaled * coefficients).tolist()
+        coefficients_rounded = [round(float(coef), 4) for coef in coefficients]
+        
+        results = []
+        for row, prob in enumerate(probabilities.tolist()):
+            score = round(prob * 100)
+            row_values = raw_values[row]
+            row_contributions = contributions[row]
+            explanation = [
+                {
+                    'feature': name,
+                    'value': row_values[i],
+                    'coefficient': coefficients_rounded[i],
+                    'contribution': round(row_contributions[i], 4)
+                }
+                for i, name in enumerate(self.feature_names)
+            ]
+            # Sort by contribution magnitude (same order as explain_prediction)
+            explanation.sort(key=lambda x: abs(x['contribution']), reverse=True)
+            if top_k is not None:
+                explanation = explanation[:top_k]
+            results.append({
+                'score': score,
+                'level': self._score_to_level(score),
+                'probability': prob,
+                'explanation': explanation
+            })
+        
+        return results
+    
     def _score_to_level(self, score):
         """Convert numeric score to priority level."""
-        if score >= 80:
-            return 'CRITICAL'
-        elif score >= 60:
-            return 'HIGH'
-        elif score >= 40:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
+        return score_to_level(score)
     
     def save_model(self, filepath):
-        """Save trained model to file."""
+        """
+        Save trained model to file.
+        Also writes the sklearn-free compiled artifact (<name>.scorer.json)
+        used by the prediction scripts.
+        """
+        import joblib
+        
         # Ensure directory exists
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
-        joblib.dump({
-            'model': self.model,
-            'scaler': self.scaler,
-            'feature_names': self.feature_names,
-            'is_trained': self.is_trained
-        }, filepath)
+        joblib.dump(self._model_state(), filepath)
+        
+        if self.is_trained:
+            CompiledPriorityScorer.from_model(self).save(artifact_path(filepath))
     
     @classmethod
     def load_model(cls, filepath):
@@ -211,12 +317,26 @@ class PriorityMLModel:
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Model file not found: {filepath}")
         
+        import joblib
+        
         data = joblib.load(filepath)
         
         instance = cls()
-        instance.model = data['model']
-        instance.scaler = data['scaler']
-        instance.feature_names = data['feature_names']
-        instance.is_trained = data['is_trained']
+        instance._set_model_state(data)
         
         return instance
+    
+    def _model_state(self):
+        """Everything save_model persists (subclasses add their own keys)."""
+        return {
+            'model': self.model,
+            'scaler': self.scaler,
+            'feature_names': self.feature_names,
+            'is_trained': self.is_trained
+        }
+    
+    def _set_model_state(self, data):
+        self.model = data['model']
+        self.scaler = data['scaler']
+        self.feature_names = data['feature_names']
+        self.is_trained = data['is_trained']
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Rescoring Scheduler
+Keeps ml_priority_cache current as the clock runs, rescoring a request only
+when its priority level is due to change.
+
+sla_hours_remaining, sla_percent_elapsed and hours_in_stage depend on the
+current time; all other features only change when the request does (which
+backlog_scoring.py detects). The model is linear in the features, so for
+each request the score at a future time t is
+
+    z(t) = z_static + w_hours * hours_in_stage(t) + w_pct * sla_percent_elapsed(t)
+           + w_remaining * sla_hours_remaining(t)
+
+with the scaler folded into the weights. The time features are evaluated
+on a 15-minute grid over the next 7 days, using the same rules as the
+backlog query (business_calendar working days, 9 hours per day), and the
+first grid point where the level differs from the current one is the
+request's next_rescore_at. Requests that don't change level within the
+horizon are checked again at its end.
+
+The scheduler keeps (next_rescore_at, id) in a min-heap and, on each tick,
+rescores only the requests that are due, plus whatever the periodic
+incremental backlog refresh finds changed. Work per tick grows with the
+number of level changes, not with the size of the backlog.
+
+Usage: python rescoring_scheduler.py [--interval 60] [--refresh-interval 300] [--once]
+"""
+
+import argparse
+import heapq
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+from backlog_scoring import TIME_FEATURES, ensure_cache_table, score_backlog, utc_now
+from model_registry import ModelRegistry
+
+HORIZON_HOURS = 7 * 24
+STEP_MINUTES = 15
+REFRESH_INTERVAL = 300      # seconds between incremental backlog refreshes
+TICK_INTERVAL = 60
+ROW_CHUNK = 1000            # rows per grid evaluation (rows x steps arrays)
+
+# Lower score bound of MEDIUM, HIGH and CRITICAL (see score_to_level)
+LEVEL_BOUNDARIES = np.array([40, 60, 80])
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def to_hours(value):
+    """SQLite timestamp (UTC) to hours since the epoch; NaN for NULL."""
+    if value is None:
+        return np.nan
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp() / 3600.0
+
+
+def from_hours(hours):
+    return datetime.fromtimestamp(hours * 3600.0, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def working_days():
+    """Working days in business_calendar as sorted day numbers since the epoch."""
+    rows = database.query("SELECT date FROM business_calendar WHERE is_working_day = 1 ORDER BY date")
+    return np.array(
+        [date.fromisoformat(str(row['date'])[:10]).toordinal() - EPOCH_ORDINAL for row in rows],
+        dtype=np.int64
+    )
+
+
+def _round(values):
+    """SQLite ROUND(): half away from zero."""
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def time_features(stage_start, target_hours, times, work_days):
+    """
+    hours_in_stage, sla_percent_elapsed and sla_hours_remaining of each row
+    (stage_start, target_hours: arrays of n) at each time (array of steps),
+    as computed by backlog_scoring.BACKLOG_FEATURES_SQL. Returns three
+    (n, steps) arrays.
+    """
+    start = stage_start[:, None]
+    target = target_hours[:, None]
+    t = times[None, :]
+
+    start_day = np.floor(start / 24).astype(np.int64)
+    t_day = np.floor(t / 24).astype(np.int64)
+    days = np.searchsorted(work_days, t_day, side='right') - np.searchsorted(work_days, start_day, side='left')
+
+    hour_diff = np.floor(np.mod(t, 24)) - np.floor(np.mod(start, 24))
+    business_hours = np.where(start_day == t_day, np.maximum(0, hour_diff), days * 9)
+    business_hours = np.where((start >= t) | (days <= 0), 0, business_hours)
+
+    hours_in_stage = _round(t - start)
+    percent_elapsed = np.minimum(100, _round(business_hours * 100.0 / target))
+    hours_remaining = np.maximum(0, target - business_hours)
+    return hours_in_stage, percent_elapsed, hours_remaining
+
+
+def next_rescore_times(scorer, rows, now, horizon_hours=HORIZON_HOURS, step_minutes=STEP_MINUTES):
+    """
+    For backlog rows (see backlog_scoring.backlog_features) scored at `now`,
+    the first time their level changes, or the end of the horizon. Returns
+    timestamps in SQLite format, one per row.
+    """
+    if not rows:
+        return []
+    if not hasattr(scorer, 'folded_coef'):
+        from compiled_scorer import CompiledPriorityScorer
+        scorer = CompiledPriorityScorer.from_model(scorer)
+
+    weights = dict(zip(scorer.feature_names, scorer.folded_coef))
+    static = [name for name in scorer.feature_names if name not in TIME_FEATURES]
+    X_static = np.array([[row[name] for name in static] for row in rows], dtype=np.float64)
+    z_static = X_static @ np.array([weights[name] for name in static]) + scorer.folded_intercept
+
+    stage_start = np.array([to_hours(row['stage_start']) for row in rows])
+    target_hours = np.array([row['sla_target_hours'] or 48 for row in rows], dtype=np.float64)
+    times = to_hours(now) + np.arange(0, horizon_hours * 60 // step_minutes + 1) * (step_minutes / 60.0)
+    work_days = working_days()
+
+    due = np.full(len(rows), times[-1])
+    for begin in range(0, len(rows), ROW_CHUNK):
+        end = begin + ROW_CHUNK
+        known = ~np.isnan(stage_start[begin:end])
+        if not known.any():
+            # No stage start: the time features are constants
+            continue
+
+        hours_in_stage, percent_elapsed, hours_remaining = time_features(
+            stage_start[begin:end][known], target_hours[begin:end][known], times, work_days
+        )
+        z = (
+            z_static[begin:end][known][:, None]
+            + weights['hours_in_stage'] * hours_in_stage
+            + weights['sla_percent_elapsed'] * percent_elapsed
+            + weights['sla_hours_remaining'] * hours_remaining
+        )
+        with np.errstate(over='ignore'):
+            scores = np.round(100.0 / (1.0 + np.exp(-z)))
+        levels = np.searchsorted(LEVEL_BOUNDARIES, scores, side='right')
+        changes = levels != levels[:, :1]
+        crossing = np.where(changes.any(axis=1), times[np.argmax(changes, axis=1)], times[-1])
+        due[begin:end][known] = crossing
+
+    return [from_hours(hours) for hours in due.tolist()]
+
+
+class RescoringScheduler:
+    """
+    Min-heap of (next_rescore_at, id). Entries are replaced lazily: an id's
+    current due time is kept in self.due and stale heap entries are skipped.
+    One ModelRegistry is kept for the scheduler's lifetime so ticks reuse the
+    loaded model and only reload it when ml_weights or the file changes.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, registry=None):
+        self.refresh_interval = refresh_interval
+        self.registry = registry or ModelRegistry()
+        self.heap = []
+        self.due = {}
+        self.last_refresh = None
+        self.rescored = 0
+        self.refreshes = 0
+
+    def load(self):
+        """Schedule every cached row; rows without next_rescore_at are due now."""
+        ensure_cache_table()
+        rows = database.query("SELECT id, next_rescore_at FROM ml_priority_cache")
+        self.push((row['id'], row['next_rescore_at'] or '') for row in rows)
+        return len(rows)
+
+    def push(self, schedule):
+        for request_id, due in schedule:
+            self.due[request_id] = due
+            heapq.heappush(self.heap, (due, request_id))
+
+    def pop_due(self, now):
+        due_ids = []
+        while self.heap and self.heap[0][0] <= now:
+            due, request_id = heapq.heappop(self.heap)
+            if self.due.get(request_id) == due:
+                del self.due[request_id]
+                due_ids.append(request_id)
+        return due_ids
+
+    def tick(self, now=None):
+        """Refresh changed requests if the refresh interval passed, then rescore due ones."""
+        now = now or utc_now()
+        result = {'now': now, 'refreshed': 0, 'due': 0, 'rescored': 0}
+
+        if self.last_refresh is None or time.monotonic() - self.last_refresh >= self.refresh_interval:
+            summary = score_backlog(now=now, registry=self.registry)
+            self.push(summary['schedule'])
+            self.last_refresh = time.monotonic()
+            self.refreshes += 1
+            result['refreshed'] = summary['rescored']
+
+        due_ids = self.pop_due(now)
+        if due_ids:
+            summary = score_backlog(full=True, now=now, ids=due_ids, registry=self.registry)
+            self.push(summary['schedule'])
+            self.rescored += summary['rescored']
+            result['due'] = len(due_ids)
+            result['rescored'] = summary['rescored']
+
+        result['scheduled'] = len(self.due)
+        result['next_due'] = self.heap[0][0] if self.heap else None
+        return result
+
+    def run(self, interval=TICK_INTERVAL):
+        self.load()
+        while True:
+            result = self.tick()
+            if result['refreshed'] or result['rescored']:
+                print(json.dumps(result), flush=True)
+            time.sleep(interval)
+
+    def close(self):
+        self.registry.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rescore cached priorities when their level is due to change')
+    parser.add_argument('--interval', type=float, default=TICK_INTERVAL, help='Seconds between ticks')
+    parser.add_argument('--refresh-interval', type=float, default=REFRESH_INTERVAL,
+                        help='Seconds between incremental backlog refreshes')
+    parser.add_argument('--once', action='store_true', help='Run a single tick and exit (e.g. from cron)')
+    args = parser.parse_args()
+
+    scheduler = RescoringScheduler(refresh_interval=args.refresh_interval)
+    try:
+        if args.once:
+            scheduler.load()
+            print(json.dumps(scheduler.tick()))
+        else:
+            scheduler.run(interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        scheduler.close()
+
+
+if __name__ == '__main__':
+    main()
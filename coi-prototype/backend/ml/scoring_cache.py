@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Scoring Cache
+Bounded memoization in front of predict_priority / explain_prediction.
+
+Most features are flags or small clipped integers, so an open queue that is
+rescored on every page load produces the same feature vectors over and over.
+Results are cached by (model key, feature vector in feature_names order)
+with LRU eviction. The cache is cleared automatically whenever the model
+key changes (new active model, or the model file was reloaded).
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class MemoizedScorer:
+    """
+    Wraps a model provider with an LRU result cache.
+
+    model_provider is a callable returning (model_key, scorer); it is called
+    on every request so that model swaps are seen immediately. Use
+    MemoizedScorer.for_scorer() to wrap a single fixed scorer.
+    """
+
+    def __init__(self, model_provider, max_entries=10000):
+        self.model_provider = model_provider
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._model_key = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def for_scorer(cls, scorer, max_entries=10000):
+        return cls(lambda: (id(scorer), scorer), max_entries=max_entries)
+
+    def _current(self):
+        """Return (model_key, scorer), clearing the cache if the model changed."""
+        model_key, scorer = self.model_provider()
+        with self._lock:
+            if model_key != self._model_key:
+                if self._cache:
+                    self.invalidations += 1
+                self._cache.clear()
+                self._model_key = model_key
+        return model_key, scorer
+
+    @staticmethod
+    def _key(model_key, feature_names, request_features):
+        # Missing features default to 0, same as the scorers
+        return (model_key, tuple(request_features.get(name, 0) for name in feature_names))
+
+    def _lookup(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return result
+
+    def _store(self, key, result):
+        with self._lock:
+            if key[0] != self._model_key:
+                # Model changed while scoring - don't cache a stale result
+                return
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def predict_batch(self, requests, top_k=None):
+        """Score a list of feature dicts, computing only the cache misses (in one batch)."""
+        return self.score_batch(requests, top_k)[1]
+
+    def score_batch(self, requests, top_k=None):
+        """Like predict_batch, but also returns the model key the results came from."""
+        model_key, scorer = self._current()
+
+        keys = []
+        results = [None] * len(requests)
+        missing = {}
+        for i, request_features in enumerate(requests):
+            try:
+                key = self._key(model_key, scorer.feature_names, request_features)
+                hash(key)
+            except TypeError:
+                # Unhashable feature value - score it, but don't cache
+                key = None
+            keys.append(key)
+
+            cached = self._lookup(key) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(key if key is not None else ('uncached', i), []).append(i)
+
+        if missing:
+            # Score each distinct missing vector once
+            groups = list(missing.values())
+            scored = scorer.predict_batch([requests[rows[0]] for rows in groups])
+            for rows, result in zip(groups, scored):
+                if keys[rows[0]] is not None:
+                    self._store(keys[rows[0]], result)
+                for i in rows:
+                    results[i] = result
+
+        return model_key, [self._view(result, top_k) for result in results]
+
+    @staticmethod
+    def _view(result, top_k):
+        """Copy a cached result so callers can't mutate the cache."""
+        explanation = result['explanation']
+        if top_k is not None:
+            explanation = explanation[:top_k]
+        return {
+            'score': result['score'],
+            'level': result['level'],
+            'probability': result['probability'],
+            'explanation': [dict(entry) for entry in explanation]
+        }
+
+    def predict_priority(self, request_features):
+        result = self.predict_batch([request_features])[0]
+        return {
+            'score': result['score'],
+            'level': result['level'],
+            'probability': result['probability']
+        }
+
+    def explain_prediction(self, request_features):
+        return self.predict_batch([request_features])[0]['explanation']
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
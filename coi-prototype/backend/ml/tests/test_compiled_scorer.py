@@ -0,0 +1,96 @@
+"""
+Parity of CompiledPriorityScorer with PriorityMLModel on a fixed synthetic
+dataset: single-row and batch scoring, every input type, and a saved and
+reloaded artifact.
+
+Run: python -m pytest ml/tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compiled_scorer import CompiledPriorityScorer, artifact_path, check_parity, load_scorer
+from priority_ml_model import PriorityMLModel
+
+N_ROWS = 1000
+SEED = 42
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(SEED)
+    model = PriorityMLModel()
+    df = pd.DataFrame({name: rng.integers(0, 50, N_ROWS) for name in model.feature_names})
+    df['bad_outcome'] = (
+        df['sla_percent_elapsed'] + 0.5 * df['escalation_count'] + rng.normal(0, 10, N_ROWS) > 40
+    ).astype(int)
+    model.train(df)
+    return model
+
+
+@pytest.fixture(scope='module')
+def requests(model):
+    rng = np.random.default_rng(SEED + 1)
+    X = rng.integers(0, 60, (200, len(model.feature_names)))
+    rows = [dict(zip(model.feature_names, map(int, row))) for row in X]
+    # Missing features default to 0 on both sides
+    rows.append({'sla_percent_elapsed': 90})
+    rows.append({})
+    return rows
+
+
+@pytest.fixture(scope='module')
+def scorer(model):
+    return CompiledPriorityScorer.from_model(model)
+
+
+def test_single_row_matches(model, scorer, requests):
+    for request in requests:
+        assert scorer.predict_priority(request) == model.predict_priority(request)
+        assert scorer.explain_prediction(request) == model.explain_prediction(request)
+
+
+def test_batch_matches(model, scorer, requests):
+    assert scorer.predict_batch(requests) == model.predict_batch(requests)
+    assert scorer.predict_batch(requests, top_k=3) == model.predict_batch(requests, top_k=3)
+
+
+def test_batch_matches_for_frames_and_arrays(model, scorer, requests):
+    frame = pd.DataFrame(requests).fillna(0)
+    assert scorer.predict_batch(frame) == model.predict_batch(frame)
+
+    array = frame[model.feature_names].to_numpy(dtype=float)
+    assert scorer.predict_batch(array) == model.predict_batch(array)
+
+
+def test_check_parity_reports_no_mismatches(model, scorer, requests):
+    parity = check_parity(model, scorer, requests)
+    assert parity['rows'] == len(requests)
+    assert parity['mismatches'] == 0
+    assert parity['max_probability_diff'] == 0.0
+
+
+def test_saved_artifact_matches(model, requests, tmp_path):
+    model_path = str(tmp_path / 'priority_model.joblib')
+    model.save_model(model_path)
+    assert Path(artifact_path(model_path)).exists()
+
+    loaded = load_scorer(model_path)
+    assert isinstance(loaded, CompiledPriorityScorer)
+    assert loaded.predict_batch(requests) == model.predict_batch(requests)
+
+
+def test_python_backend_matches_within_rounding(model, requests):
+    scorer = CompiledPriorityScorer.from_model(model, backend='python')
+    assert scorer.backend == 'python'
+
+    for expected, actual in zip(model.predict_batch(requests), scorer.predict_batch(requests)):
+        assert actual['probability'] == pytest.approx(expected['probability'], rel=1e-12, abs=1e-15)
+        assert actual['score'] == expected['score']
+        assert actual['level'] == expected['level']
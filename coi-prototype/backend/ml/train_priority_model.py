@@ -3,26 +3,60 @@
 Priority ML Model Training Pipeline
 Run monthly to update weights based on latest data.
 
-Usage: python train_priority_model.py
+With --snapshot, extraction and the comparison report read from a
+consistent snapshot of the database (see database.read_snapshot), so a long
+run neither sees concurrent writes nor holds locks the Node.js writer needs.
+The ml_weights row is still written to the live database.
+
+The extracted training set is cached on disk (see dataset_cache.py), so a
+re-run against unchanged data memory-maps it instead of querying again.
+
+With --search, C / class_weight / solver are chosen by a parallel
+cross-validated grid search (model_selection.py) before the final fit.
+
+Usage: python train_priority_model.py [--snapshot [backup|transaction]] [--no-cache] [--search [--n-jobs N]]
 """
 
-import pandas as pd
+import argparse
 import json
 import sys
 from datetime import datetime
 from pathlib import Path
 from priority_ml_model import PriorityMLModel
+from compiled_scorer import CompiledPriorityScorer, artifact_path, check_parity
 import database
+import feature_store
+from dataset_cache import DatasetCache
 
 
-def main():
+def print_search_results(results, limit=10):
+    print(f"      Grid search: {len(results['candidates'])} candidates x {results['n_folds']} folds "
+          f"in {results['wall_seconds']:.1f}s (selected by {results['scoring']})")
+    print(f"        {'C':>8} {'class_weight':<12} {'solver':<16} {'ROC AUC':>8} {'accuracy':>9} {'wall':>8} {'fit sum':>8}")
+    for candidate in results['candidates'][:limit]:
+        params = candidate['params']
+        print(f"        {params['C']:>8g} {str(params['class_weight']):<12} {params['solver']:<16} "
+              f"{candidate['roc_auc_mean']:>8.4f} {candidate['accuracy_mean']:>9.4f} {candidate['wall_seconds']:>7.2f}s {candidate['fit_seconds_total']:>7.2f}s")
+    print(f"      Selected: {results['best_params']}")
+
+
+def run_training(refresh_features=True, use_cache=True, search=False, n_jobs=-1):
     print(f"=== Priority ML Training Pipeline ===")
     print(f"Started: {datetime.now()}")
     
     # Step 1: Extract training data
     print("\n[1/5] Extracting training data...")
     try:
-        df = database.get_training_data()
+        created = database.ensure_training_indexes()
+        if created:
+            print(f"      Created indexes: {', '.join(created)}")
+        
+        if use_cache:
+            cache = DatasetCache()
+            df = cache.get_training_data(refresh=refresh_features).to_frame()
+            print(f"      Dataset cache: {'hit' if cache.last_hit else 'miss'} ({cache.last_key})")
+        else:
+            df = database.get_training_data(refresh=refresh_features)
         print(f"      Records: {len(df)}")
         
         if len(df) == 0:
@@ -60,7 +94,10 @@ def main():
     print("\n[2/5] Training model...")
     try:
         model = PriorityMLModel()
-        metrics = model.train(df)
+        metrics = model.train(df, search=search, search_options={'n_jobs': n_jobs})
+        
+        if search:
+            print_search_results(metrics['search'])
         
         print(f"      Train accuracy: {metrics['train_accuracy']:.3f}")
         print(f"      Test accuracy:  {metrics['test_accuracy']:.3f}")
@@ -100,6 +137,17 @@ def main():
         model_path = models_dir / model_filename
         model.save_model(str(model_path))
         print(f"      Saved to: {model_path}")
+        
+        # The prediction scripts load the compiled artifact - verify it scores
+        # exactly like the sklearn model on the training data
+        scorer = CompiledPriorityScorer.load(artifact_path(str(model_path)))
+        parity = check_parity(model, scorer, df)
+        if parity['mismatches']:
+            print(f"\n❌ Compiled scorer differs from sklearn model on {parity['mismatches']} "
+                  f"of {parity['rows']} rows (max probability diff {parity['max_probability_diff']:.3g})")
+            return
+        print(f"      Compiled scorer: {artifact_path(str(model_path))} (parity OK on {parity['rows']} rows)")
+
     except Exception as e:
         print(f"\n❌ Error saving model: {e}")
         import traceback
@@ -113,8 +161,8 @@ def main():
         model_path_str = str(model_path)
         
         database.execute("""
-            INSERT INTO ml_weights (model_type, model_path, weights, accuracy, training_records, trained_at, is_active)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO ml_weights (model_type, model_path, weights, accuracy, training_records, trained_at, is_active, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             'priority_weights',
             model_path_str,
@@ -122,7 +170,8 @@ def main():
             metrics['test_accuracy'],
             metrics['n_samples'],
             datetime.now().isoformat(),
-            0  # Don't auto-activate, require manual review
+            0,  # Don't auto-activate, require manual review
+            json.dumps({'params': metrics['search']['best_params']}) if search else None
         ))
         
         print("      Model recorded in database (inactive)")
@@ -173,6 +222,34 @@ def main():
         print(f"   Note: Could not generate comparison report: {e}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Train the priority ML model')
+    parser.add_argument('--snapshot', nargs='?', const='backup', choices=['backup', 'transaction'],
+                        help='Read from a consistent snapshot (default mode: backup)')
+    parser.add_argument('--pages-per-step', type=int, default=database.SNAPSHOT_PAGES_PER_STEP,
+                        help='Pages copied per backup step')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always extract from the database (skip the dataset cache)')
+    parser.add_argument('--search', action='store_true',
+                        help='Select C, class_weight and solver by parallel cross-validated grid search')
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='Worker processes for --search (-1 = all cores)')
+    args = parser.parse_args()
+    options = {'use_cache': not args.no_cache, 'search': args.search, 'n_jobs': args.n_jobs}
+    
+    if not args.snapshot:
+        run_training(**options)
+        return
+    
+    # Write the newly closed requests to ml_features on the live database
+    # first, so the snapshot contains them
+    feature_store.refresh_features()
+    with database.read_snapshot(args.snapshot, pages_per_step=args.pages_per_step) as snapshot:
+        detail = f", {snapshot.steps} backup steps" if snapshot.mode == 'backup' else ''
+        print(f"Reading from {snapshot.mode} snapshot (taken in {snapshot.seconds:.2f}s{detail})")
+        run_training(refresh_features=False, **options)
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Training Data Extraction
+Streams training rows from SQLite straight into compact NumPy columns.
+
+database.query() materializes every row as a dict before pandas copies it
+again; for a large window that is several full copies of the data as Python
+objects. Here the cursor is read in arraysize chunks and each chunk is
+written into preallocated typed columns (flags as int8, counters as int16 or
+int32), so peak memory stays close to the size of the final arrays.
+
+The result can be used as a DataFrame (TrainingData.to_frame()) or as a
+plain feature matrix and label vector (TrainingData.X(), TrainingData.y).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import database
+
+# Storage type per column. Values that don't fit are widened to int64
+# (non-integral values to float64).
+COLUMN_DTYPES = {
+    'sla_hours_remaining': np.int32,
+    'sla_percent_elapsed': np.int32,
+    'has_external_deadline': np.int8,
+    'days_to_deadline': np.int16,
+    'is_pie': np.int8,
+    'is_international': np.int8,
+    'is_statutory_audit': np.int8,
+    'is_tax_compliance': np.int8,
+    'escalation_count': np.int8,
+    'current_stage': np.int8,
+    'hours_in_stage': np.int32,
+    'requester_workload': np.int32,
+    'day_of_week': np.int8,
+    'is_end_of_month': np.int8,
+    'is_q4': np.int8,
+    'bad_outcome': np.int8
+}
+
+DEFAULT_ARRAYSIZE = 10000
+
+
+class TrainingData:
+    """
+    Column-oriented training set: request_ids plus one typed array per column.
+    """
+
+    def __init__(self, request_ids, columns):
+        self.request_ids = request_ids
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.request_ids)
+
+    @property
+    def y(self):
+        return self.columns['bad_outcome']
+
+    def X(self, feature_names=None, dtype=np.float64):
+        """Feature matrix in feature_names order (Fortran order, like a DataFrame's values)."""
+        feature_names = feature_names or database.FEATURE_COLUMNS
+        X = np.empty((len(self), len(feature_names)), dtype=dtype, order='F')
+        for j, name in enumerate(feature_names):
+            X[:, j] = self.columns[name]
+        return X
+
+    def to_frame(self):
+        import pandas as pd
+
+        if len(self) == 0:
+            return pd.DataFrame()
+        data = {'request_id': self.request_ids}
+        data.update(self.columns)
+        return pd.DataFrame(data, copy=False)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def _numeric(values):
+    """
+    Chunk values as float64. NULLs and non-numeric strings become 0, like
+    pd.to_numeric(errors='coerce').fillna(0) in database.get_training_data().
+    """
+    try:
+        return np.array([v or 0 for v in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        import pandas as pd
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(np.float64)
+
+
+def _store(column, offset, values):
+    """
+    Write values into column[offset:]; returns the (possibly widened) column.
+    Ranges are checked explicitly: older NumPy versions wrap out-of-range
+    integers on assignment instead of raising.
+    """
+    values = _numeric(values)
+    if len(values) and column.dtype.kind == 'i':
+        if not (np.isfinite(values).all() and (values == np.trunc(values)).all()):
+            column = column.astype(np.float64)
+        else:
+            info = np.iinfo(column.dtype)
+            if values.min() < info.min or values.max() > info.max:
+                column = column.astype(np.int64)
+    column[offset:offset + len(values)] = values
+    return column
+
+
+def stream_training_data(sql, params=None, expected_rows=None, arraysize=DEFAULT_ARRAYSIZE):
+    """
+    Run a training extraction query (request_id + feature columns + bad_outcome)
+    and collect it chunk by chunk into typed columns. NULLs and non-numeric
+    values become 0, as in database.get_training_data().
+
+    expected_rows sizes the columns up front; without it they grow by doubling.
+    Reads go through database.read_connection(), so an active read_snapshot()
+    is honored.
+    """
+    cursor = database.read_connection().cursor()
+    try:
+        cursor.row_factory = None
+        cursor.arraysize = arraysize
+        cursor.execute(sql, params or ())
+        names = [d[0] for d in cursor.description]
+
+        capacity = max(expected_rows or arraysize, 1)
+        request_ids = np.empty(capacity, dtype=object)
+        columns = {
+            name: np.zeros(capacity, dtype=COLUMN_DTYPES.get(name, np.int64))
+            for name in names if name != 'request_id'
+        }
+
+        n = 0
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            size = len(rows)
+            if n + size > capacity:
+                capacity = max(capacity * 2, n + size)
+                request_ids = np.resize(request_ids, capacity)
+                columns = {name: np.resize(column, capacity) for name, column in columns.items()}
+
+            for name, values in zip(names, zip(*rows)):
+                if name == 'request_id':
+                    request_ids[n:n + size] = values
+                else:
+                    columns[name] = _store(columns[name], n, values)
+            n += size
+    finally:
+        cursor.close()
+
+    if n < capacity:
+        request_ids = request_ids[:n].copy()
+        columns = {name: column[:n].copy() for name, column in columns.items()}
+    return TrainingData(request_ids, columns)
+
+
+def extract_training_data(source='feature_store', arraysize=DEFAULT_ARRAYSIZE, refresh=True):
+    """
+    Extract the training window as TrainingData.
+
+    Args:
+        source: 'feature_store' (refresh ml_features, then read it) or 'live'
+        arraysize: rows fetched per chunk
+        refresh: refresh ml_features first (pass False when reading from a
+            snapshot taken after the refresh)
+    """
+    if source == 'feature_store':
+        import feature_store
+        if refresh:
+            feature_store.refresh_features()
+        sql = feature_store.TRAINING_WINDOW_SQL
+        # Cheap indexed count, so the columns are allocated exactly once
+        expected_rows = database.query_one(
+            f"SELECT COUNT(*) AS n FROM ({sql})"
+        )['n']
+    elif source == 'live':
+        sql = database.TRAINING_DATA_SQL
+        expected_rows = None
+    else:
+        raise ValueError(f"Unknown training data source: {source}")
+
+    return stream_training_data(sql, expected_rows=expected_rows, arraysize=arraysize)
@@ -2051,6 +2051,7 @@ export async function initDatabase() {
     `)
     db.exec('CREATE INDEX IF NOT EXISTS idx_ml_predictions_request ON ml_predictions(request_id)')
     db.exec('CREATE INDEX IF NOT EXISTS idx_ml_predictions_outcome ON ml_predictions(actual_outcome, predicted_at)')
+    db.exec('CREATE INDEX IF NOT EXISTS idx_ml_predictions_recorded ON ml_predictions(outcome_recorded_at)')
     console.log('✅ ml_predictions table ensured')
   } catch (error) {
     if (!error.message.includes('already exists')) {
@@ -2058,6 +2059,37 @@ export async function initDatabase() {
     }
   }
   
+  // Priority scores of open requests, written by ml/backlog_scoring.py
+  try {
+    db.exec(`
+      CREATE TABLE IF NOT EXISTS ml_priority_cache (
+        id INTEGER PRIMARY KEY,
+        request_id VARCHAR(50),
+        model_id INTEGER REFERENCES ml_weights(model_id),
+        score INTEGER,
+        level VARCHAR(20),
+        probability REAL,
+        breakdown TEXT,
+        features TEXT,
+        input_hash VARCHAR(32),
+        request_updated_at DATETIME,
+        scored_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        next_rescore_at DATETIME
+      )
+    `)
+    try {
+      db.exec('ALTER TABLE ml_priority_cache ADD COLUMN next_rescore_at DATETIME')
+    } catch (error) {
+      // Column already exists, ignore
+    }
+    db.exec('CREATE INDEX IF NOT EXISTS idx_ml_priority_cache_due ON ml_priority_cache(next_rescore_at)')
+    console.log('✅ ml_priority_cache table ensured')
+  } catch (error) {
+    if (!error.message.includes('already exists')) {
+      console.log('ML priority cache table:', error.message)
+    }
+  }
+  
   // Add priority/SLA columns to coi_requests
   const prioritySlaColumns = [
     { name: 'escalation_count', def: 'INTEGER DEFAULT 0' },
@@ -2084,6 +2116,11 @@ export async function initDatabase() {
   try {
     db.exec('CREATE INDEX IF NOT EXISTS idx_coi_requests_stage_entered ON coi_requests(stage_entered_at)')
     db.exec('CREATE INDEX IF NOT EXISTS idx_coi_requests_external_deadline ON coi_requests(external_deadline)')
+    // Indexes for ML training feature extraction (backend/ml/database.py)
+    db.exec('CREATE INDEX IF NOT EXISTS idx_coi_requests_requester_status ON coi_requests(requester_id, status)')
+    db.exec('CREATE INDEX IF NOT EXISTS idx_coi_requests_status_created ON coi_requests(status, created_at)')
+    db.exec('CREATE INDEX IF NOT EXISTS idx_coi_requests_status_updated ON coi_requests(status, updated_at)')
+    db.exec('CREATE INDEX IF NOT EXISTS idx_sla_breach_request_type_resolved ON sla_breach_log(coi_request_id, breach_type, resolved_at)')
   } catch (error) {
     // Indexes may already exist
   }
@@ -1,4 +1,5 @@
-import { execFile } from 'child_process'
+import { execFile, spawn } from 'child_process'
+import { createInterface } from 'readline'
 import { promisify } from 'util'
 import { join, dirname } from 'path'
 import { fileURLToPath } from 'url'
@@ -18,6 +19,24 @@ const __dirname = dirname(__filename)
 let mlModelAvailable = false
 let mlModelInfo = null
 
+// Long-lived Python prediction server (predict_priority.py --serve).
+// Disable with ML_PREDICTION_SERVER=false to spawn one process per prediction.
+const USE_PREDICTION_SERVER = process.env.ML_PREDICTION_SERVER !== 'false'
+const PREDICTION_TIMEOUT_MS = 10000
+// Memoized results per feature vector in the prediction server (0 disables)
+const PREDICTION_CACHE_SIZE = process.env.ML_PREDICTION_CACHE_SIZE || '10000'
+// Let the prediction server write ml_predictions in batches (prediction_logger.py)
+// instead of one INSERT per prediction here. Disable with ML_BUFFERED_PREDICTION_LOG=false.
+const BUFFERED_PREDICTION_LOG = process.env.ML_BUFFERED_PREDICTION_LOG !== 'false'
+let predictionServer = null
+
+// Scores precomputed by ml/backlog_scoring.py (ml_priority_cache) are used
+// while the request is unchanged and the level isn't due to change
+// (next_rescore_at, kept by ml/rescoring_scheduler.py; rows without it expire
+// after ML_PRIORITY_CACHE_MAX_AGE_MINUTES). Disable with ML_PRIORITY_CACHE=false.
+const USE_PRIORITY_CACHE = process.env.ML_PRIORITY_CACHE !== 'false'
+const PRIORITY_CACHE_MAX_AGE_MINUTES = parseInt(process.env.ML_PRIORITY_CACHE_MAX_AGE_MINUTES || '60', 10)
+
 /**
  * Initialize ML model - check if active model exists
  */
@@ -34,6 +53,9 @@ export async function initializeMLModel() {
     `).get()
     
     if (mlConfig && mlConfig.accuracy >= 0.7) {
+      if (mlModelInfo && mlModelInfo.modelPath !== mlConfig.model_path) {
+        stopPredictionServer()
+      }
       mlModelAvailable = true
       mlModelInfo = {
         modelId: mlConfig.model_id,
@@ -44,6 +66,7 @@ export async function initializeMLModel() {
       console.log(`✅ ML model loaded. Accuracy: ${mlConfig.accuracy}`)
       return true
     } else {
+      stopPredictionServer()
       mlModelAvailable = false
       mlModelInfo = null
       console.log('ℹ️  ML model not available. Using rule-based scoring.')
@@ -140,31 +163,58 @@ export async function predictPriority(request) {
   }
   
   try {
+    const cached = getCachedPriority(request)
+    if (cached) {
+      // Logged like a fresh prediction, with the features it was scored from
+      await logPrediction(request.request_id || request.id, {
+        score: cached.score,
+        level: cached.level,
+        features: JSON.parse(cached.features || '{}')
+      }, 'ML')
+      return {
+        score: cached.score,
+        level: cached.level,
+        method: 'ML',
+        probability: cached.probability,
+        breakdown: JSON.parse(cached.breakdown || '[]'),
+        modelId: mlModelInfo.modelId,
+        cached: true
+      }
+    }
+    
     // Extract features
     const features = await extractFeatures(request)
     
-    // Create Python script path
-    const pythonScript = join(__dirname, '../ml/predict_priority.py')
+    const requestId = request.request_id || request.id
     
-    // Call Python script with features as JSON
-    const { stdout, stderr } = await execFileAsync('python3', [
-      pythonScript,
-      mlModelInfo.modelPath,
-      JSON.stringify(features)
-    ], {
-      cwd: join(__dirname, '../..'),
-      timeout: 10000 // 10 second timeout
-    })
-    
-    if (stderr) {
-      console.warn('Python script stderr:', stderr)
+    // Use the persistent prediction server; fall back to a one-off process
+    let result
+    let logged = false
+    if (USE_PREDICTION_SERVER) {
+      // Without a request id the server would skip the record; log it here instead
+      const log = BUFFERED_PREDICTION_LOG && requestId != null
+        ? { request_id: requestId, method: 'ML', model_id: mlModelInfo.modelId }
+        : null
+      try {
+        result = await requestServerPrediction(features, log)
+        logged = Boolean(log)
+      } catch (serverError) {
+        // After a timeout the server may still have queued the record, so the
+        // fallback result is not logged again; after any other failure it
+        // was not logged and is logged below
+        logged = Boolean(log) && serverError.timedOut === true
+        console.warn('ML prediction server unavailable, spawning process:', serverError.message)
+        result = await runPredictionScript(features)
+      }
+    } else {
+      result = await runPredictionScript(features)
     }
     
-    // Parse result
-    const result = JSON.parse(stdout.trim())
-    
-    // Log prediction to database
-    await logPrediction(request.request_id || request.id, result, 'ML')
+    // Log prediction to database (with the features, for drift monitoring),
+    // unless the prediction server logged (or may have logged) it
+    if (!logged) {
+      await logPrediction(requestId, { ...result, features }, 'ML')
+    }
     
     return {
       score: result.score,
@@ -180,6 +230,153 @@ export async function predictPriority(request) {
   }
 }
 
+/**
+ * Look up the batch score of a request in ml_priority_cache.
+ * Returns null when there is no row for the active model, the row is due
+ * for rescoring, or the request was updated after it was scored (or has no
+ * updated_at to check that against).
+ */
+function getCachedPriority(request) {
+  if (!USE_PRIORITY_CACHE || !request.id) {
+    return null
+  }
+  
+  try {
+    const db = getDatabase()
+    const row = db.prepare(`
+      SELECT score, level, probability, breakdown, features, request_updated_at
+      FROM ml_priority_cache
+      WHERE id = ?
+      AND model_id = ?
+      AND COALESCE(next_rescore_at, datetime(scored_at, ?)) > datetime('now')
+    `).get(request.id, mlModelInfo.modelId, `+${PRIORITY_CACHE_MAX_AGE_MINUTES} minutes`)
+    
+    if (!row || !request.updated_at || row.request_updated_at !== request.updated_at) {
+      return null
+    }
+    return row
+  } catch (error) {
+    // Table not created yet (backlog scoring never ran)
+    return null
+  }
+}
+
+/**
+ * Run predict_priority.py once for a single prediction
+ */
+async function runPredictionScript(features) {
+  const pythonScript = join(__dirname, '../ml/predict_priority.py')
+  
+  // Call Python script with features as JSON
+  const { stdout, stderr } = await execFileAsync('python3', [
+    pythonScript,
+    mlModelInfo.modelPath,
+    JSON.stringify(features)
+  ], {
+    cwd: join(__dirname, '../..'),
+    timeout: PREDICTION_TIMEOUT_MS
+  })
+  
+  if (stderr) {
+    console.warn('Python script stderr:', stderr)
+  }
+  
+  return JSON.parse(stdout.trim())
+}
+
+/**
+ * Start the long-lived prediction server for the active model
+ */
+function startPredictionServer(modelPath) {
+  const pythonScript = join(__dirname, '../ml/predict_priority.py')
+  const args = [pythonScript, '--serve', modelPath, '--cache-size', PREDICTION_CACHE_SIZE]
+  if (BUFFERED_PREDICTION_LOG) {
+    args.push('--log-predictions')
+  }
+  const child = spawn('python3', args, {
+    cwd: join(__dirname, '../..'),
+    stdio: ['pipe', 'pipe', 'pipe']
+  })
+  
+  const server = { child, modelPath, pending: new Map(), nextId: 1 }
+  
+  createInterface({ input: child.stdout }).on('line', (line) => {
+    let response
+    try {
+      response = JSON.parse(line)
+    } catch (error) {
+      console.warn('Invalid response from ML prediction server:', line)
+      return
+    }
+    const entry = server.pending.get(response.id)
+    if (!entry) return
+    server.pending.delete(response.id)
+    clearTimeout(entry.timer)
+    if (response.error) {
+      entry.reject(new Error(response.error))
+    } else {
+      entry.resolve(response)
+    }
+  })
+  
+  child.stderr.on('data', (data) => {
+    console.warn('ML prediction server stderr:', data.toString().trim())
+  })
+  
+  const failPending = (error) => {
+    for (const entry of server.pending.values()) {
+      clearTimeout(entry.timer)
+      entry.reject(error)
+    }
+    server.pending.clear()
+    if (predictionServer === server) {
+      predictionServer = null
+    }
+  }
+  child.on('error', failPending)
+  // EPIPE when the child died between requests; unhandled it would crash Node
+  child.stdin.on('error', failPending)
+  child.on('exit', (code) => failPending(new Error(`ML prediction server exited with code ${code}`)))
+  
+  return server
+}
+
+/**
+ * Stop the prediction server (e.g. when the active model changes)
+ */
+function stopPredictionServer() {
+  if (predictionServer) {
+    const server = predictionServer
+    predictionServer = null
+    server.child.stdin.end()
+    server.child.kill()
+  }
+}
+
+/**
+ * Send one prediction request to the prediction server.
+ * With log info the server queues the prediction for ml_predictions itself.
+ */
+function requestServerPrediction(features, log = null) {
+  if (!predictionServer || predictionServer.modelPath !== mlModelInfo.modelPath) {
+    stopPredictionServer()
+    predictionServer = startPredictionServer(mlModelInfo.modelPath)
+  }
+  const server = predictionServer
+  const id = server.nextId++
+  
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      server.pending.delete(id)
+      const error = new Error('ML prediction server timed out')
+      error.timedOut = true
+      reject(error)
+    }, PREDICTION_TIMEOUT_MS)
+    server.pending.set(id, { resolve, reject, timer })
+    server.child.stdin.write(JSON.stringify(log ? { id, features, log } : { id, features }) + '\n')
+  })
+}
+
 /**
  * Log prediction to database for monitoring
  */
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark for coi-rag.py
+
+Starts a local stand-in for Ollama's /api/embed and embeds the same texts
+with:
+
+  - sequential:  one requests.post per text, no session (the original client)
+  - BxW:         coi-rag.get_embeddings with batch size B and W workers
+
+The stand-in charges a fixed round-trip latency per request (overlapped
+between concurrent requests) plus a per-input embedding cost that is
+serialized like a single model instance. Every run must return the same
+vectors in the same order as the sequential run.
+
+Usage:
+  python scripts/coi-rag-embed-bench.py                     # 500 texts, 1x1,32x1,32x4,64x8
+  python scripts/coi-rag-embed-bench.py --texts 2000 --latency 0.02 --configs 16x2,32x4 --json
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    import numpy as np
+    import requests
+except ImportError:
+    print("Install dependencies: pip install requests numpy")
+    sys.exit(1)
+
+DIM = 768
+
+
+def load_rag():
+    spec = importlib.util.spec_from_file_location("coi_rag", Path(__file__).with_name("coi-rag.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fake_embedding(text: str) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(DIM).round(6).tolist()
+
+
+def start_server(latency: float, per_input: float) -> tuple[ThreadingHTTPServer, dict]:
+    """Stand-in /api/embed on a free local port. Returns the server and its request counters."""
+    model_lock = threading.Lock()
+    counters = {"requests": 0, "inputs": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, keep-alive
+        # connections stall on Nagle + delayed ACK (~40 ms per request)
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            time.sleep(latency)
+            with model_lock:
+                counters["requests"] += 1
+                counters["inputs"] += len(inputs)
+                time.sleep(per_input * len(inputs))
+            data = json.dumps({"model": body["model"], "embeddings": [fake_embedding(t) for t in inputs]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def sequential(url: str, model: str, texts: list[str]) -> list[list[float]]:
+    """The original client: one POST per text, new connection each time."""
+    embeddings = []
+    for text in texts:
+        resp = requests.post(f"{url}/api/embed", json={"model": model, "input": text}, timeout=30)
+        resp.raise_for_status()
+        embeddings.append(resp.json()["embeddings"][0])
+    return embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="coi-rag embedding throughput benchmark")
+    parser.add_argument("--texts", type=int, default=500, help="Number of texts to embed")
+    parser.add_argument("--latency", type=float, default=0.01, help="Round-trip seconds per request")
+    parser.add_argument("--per-input", type=float, default=0.001, help="Embedding seconds per input")
+    parser.add_argument("--configs", default="1x1,32x1,32x4,64x8", help="Comma-separated BATCHxWORKERS")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    configs = [tuple(int(v) for v in c.split("x")) for c in args.configs.split(",") if c.strip()]
+    texts = [f"File: src/module{i % 50}.js (lines {i}-{i + 99})\n\nchunk {i}" for i in range(args.texts)]
+
+    rag = load_rag()
+    server, counters = start_server(args.latency, args.per_input)
+    rag.OLLAMA_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    rag.EMBED_WORKERS = max(workers for _, workers in configs)
+
+    results = []
+    start = time.perf_counter()
+    expected = sequential(rag.OLLAMA_URL, rag.EMBED_MODEL, texts)
+    seconds = time.perf_counter() - start
+    results.append({"mode": "sequential", "seconds": round(seconds, 3), "requests": counters["requests"],
+                    "texts_per_second": round(len(texts) / seconds, 1), "identical": True})
+
+    for batch_size, workers in configs:
+        before = counters["requests"]
+        start = time.perf_counter()
+        embeddings = rag.get_embeddings(texts, batch_size=batch_size, workers=workers)
+        seconds = time.perf_counter() - start
+        results.append({
+            "mode": f"{batch_size}x{workers}",
+            "seconds": round(seconds, 3),
+            "requests": counters["requests"] - before,
+            "texts_per_second": round(len(texts) / seconds, 1),
+            "identical": embeddings == expected,
+        })
+
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps({"texts": len(texts), "latency": args.latency, "per_input": args.per_input,
+                          "results": results}, indent=2))
+    else:
+        print(f"=== Embedding throughput: {len(texts)} texts, {args.latency * 1000:.0f} ms round trip, "
+              f"{args.per_input * 1000:.1f} ms per input ===")
+        print(f"{'mode':<12} {'seconds':>9} {'requests':>9} {'texts/s':>9} {'speedup':>8}  identical")
+        base = results[0]["seconds"]
+        for r in results:
+            print(f"{r['mode']:<12} {r['seconds']:>9.3f} {r['requests']:>9} {r['texts_per_second']:>9.1f} "
+                  f"{base / r['seconds']:>7.1f}x  {'✓' if r['identical'] else '✗'}")
+
+    if not all(r["identical"] for r in results):
+        print("✗ Batched embeddings differ from the sequential run", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ Embeds codebase files using Ollama's nomic-embed-text model and enables
 semantic search + LLM-powered Q&A over the COI prototype codebase.
 
 Usage:
-  python scripts/coi-rag.py index          # Build/rebuild the vector index
+  python scripts/coi-rag.py index          # Build/update the vector index
+  python scripts/coi-rag.py index --full   # Re-embed everything
   python scripts/coi-rag.py search "query" # Search for relevant code chunks
+  python scripts/coi-rag.py search "q1" "q2" -f queries.txt  # Batched multi-query search
   python scripts/coi-rag.py ask "question" # Ask a question with RAG context
 
 Requirements:
@@ -18,7 +20,14 @@ import argparse
 import hashlib
 import json
 import os
+import random
+import sqlite3
 import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 try:
@@ -38,6 +47,38 @@ CHAT_MODEL = os.getenv("CHAT_MODEL", "qwen2.5-coder:32b-32k")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "100"))  # ~100 lines ≈ fits in 2048 token context of nomic-embed-text
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "15"))
 TOP_K = int(os.getenv("TOP_K", "8"))
+EMBED_DTYPE = os.getenv("EMBED_DTYPE", "float32")  # float16 halves the index size but scores ~5x slower
+SEARCH_BLOCK = 8192  # embedding rows scored per block
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))  # inputs per /api/embed request
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))  # concurrent /api/embed requests
+EMBED_RETRIES = 3
+EMBED_BACKOFF = 0.5  # seconds, doubled per retry
+EMBED_TIMEOUT = 120
+EMBED_CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH", str(INDEX_DIR.parent / ".rag-cache" / "embeddings.sqlite")))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "512"))  # 0 disables the cache
+EMBED_CACHE_EVICT_TO = 0.9  # evict down to this fraction of the limit
+EMBED_CACHE_TOUCH_SECONDS = 3600  # last_used is only rewritten when older than this
+QUERY_LRU_SIZE = 256  # query embeddings kept in memory
+
+INDEX_FORMAT = "coi-rag-index"
+INDEX_VERSION = 3
+# Version 2 indexes used fixed data file names; version 3 lists them in index.json
+LEGACY_DATA_FILES = {
+    "embeddings": "embeddings.npy",
+    "chunks": "chunks.npy",
+    "texts": "texts.bin",
+    "manifest": "manifest.json",
+}
+CHUNK_DTYPE = np.dtype(
+    [
+        ("file", "<u4"),
+        ("start_line", "<u4"),
+        ("end_line", "<u4"),
+        ("chunk_idx", "<u4"),
+        ("offset", "<u8"),
+        ("length", "<u4"),
+    ]
+)
 
 # File patterns to index (relative to REPO_ROOT)
 SOURCE_PATTERNS = [
@@ -87,6 +128,10 @@ def collect_files() -> list[Path]:
 def chunk_text(text: str, filepath: str) -> list[dict]:
     """Split text into overlapping chunks with metadata."""
     lines = text.split("\n")
+    # Byte offset of each line in the UTF-8 text (chunks address their text by byte range)
+    line_offsets = [0]
+    for line in lines:
+        line_offsets.append(line_offsets[-1] + len(line.encode("utf-8")) + 1)
     chunks = []
     i = 0
     chunk_idx = 0
@@ -102,6 +147,8 @@ def chunk_text(text: str, filepath: str) -> list[dict]:
                     "end_line": i + len(chunk_lines),
                     "text": chunk_text,
                     "chunk_idx": chunk_idx,
+                    "byte_offset": line_offsets[i],
+                    "byte_length": line_offsets[i + len(chunk_lines)] - 1 - line_offsets[i],
                 }
             )
             chunk_idx += 1
@@ -112,36 +159,383 @@ def chunk_text(text: str, filepath: str) -> list[dict]:
     return chunks
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """Shared keep-alive session, one pooled connection per embedding worker."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, EMBED_WORKERS))
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    """
+    Embed a list of texts with one /api/embed call. Connection errors,
+    timeouts, 429 and 5xx responses are retried with exponential backoff.
+    """
+    for attempt in range(EMBED_RETRIES + 1):
+        try:
+            resp = get_session().post(
+                f"{OLLAMA_URL}/api/embed",
+                json={"model": EMBED_MODEL, "input": texts},
+                timeout=EMBED_TIMEOUT,
+            )
+            if resp.status_code != 429 and resp.status_code < 500:
+                resp.raise_for_status()
+                # Ollama returns {"embeddings": [[...], ...]} in input order
+                embeddings = resp.json()["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+                return embeddings
+            error = requests.HTTPError(f"{resp.status_code} from {OLLAMA_URL}/api/embed", response=resp)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt == EMBED_RETRIES:
+            raise error
+        time.sleep(EMBED_BACKOFF * 2**attempt * (1 + random.random()))
+
+
+def get_embeddings(
+    texts: list[str], batch_size: int = None, workers: int = None, on_batch=None, strict: bool = True
+) -> list:
+    """
+    Embed texts in batches of batch_size on up to `workers` concurrent
+    requests. Results are in input order. With strict=False a batch that
+    still fails after retries yields None for each of its texts instead of
+    raising. on_batch(done, total) is called after each batch.
+    """
+    batch_size = max(1, batch_size or EMBED_BATCH_SIZE)
+    workers = max(1, workers or EMBED_WORKERS)
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+
+    def run(i):
+        try:
+            return i, embed_batch(batches[i]), None
+        except Exception as e:
+            if strict:
+                raise
+            return i, [None] * len(batches[i]), e
+
+    if len(batches) <= 1 or workers == 1:
+        completed = map(run, range(len(batches)))
+        executor = None
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        completed = (future.result() for future in as_completed([executor.submit(run, i) for i in range(len(batches))]))
+
+    try:
+        for done, (i, embeddings, error) in enumerate(completed, 1):
+            if error is not None:
+                print(f"\n    Error embedding batch of {len(batches[i])} chunks: {error}")
+            results[i] = embeddings
+            if on_batch:
+                on_batch(done, len(batches))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return [embedding for batch in results for embedding in batch]
+
+
 def get_embedding(text: str) -> list[float]:
     """Get embedding vector from Ollama."""
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/embed",
-        json={"model": EMBED_MODEL, "input": text},
-        timeout=30,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    # Ollama returns {"embeddings": [[...]]} for /api/embed
-    return data["embeddings"][0]
-
+    return get_embeddings([text])[0]
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for cache keys: NFC, LF line endings, no trailing whitespace."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (embed model, SHA-256 of the
+    normalized text), in one SQLite file shared by `index`, `search` and
+    `ask`. WAL mode lets several processes read while one writes. When the
+    stored vectors exceed max_bytes, the least recently used entries are
+    evicted down to EMBED_CACHE_EVICT_TO of the limit.
+
+    Hits only rewrite last_used when it is older than
+    EMBED_CACHE_TOUCH_SECONDS, so lookups are usually read-only. The stored
+    size is summed once and then tracked from this process's writes; rows
+    written by other processes are picked up when the estimate reaches the
+    limit and evict() recounts.
+    """
+
+    def __init__(self, path: Path = EMBED_CACHE_PATH, model: str = None, max_bytes: int = None):
+        self.model = model or EMBED_MODEL
+        self.max_bytes = EMBED_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._bytes = None  # estimated bytes of stored vectors
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+    def get_many(self, texts: list[str]) -> list:
+        """Cached vectors (float32 arrays) in input order, None for misses."""
+        keys = [self.key(text) for text in texts]
+        now = int(time.time())
+        stale_before = now - EMBED_CACHE_TOUCH_SECONDS
+        found = {}
+        stale = []
+        for start in range(0, len(keys), 500):
+            part = keys[start : start + 500]
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector, last_used FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                [self.model, *part],
+            )
+            for text_hash, vector, last_used in rows:
+                found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+                if last_used < stale_before:
+                    stale.append(text_hash)
+
+        if stale:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model, text_hash) for text_hash in stale],
+            )
+            self.conn.commit()
+        results = [found.get(key) for key in keys]
+        self.hits += sum(1 for r in results if r is not None)
+        self.misses += sum(1 for r in results if r is None)
+        return results
+
+    def put_many(self, texts: list[str], embeddings: list):
+        now = int(time.time())
+        rows = [
+            (self.model, self.key(text), np.asarray(emb, dtype=np.float32).tobytes(), now)
+            for text, emb in zip(texts, embeddings)
+            if emb is not None
+        ]
+        if self._bytes is None:
+            self._bytes = self.size()[1]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+        # Replaced rows are counted twice, which only makes evict() recount sooner
+        self._bytes += sum(len(row[2]) for row in rows)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def size(self) -> tuple[int, int]:
+        """(entries, bytes of stored vectors) across all models."""
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return count, total
+
+    def evict(self):
+        _, total = self.size()
+        self._bytes = total
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EMBED_CACHE_EVICT_TO)
+        victims = []
+        freed = 0
+        for model, text_hash, size in self.conn.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ):
+            victims.append((model, text_hash))
+            freed += size
+            if freed >= target:
+                break
+        self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+        self.conn.commit()
+        self.evicted += len(victims)
+        self._bytes = total - freed
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        count, total = self.size()
+        rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        evicted = f", {self.evicted} evicted" if self.evicted else ""
+        return (
+            f"Embedding cache: {self.hits}/{lookups} hits ({rate}), "
+            f"{count} entries, {total / 1024 / 1024:.1f} MB{evicted}"
+        )
 
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    a_arr = np.array(a)
-    b_arr = np.array(b)
-    dot = np.dot(a_arr, b_arr)
-    norm = np.linalg.norm(a_arr) * np.linalg.norm(b_arr)
-    return float(dot / norm) if norm > 0 else 0.0
+    def close(self):
+        self.conn.close()
+
+
+_query_lru = OrderedDict()
+
+
+def embed_cached(
+    texts: list[str],
+    cache: "EmbeddingCache | None",
+    use_lru: bool = False,
+    origins: list | None = None,
+    **options,
+) -> list:
+    """
+    get_embeddings() behind the caches: the in-process LRU (use_lru, for
+    queries), then the on-disk cache, then Ollama for the rest. Identical
+    texts are embedded once. Results are in input order; options are passed
+    to get_embeddings (with strict=False, failed texts are None). When
+    origins is a list, it receives where each result came from: "lru",
+    "cache" or "ollama".
+    """
+    results = [None] * len(texts)
+    sources = ["ollama"] * len(texts)
+    missing = {}
+    for i, text in enumerate(texts):
+        lru_key = (EMBED_MODEL, text)
+        if use_lru and lru_key in _query_lru:
+            _query_lru.move_to_end(lru_key)
+            results[i] = _query_lru[lru_key]
+            sources[i] = "lru"
+        else:
+            missing.setdefault(text, []).append(i)
+
+    unique = list(missing)
+    found = cache.get_many(unique) if cache and unique else [None] * len(unique)
+    to_embed = [text for text, emb in zip(unique, found) if emb is None]
+    embedded = get_embeddings(to_embed, **options) if to_embed else []
+    if cache and to_embed:
+        cache.put_many(to_embed, embedded)
+
+    fresh = dict(zip(to_embed, embedded))
+    for text, emb in zip(unique, found):
+        source = "ollama" if emb is None else "cache"
+        emb = fresh[text] if emb is None else emb
+        for i in missing[text]:
+            results[i] = emb
+            sources[i] = source
+        if use_lru and emb is not None:
+            _query_lru[(EMBED_MODEL, text)] = emb
+            if len(_query_lru) > QUERY_LRU_SIZE:
+                _query_lru.popitem(last=False)
+
+    if origins is not None:
+        origins.extend(sources)
+    return results
 
 
-def build_index():
-    """Index all source files."""
+def open_cache() -> "EmbeddingCache | None":
+    """The shared embedding cache, or None when disabled (EMBED_CACHE_MAX_MB=0) or unavailable."""
+    if EMBED_CACHE_MAX_MB <= 0:
+        return None
+    try:
+        return EmbeddingCache()
+    except sqlite3.Error as e:
+        print(f"Embedding cache unavailable: {e}", file=sys.stderr)
+        return None
+
+
+def normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    """Scale each row to unit length (float32) so a dot product is the cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # Zero vectors stay zero (similarity 0) instead of becoming NaN
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def top_k_indices(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def embed_input(chunk: dict) -> str:
+    """Text sent to the embedding model for a chunk (path and line range header + text)."""
+    header = f"File: {chunk['file']} (lines {chunk['start_line']}-{chunk['end_line']})\n\n"
+    return header + chunk["text"]
+
+
+def previous_embeddings() -> tuple[dict, dict, str | None]:
+    """
+    Embeddings of the current index by chunk hash, and its per-file
+    manifest entries. Returns empty mappings and the reason when the index
+    can't be reused (missing, or built with another model or chunking).
+    """
+    if not (INDEX_DIR / "index.json").exists():
+        return {}, {}, "no manifest"
+    try:
+        index = RagIndex(INDEX_DIR)
+        with open(index.manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError, KeyError):
+        return {}, {}, "unreadable index"
+
+    if manifest.get("embed_model") != EMBED_MODEL:
+        return {}, {}, f"embedding model changed ({manifest.get('embed_model')} → {EMBED_MODEL})"
+    if manifest.get("config") != chunk_config():
+        return {}, {}, "chunking config changed"
+
+    # Rows are stored file by file in index order, each file's chunks in manifest order
+    by_hash = {}
+    row = 0
+    for relpath in index.files:
+        for digest in manifest["files"][relpath]["chunks"]:
+            by_hash[digest] = index.embeddings[row]
+            row += 1
+    if row != len(index):
+        return {}, {}, "manifest does not match the index"
+    return by_hash, manifest["files"], None
+
+
+def chunk_config() -> dict:
+    return {"chunk_size": CHUNK_SIZE, "overlap": CHUNK_OVERLAP}
+
+
+def build_index(full: bool = False):
+    """
+    Index all source files. Chunks whose content hash is in the current
+    index reuse its embedding; only new or changed chunks are embedded.
+    """
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
     files = collect_files()
     print(f"Found {len(files)} files to index")
 
-    all_chunks = []
-    all_embeddings = []
+    reusable, previous_files, reason = ({}, {}, "--full") if full else previous_embeddings()
+    if reason:
+        print(f"Full rebuild: {reason}")
+
+    stats = {"new": 0, "changed": 0, "unchanged": 0, "embedded": 0, "cached": 0, "reused": 0, "failed": 0}
+    planned = []
+    pending = []
 
     for i, filepath in enumerate(files):
         relpath = str(filepath.relative_to(REPO_ROOT))
@@ -155,65 +549,317 @@ def build_index():
         if not chunks:
             continue
 
-        print(f"  [{i+1}/{len(files)}] {relpath} → {len(chunks)} chunks", end="", flush=True)
+        previous = previous_files.get(relpath)
+        if previous is None:
+            stats["new"] += 1
+        elif previous["sha256"] == content_hash(text.encode("utf-8")):
+            stats["unchanged"] += 1
+        else:
+            stats["changed"] += 1
 
+        changed = 0
         for chunk in chunks:
-            try:
-                header = f"File: {chunk['file']} (lines {chunk['start_line']}-{chunk['end_line']})\n\n"
-                emb = get_embedding(header + chunk["text"])
-                all_embeddings.append(emb)
-                all_chunks.append(chunk)
-                print(".", end="", flush=True)
-            except Exception as e:
-                print(f"\n    Error embedding chunk: {e}")
+            chunk["hash"] = content_hash(embed_input(chunk).encode("utf-8"))
+            if chunk["hash"] not in reusable:
+                pending.append(chunk)
+                changed += 1
+        if changed:
+            print(f"  [{i+1}/{len(files)}] {relpath} → {changed}/{len(chunks)} chunks to embed")
+        planned.append((relpath, text, chunks))
+
+    # Embed all new or changed chunks together (cache first): batches span files
+    cache = open_cache()
+    try:
+        if pending:
+            print(f"Embedding {len(pending)} chunks ({EMBED_BATCH_SIZE} per request, {EMBED_WORKERS} workers)", end="", flush=True)
+            origins = []
+            embeddings = embed_cached(
+                [embed_input(chunk) for chunk in pending],
+                cache,
+                origins=origins,
+                on_batch=lambda done, total: print(".", end="", flush=True),
+                strict=False,
+            )
+            print()
+            for chunk, emb, origin in zip(pending, embeddings, origins):
+                if emb is None:
+                    stats["failed"] += 1
+                    continue
+                reusable[chunk["hash"]] = emb
+                stats["cached" if origin == "cache" else "embedded"] += 1
+        cache_report = cache.report() if cache else "Embedding cache: disabled"
+    finally:
+        if cache:
+            cache.close()
+
+    writer = IndexWriter(INDEX_DIR)
+    for relpath, text, chunks in planned:
+        embedded = [(chunk, reusable[chunk["hash"]]) for chunk in chunks if chunk["hash"] in reusable]
+        writer.add_file(relpath, text, embedded)
+    stats["reused"] = writer.count - stats["embedded"] - stats["cached"]
+
+    writer.commit()
+    deleted = len(set(previous_files) - set(writer.files))
+
+    print(f"\n✓ Indexed {writer.count} chunks from {len(writer.files)} files")
+    print(
+        f"  Embedded {stats['embedded']} chunks, {stats['cached']} from the embedding cache, "
+        f"reused {stats['reused']} from the index"
+        + (f", {stats['failed']} failed" if stats["failed"] else "")
+    )
+    print(
+        f"  Files: {stats['new']} new, {stats['changed']} changed, "
+        f"{stats['unchanged']} unchanged, {deleted} removed"
+    )
+    print(f"  {cache_report}")
+    print(f"  Saved to {INDEX_DIR}")
 
-        print()
 
-    # Save index
-    index_data = {"chunks": all_chunks, "config": {"chunk_size": CHUNK_SIZE, "overlap": CHUNK_OVERLAP}}
-    with open(INDEX_DIR / "chunks.json", "w") as f:
-        json.dump(index_data, f)
+class IndexWriter:
+    """
+    Writes the on-disk index (INDEX_FORMAT):
+
+      index.json           format, counts, embedding dtype/dim, config, the file
+                           list and the names of the data files below
+      manifest.<v>.json    embed model, chunking config, per-file and per-chunk content hashes
+      embeddings.<v>.npy   unit-length rows in EMBED_DTYPE, opened with mmap_mode
+      chunks.<v>.npy       CHUNK_DTYPE table: file number, line range, byte range in texts
+      texts.<v>.bin        UTF-8 text of every indexed file, stored once
+
+    Chunks address their text by byte range, so overlapping chunks share it.
+    Data files get a new version <v> per writer and are never modified;
+    commit() swaps index.json in one os.replace, so a concurrent reader
+    sees either the old or the new set, never a mix. The previous version's
+    files are kept (readers may still have it open); older ones are removed.
+    """
+
+    def __init__(self, index_dir: Path, dtype: str = EMBED_DTYPE):
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self.files = []
+        self.manifest = {}
+        self.rows = []
+        self.embeddings = []
+        self.count = 0
+        version = f"{time.strftime('%Y%m%d%H%M%S')}-{os.urandom(3).hex()}"
+        self.data = {
+            "embeddings": f"embeddings.{version}.npy",
+            "chunks": f"chunks.{version}.npy",
+            "texts": f"texts.{version}.bin",
+            "manifest": f"manifest.{version}.json",
+        }
+        self._texts = open(index_dir / self.data["texts"], "wb")
+        self._offset = 0
+
+    def add_file(self, relpath: str, text: str, embedded: list[tuple[dict, list[float]]]):
+        """Add a file's text and its (chunk, embedding) pairs."""
+        if not embedded:
+            return
+        data = text.encode("utf-8")
+        file_no = len(self.files)
+        self.files.append(relpath)
+        self.manifest[relpath] = {
+            "sha256": content_hash(data),
+            "chunks": [chunk.get("hash") or content_hash(embed_input(chunk).encode("utf-8")) for chunk, _ in embedded],
+        }
+        for chunk, emb in embedded:
+            self.rows.append(
+                (
+                    file_no,
+                    chunk["start_line"],
+                    chunk["end_line"],
+                    chunk["chunk_idx"],
+                    self._offset + chunk["byte_offset"],
+                    chunk["byte_length"],
+                )
+            )
+            self.embeddings.append(emb)
+        self._texts.write(data)
+        self._offset += len(data)
+        self.count += len(embedded)
+
+    def commit(self):
+        self._texts.close()
+        embeddings = normalize_rows(np.array(self.embeddings, dtype=np.float32)) if self.embeddings else None
+        dim = embeddings.shape[1] if embeddings is not None else 0
+        if embeddings is None:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+
+        with open(self.index_dir / self.data["embeddings"], "wb") as f:
+            np.save(f, embeddings.astype(self.dtype), allow_pickle=False)
+        with open(self.index_dir / self.data["chunks"], "wb") as f:
+            np.save(f, np.array(self.rows, dtype=CHUNK_DTYPE), allow_pickle=False)
+        with open(self.index_dir / self.data["manifest"], "w") as f:
+            json.dump({"embed_model": EMBED_MODEL, "config": chunk_config(), "files": self.manifest}, f)
+        meta = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "count": self.count,
+            "dim": dim,
+            "dtype": self.dtype.name,
+            "embed_model": EMBED_MODEL,
+            "config": chunk_config(),
+            "files": self.files,
+            "data": self.data,
+        }
+        previous = self._current_data()
+        with open(self.index_dir / "index.json.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.index_dir / "index.json.tmp", self.index_dir / "index.json")
+
+        # Remove data files of older versions and the previous JSON index format
+        keep = set(self.data.values()) | set(previous.values())
+        for pattern in ("embeddings*.npy", "chunks*.npy", "texts*.bin", "manifest*.json", "chunks.json"):
+            for path in self.index_dir.glob(pattern):
+                if path.name not in keep:
+                    path.unlink(missing_ok=True)
+
+    def _current_data(self) -> dict:
+        """Data file names of the index being replaced (none when unreadable)."""
+        try:
+            with open(self.index_dir / "index.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if meta.get("format") != INDEX_FORMAT:
+            return {}
+        return meta.get("data", LEGACY_DATA_FILES)
+
+
+class RagIndex:
+    """
+    Read side of the on-disk index. Embeddings and the chunk table are
+    memory-mapped; chunk text is read from the texts file only for the chunks
+    returned, so opening the index costs the same at any corpus size.
+    """
+
+    def __init__(self, index_dir: Path, attempts: int = 3):
+        for attempt in range(attempts):
+            with open(index_dir / "index.json") as f:
+                self.meta = json.load(f)
+            if self.meta.get("format") != INDEX_FORMAT or self.meta.get("version") not in (2, INDEX_VERSION):
+                raise ValueError(f"Unsupported index format in {index_dir}")
+
+            data = self.meta.get("data", LEGACY_DATA_FILES)
+            try:
+                # Open every data file now: once open, a later commit removing them doesn't matter
+                self.embeddings = np.load(index_dir / data["embeddings"], mmap_mode="r")
+                self.table = np.load(index_dir / data["chunks"], mmap_mode="r")
+                self._texts = open(index_dir / data["texts"], "rb")
+                break
+            except FileNotFoundError:
+                # Superseded by two commits since index.json was read: read it again
+                if attempt == attempts - 1:
+                    raise
+        self.files = self.meta["files"]
+        self.manifest_path = index_dir / data["manifest"]
+        if len(self.embeddings) != self.meta["count"] or len(self.table) != self.meta["count"]:
+            raise ValueError(f"Index files in {index_dir} are inconsistent; rebuild the index")
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def similarities(self, query_matrix: "np.ndarray", block: int = SEARCH_BLOCK) -> "np.ndarray":
+        """Cosine similarity of each (unit-length) query row with every chunk."""
+        if query_matrix.shape[1] != self.meta["dim"]:
+            raise ValueError(
+                f"Query embedding has {query_matrix.shape[1]} dimensions, index has {self.meta['dim']} "
+                f"(built with {self.meta['embed_model']})"
+            )
+        scores = np.empty((len(query_matrix), len(self)), dtype=np.float32)
+        # Blocks keep the float32 working copy of float16 embeddings small
+        for start in range(0, len(self), block):
+            rows = np.asarray(self.embeddings[start : start + block], dtype=np.float32)
+            scores[:, start : start + len(rows)] = query_matrix @ rows.T
+        return scores
+
+    def chunks(self, indices) -> list[dict]:
+        """Materialize chunk dicts (with text) for the given rows."""
+        results = []
+        for idx in indices:
+            row = self.table[idx]
+            self._texts.seek(int(row["offset"]))
+            results.append(
+                {
+                    "file": self.files[row["file"]],
+                    "start_line": int(row["start_line"]),
+                    "end_line": int(row["end_line"]),
+                    "text": self._texts.read(int(row["length"])).decode("utf-8", errors="ignore"),
+                    "chunk_idx": int(row["chunk_idx"]),
+                }
+            )
+        return results
 
-    np.save(str(INDEX_DIR / "embeddings.npy"), np.array(all_embeddings))
 
-    print(f"\n✓ Indexed {len(all_chunks)} chunks from {len(files)} files")
-    print(f"  Saved to {INDEX_DIR}")
+def convert_legacy_index():
+    """Rewrite a chunks.json + embeddings.npy index in the current format (no re-embedding)."""
+    with open(INDEX_DIR / "chunks.json") as f:
+        data = json.load(f)
+    embeddings = np.load(INDEX_DIR / "embeddings.npy")
+
+    writer = IndexWriter(INDEX_DIR)
+    by_file = {}
+    for chunk, emb in zip(data["chunks"], embeddings):
+        by_file.setdefault(chunk["file"], []).append((chunk, emb))
+    for relpath, embedded in by_file.items():
+        # Chunk texts become consecutive byte ranges of one blob entry
+        parts, offset = [], 0
+        for chunk, _ in embedded:
+            encoded = chunk["text"].encode("utf-8")
+            chunk["byte_offset"], chunk["byte_length"] = offset, len(encoded)
+            parts.append(chunk["text"])
+            offset += len(encoded)
+        writer.add_file(relpath, "".join(parts), embedded)
+    writer.commit()
+
+
+def load_index() -> RagIndex:
+    """Open the saved index."""
+    if not (INDEX_DIR / "index.json").exists():
+        if (INDEX_DIR / "chunks.json").exists() and (INDEX_DIR / "embeddings.npy").exists():
+            print("Converting index to the memory-mapped format...", file=sys.stderr)
+            convert_legacy_index()
+        else:
+            print("Index not found. Run: python scripts/coi-rag.py index")
+            sys.exit(1)
+
+    try:
+        return RagIndex(INDEX_DIR)
+    except (ValueError, KeyError) as e:
+        print(f"{e}. Run: python scripts/coi-rag.py index")
+        sys.exit(1)
 
 
-def load_index() -> tuple[list[dict], "np.ndarray"]:
-    """Load the saved index."""
-    chunks_path = INDEX_DIR / "chunks.json"
-    embeddings_path = INDEX_DIR / "embeddings.npy"
+def search_many(queries: list[str], top_k: int = TOP_K) -> list[list[dict]]:
+    """Search the index for several queries at once (one result list per query)."""
+    index = load_index()
+    if not queries:
+        return []
+    if len(index) == 0:
+        return [[] for _ in queries]
 
-    if not chunks_path.exists() or not embeddings_path.exists():
-        print("Index not found. Run: python scripts/coi-rag.py index")
-        sys.exit(1)
+    cache = open_cache()
+    try:
+        query_matrix = normalize_rows(embed_cached(queries, cache, use_lru=True))
+    finally:
+        if cache:
+            cache.close()
+    scores = index.similarities(query_matrix)
 
-    with open(chunks_path) as f:
-        data = json.load(f)
+    all_results = []
+    for row in scores:
+        top = top_k_indices(row, top_k)
+        results = index.chunks(top)
+        for chunk, idx in zip(results, top):
+            chunk["score"] = round(float(row[idx]), 4)
+        all_results.append(results)
 
-    embeddings = np.load(str(embeddings_path))
-    return data["chunks"], embeddings
+    return all_results
 
 
 def search(query: str, top_k: int = TOP_K) -> list[dict]:
     """Search the index for relevant chunks."""
-    chunks, embeddings = load_index()
-    query_emb = get_embedding(query)
-
-    similarities = []
-    for i, emb in enumerate(embeddings):
-        sim = cosine_similarity(query_emb, emb.tolist())
-        similarities.append((sim, i))
-
-    similarities.sort(reverse=True)
-    results = []
-    for sim, idx in similarities[:top_k]:
-        chunk = chunks[idx].copy()
-        chunk["score"] = round(sim, 4)
-        results.append(chunk)
-
-    return results
+    return search_many([query], top_k)[0]
 
 
 def ask(question: str):
@@ -266,15 +912,39 @@ def ask(question: str):
     print()
 
 
+def print_results(results: list[dict]):
+    for i, r in enumerate(results):
+        print(f"\n{'='*60}")
+        print(f"[{i+1}] {r['file']}:{r['start_line']}-{r['end_line']} (score: {r['score']})")
+        print(f"{'='*60}")
+        # Show first 10 lines of chunk
+        lines = r["text"].split("\n")[:10]
+        print("\n".join(lines))
+        if len(r["text"].split("\n")) > 10:
+            print(f"  ... ({len(r['text'].split(chr(10)))} lines total)")
+
+
+def read_queries(path: str) -> list[str]:
+    """One query per line from a file ('-' reads stdin); blank lines are skipped."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
 def main():
     parser = argparse.ArgumentParser(description="COI Codebase RAG CLI")
     sub = parser.add_subparsers(dest="command")
 
-    sub.add_parser("index", help="Build/rebuild the vector index")
+    index_cmd = sub.add_parser("index", help="Build/update the vector index (only changed chunks are embedded)")
+    index_cmd.add_argument("--full", action="store_true", help="Re-embed every chunk")
 
     search_cmd = sub.add_parser("search", help="Search for relevant code chunks")
-    search_cmd.add_argument("query", help="Search query")
+    search_cmd.add_argument("query", nargs="*", help="Search query (several queries are searched in one batch)")
     search_cmd.add_argument("-k", type=int, default=TOP_K, help="Number of results")
+    search_cmd.add_argument("-f", "--file", help="Read queries from a file, one per line ('-' for stdin)")
+    search_cmd.add_argument("--json", action="store_true", help="Print results as JSON")
 
     ask_cmd = sub.add_parser("ask", help="Ask a question with RAG context")
     ask_cmd.add_argument("question", help="Question to ask")
@@ -282,18 +952,23 @@ def main():
     args = parser.parse_args()
 
     if args.command == "index":
-        build_index()
+        build_index(full=args.full)
     elif args.command == "search":
-        results = search(args.query, top_k=args.k)
-        for i, r in enumerate(results):
-            print(f"\n{'='*60}")
-            print(f"[{i+1}] {r['file']}:{r['start_line']}-{r['end_line']} (score: {r['score']})")
-            print(f"{'='*60}")
-            # Show first 10 lines of chunk
-            lines = r["text"].split("\n")[:10]
-            print("\n".join(lines))
-            if len(r["text"].split("\n")) > 10:
-                print(f"  ... ({len(r['text'].split(chr(10)))} lines total)")
+        queries = list(args.query)
+        if args.file:
+            queries += read_queries(args.file)
+        if not queries:
+            search_cmd.error("no query given")
+
+        all_results = search_many(queries, top_k=args.k)
+        if args.json:
+            print(json.dumps([{"query": q, "results": r} for q, r in zip(queries, all_results)], indent=2))
+        elif len(queries) == 1:
+            print_results(all_results[0])
+        else:
+            for query, results in zip(queries, all_results):
+                print(f"\n### {query}")
+                print_results(results)
     elif args.command == "ask":
         ask(args.question)
     else: